@@ -8,36 +8,43 @@
 # request with all updates for the private MCT repository.
 
 import os
+import argparse
+import csv
+import json
 import subprocess
 import sys
-from datetime import datetime
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import pywikibot
 import re
-import mwparserfromhell
+import git_plumbing
+import revision_cache
+import vlor_discovery
+import vlor_index
+import wiki_executor
+import wiki_mirror
 
 # --- CONFIGURATION ---
 PRIVATE_REPO_PATH = os.path.expanduser('~/Isidore-Operations-MCT')
 VLOR_FOLDER_NAME = 'VLORs'
 DASHBOARD_FILENAME = 'Operations_Dashboard.md'
 ENV_FILE_PATH = os.path.expanduser('~/aiops_toolkit/.env.vlor_backup')
-DISCOVERY_CATEGORIES = ['Category:Initiative VLOR', 'Category:Operation VLOR']
+DISCOVERY_CATEGORIES = vlor_discovery.DISCOVERY_CATEGORIES
+PRELOAD_GROUP_SIZE = vlor_discovery.DEFAULT_GROUP_SIZE
+WATERMARK_FILENAME = 'vlor_backup_watermark.json'
+# MediaWiki's default $wgRCMaxAge is 90 days; stay safely inside it.
+RECENT_CHANGES_MAX_AGE_DAYS = 30
+# Backup file writes: threads, and how many page texts may wait for a writer at once
+WRITE_WORKERS = 8
+MAX_PENDING_WRITES = 64
 
-def get_vlor_pages_from_categories(site):
-    """Reads wiki categories to get a list of VLOR pages."""
-    all_vlor_pages = []
-    page_titles = set()
+def iter_vlor_pages_from_categories(site, executor=None):
+    """Reads wiki categories and yields VLOR pages, with text loaded in batches."""
     print(f"Querying for pages in {len(DISCOVERY_CATEGORIES)} categories...")
-    for cat_name in DISCOVERY_CATEGORIES:
-        vlor_category = pywikibot.Category(site, cat_name)
-        pages = list(vlor_category.articles())
-        for page in pages:
-            if page.title() not in page_titles:
-                all_vlor_pages.append(page)
-                page_titles.add(page.title())
-        print(f"  - Found {len(pages)} pages in '{cat_name}'.")
-    print(f"Total unique VLOR pages found: {len(all_vlor_pages)}.")
-    return all_vlor_pages
+    return vlor_discovery.iter_vlor_pages(site, DISCOVERY_CATEGORIES, PRELOAD_GROUP_SIZE, executor=executor)
 
 def generate_filename_from_title(title):
     """Creates a safe filename from a wiki page title."""
@@ -62,38 +69,248 @@ def run_command(command, cwd, env=None):
     print(result.stdout)
     return result
 
-def generate_dashboard(vlor_pages):
-    """Parses VLOR pages and generates a Markdown dashboard."""
-    dashboard_content = f"# Operations Dashboard\n_Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}_\n\n"
-    dashboard_content += "This document provides a consolidated, high-level overview of all active and planned operational loops.\n\n"
-    for page in sorted(vlor_pages, key=lambda p: p.title()):
-        wikicode = mwparserfromhell.parse(page.text)
-        operation_name = "Unknown"
-        for template in wikicode.filter_templates(matches="IsidoreOodaVLOR"):
-            if template.has("operation"):
-                operation_name = template.get("operation").value.strip()
-                break
-        dashboard_content += f"## From VLOR: [[{page.title()}]] (Operation: {operation_name})\n\n"
-        for template in wikicode.filter_templates(matches="IsidoreOodaVLOR"):
+DASHBOARD_SECTION_PREFIX = "## From VLOR: [["
+# Bump when generate_dashboard_section's output changes, so cached fragments are re-rendered
+DASHBOARD_FORMAT_VERSION = 1
+FRAGMENT_CACHE_FILENAME = 'dashboard_fragments.sqlite'
+FRAGMENT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+def generate_dashboard_header():
+    """Returns the dashboard title block with a fresh timestamp."""
+    return (f"# Operations Dashboard\n_Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}_\n\n"
+            "This document provides a consolidated, high-level overview of all active and planned operational loops.\n\n")
+
+def generate_dashboard_section(page_title, page_entry):
+    """Renders the dashboard section for a single VLOR page from its index entry."""
+    operation_name = page_entry['operation'] or "Unknown"
+    parts = [f"{DASHBOARD_SECTION_PREFIX}{page_title}]] (Operation: {operation_name})\n\n"]
+    for loop in page_entry['loops']:
+        if any(loop[field] is None for field in ('loop_id', 'human_title', 'status', 'description')):
+            continue
+        parts.append(f"### {loop['human_title']} (`{loop['loop_id']}`)\n")
+        parts.append(f"**Status:** {loop['status']}\n\n")
+        parts.append(f"**Description:** {loop['description']}\n\n")
+        if loop['resources']:
+            parts.append(f"**Anticipated Resources:** `{loop['resources']}`\n\n")
+        parts.append("---\n")
+    return "".join(parts)
+
+def get_fragment_cache():
+    """Rendered dashboard sections keyed by (page title, revid), or None if caching is disabled."""
+    if os.environ.get(revision_cache.DISABLE_CACHE_ENV_VAR):
+        return None
+    return revision_cache.RevisionCache(os.path.join(revision_cache.get_cache_dir(), FRAGMENT_CACHE_FILENAME),
+                                        FRAGMENT_CACHE_MAX_BYTES)
+
+def iter_dashboard(index, fragment_cache=None):
+    """
+    Yields the dashboard piece by piece: the header, then one section per indexed VLOR page in
+    title order. Sections of pages whose revid is unchanged come straight from the fragment cache.
+    """
+    yield generate_dashboard_header()
+    for page_title in sorted(index.pages):
+        page_entry = index.pages[page_title]
+        cache_key = f"v{DASHBOARD_FORMAT_VERSION}:{page_title}"
+        fragment = fragment_cache.get(cache_key, page_entry['revid']) if fragment_cache else None
+        if fragment is None:
+            fragment = generate_dashboard_section(page_title, page_entry)
+            if fragment_cache:
+                fragment_cache.put(cache_key, page_entry['revid'], fragment)
+        yield fragment
+
+def write_dashboard(dashboard_path, index, fragment_cache=None):
+    """Streams the dashboard to disk section by section and swaps it into place atomically."""
+    temp_path = f"{dashboard_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for chunk in iter_dashboard(index, fragment_cache):
+            f.write(chunk)
+    os.replace(temp_path, dashboard_path)
+
+# --- Machine-Readable Loop Exports ---
+# The same loop records as the dashboard, for analytics jobs: one row per loop, written
+# next to the dashboard as <stem>.jsonl / .csv / .parquet (Parquet needs pyarrow).
+EXPORT_COLUMNS = ['page', 'revid', 'operation', 'loop_id', 'human_title', 'status', 'description', 'resources']
+EXPORT_FORMATS = ['jsonl', 'csv', 'parquet']
+DEFAULT_EXPORT_FORMATS = ['jsonl', 'csv']
+
+def iter_export_rows(index):
+    for loop in index.iter_loops():
+        yield {column: loop.get(column) for column in EXPORT_COLUMNS}
+
+def write_loop_exports(base_path, index, formats=DEFAULT_EXPORT_FORMATS):
+    """Writes the loop exports in the requested formats (atomically). Returns the paths written."""
+    written = []
+    for export_format in formats:
+        path = f"{base_path}.{export_format}"
+        temp_path = f"{path}.tmp"
+        if export_format == 'jsonl':
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for row in iter_export_rows(index):
+                    f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + "\n")
+        elif export_format == 'csv':
+            with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+                writer.writeheader()
+                writer.writerows(iter_export_rows(index))
+        elif export_format == 'parquet':
             try:
-                loop_id = template.get("loop_id").value.strip()
-                human_title = template.get("human_title").value.strip()
-                status = template.get("status").value.strip()
-                description = template.get("description").value.strip()
-                dashboard_content += f"### {human_title} (`{loop_id}`)\n"
-                dashboard_content += f"**Status:** {status}\n\n"
-                dashboard_content += f"**Description:** {description}\n\n"
-                if template.has("resources"):
-                    resources = template.get("resources").value.strip()
-                    if resources:
-                        dashboard_content += f"**Anticipated Resources:** `{resources}`\n\n"
-                dashboard_content += "---\n"
-            except ValueError:
+                import pyarrow # Optional: only needed for the Parquet export
+                import pyarrow.parquet
+            except ImportError:
+                print("WARNING: pyarrow is not installed; skipping the Parquet export.")
                 continue
-    return dashboard_content
+            table = pyarrow.Table.from_pylist(list(iter_export_rows(index)),
+                                              schema=pyarrow.schema([(column, pyarrow.int64() if column == 'revid' else pyarrow.string())
+                                                                     for column in EXPORT_COLUMNS]))
+            pyarrow.parquet.write_table(table, temp_path)
+        else:
+            raise ValueError(f"Unknown export format '{export_format}'. Choose from: {', '.join(EXPORT_FORMATS)}.")
+        os.replace(temp_path, path)
+        written.append(path)
+    return written
 
-def main():
-    """Main execution function."""
+class WorktreeWriter:
+    """
+    Writes backup files into the working tree on a thread pool, skipping files whose content is
+    already identical (so unchanged files keep their mtime and git status stays fast). Each write
+    goes to a temp file in the git dir and is renamed into place, so a crash never leaves a
+    half-written file, or a stray temp file that 'git add' would pick up. At most
+    MAX_PENDING_WRITES texts are queued; callers block beyond that.
+    """
+
+    def __init__(self, repo_path, workers=WRITE_WORKERS, max_pending=MAX_PENDING_WRITES):
+        self.repo_path = repo_path
+        self.temp_dir = git_plumbing.git_dir(repo_path) # Same filesystem, so os.replace is atomic
+        umask = os.umask(0)
+        os.umask(umask)
+        self.file_mode = 0o666 & ~umask # What open() would give a new file; mkstemp always uses 0600
+        self.written, self.unchanged = 0, 0
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backup-write')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._futures = []
+
+    def __call__(self, relative_path, text):
+        self._slots.acquire()
+        future = self._pool.submit(self._write, relative_path, text)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _write(self, relative_path, text):
+        data = text.encode('utf-8')
+        file_path = os.path.join(self.repo_path, relative_path)
+        if self._is_unchanged(file_path, data):
+            with self._lock:
+                self.unchanged += 1
+            return
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.temp_dir, prefix='vlor-backup-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(temp_path, self.file_mode)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        with self._lock:
+            self.written += 1
+
+    @staticmethod
+    def _is_unchanged(file_path, data):
+        try:
+            if os.stat(file_path).st_size != len(data): # Cheap rejection before reading
+                return False
+            with open(file_path, 'rb') as f:
+                return f.read() == data
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        """Waits for all writes and re-raises the first failure."""
+        self._pool.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+        print(f"Backup files: {self.written} written, {self.unchanged} unchanged.")
+
+def export_vlor_pages(vlor_pages, index, write_file):
+    """
+    Writes each page's raw .mw backup via write_file(repo_relative_path, text) and adds it to the
+    loop index as pages stream in, so page text is never held for more than one page at a time.
+    Returns the exported titles.
+    """
+    titles = []
+    for page in vlor_pages:
+        write_file(f"{VLOR_FOLDER_NAME}/{generate_filename_from_title(page.title())}", page.text)
+        index.update_page(page.title(), page.latest_revision_id, page.text)
+        titles.append(page.title())
+    return titles
+
+# --- Incremental Mode ---
+
+def get_watermark_path():
+    """The watermark lives in the private clone's git directory: local state that is never committed."""
+    return os.path.join(git_plumbing.git_dir(PRIVATE_REPO_PATH), WATERMARK_FILENAME)
+
+def load_watermark():
+    """Returns the saved watermark dict, or None if no previous run was recorded."""
+    try:
+        with open(get_watermark_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_watermark(run_started, pending_branch):
+    """
+    Records the start time of a completed run so the next run only looks at later changes, and the
+    backup branch whose pull request may still be open, so the next run builds on top of it.
+    """
+    with open(get_watermark_path(), 'w', encoding='utf-8') as f:
+        json.dump({"timestamp": run_started.isoformat(), "pending_branch": pending_branch}, f)
+
+def find_pending_branch(watermark):
+    """
+    Returns the previous run's backup branch if it is still on origin and not merged into main, else None.
+    Call after fetching. The watermark has already moved past that branch's changes, so a new backup
+    must build on it rather than on main, or an incremental run would drop them.
+    """
+    branch = (watermark or {}).get("pending_branch")
+    if not branch:
+        return None
+    remote_ref = f"refs/remotes/origin/{branch}"
+    if subprocess.run(['git', 'rev-parse', '--verify', '--quiet', remote_ref], capture_output=True, cwd=PRIVATE_REPO_PATH).returncode != 0:
+        return None # Merged and deleted
+    merged = subprocess.run(['git', 'merge-base', '--is-ancestor', remote_ref, 'refs/remotes/origin/main'],
+                            capture_output=True, cwd=PRIVATE_REPO_PATH).returncode == 0
+    return None if merged else branch
+
+def get_changed_vlor_pages(site, watermark, executor=None):
+    """
+    Returns the VLOR pages edited since the watermark, or None if the watermark is
+    older than the wiki's recent-changes retention.
+    """
+    since = pywikibot.Timestamp.fromISOformat(watermark["timestamp"])
+    if datetime.now(timezone.utc) - since.replace(tzinfo=timezone.utc) > timedelta(days=RECENT_CHANGES_MAX_AGE_DAYS):
+        print(f"Watermark {watermark['timestamp']} is older than the recent changes window. Falling back to a full backup.")
+        return None
+
+    print(f"Querying for VLOR pages changed since {watermark['timestamp']}...")
+    members = {page.title(): page for page in vlor_discovery.iter_category_members(site, DISCOVERY_CATEGORIES)}
+    namespaces = sorted({page.namespace().id for page in members.values()})
+    changed_titles = set()
+    if members:
+        for change in site.recentchanges(start=since, reverse=True, namespaces=namespaces):
+            if change.get("title") in members:
+                changed_titles.add(change["title"])
+    changed_pages = list(vlor_discovery.preload_pages(
+        [members[title] for title in sorted(changed_titles)], PRELOAD_GROUP_SIZE, executor=executor
+    ))
+    print(f"Changed VLOR pages since last run: {len(changed_pages)}.")
+    return changed_pages
+
+def run_backup(args, export_formats, executor):
+    """Exports the pages, commits them to a backup branch and opens or updates its pull request."""
     print("="*60 + "\nREMINDER: The GitHub PAT has a 90-day expiration.\n" + "="*60)
     
     print(f"--- Starting Private VLOR Backup @ {datetime.now()} ---")
@@ -104,56 +321,134 @@ def main():
         print(f"ERROR: GITHUB_TOKEN not found in {ENV_FILE_PATH}", file=sys.stderr)
         sys.exit(1)
 
-    site = pywikibot.Site()
-    site.login()
-    vlor_pages = get_vlor_pages_from_categories(site)
-    
-    print("\n--- Generating content from wiki... ---")
-    dashboard_text = generate_dashboard(vlor_pages)
+    try:
+        site = wiki_mirror.get_site(args.mirror)
+    except wiki_mirror.MirrorError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.incremental and wiki_mirror.is_mirror(site):
+        print("ERROR: --incremental reads the wiki's recent changes, which a mirror does not have.", file=sys.stderr)
+        sys.exit(1)
+    run_started = site.server_time()
+
+    vlor_pages = None
+    saved_watermark = load_watermark() # Read in full runs too, for the pending branch
+    watermark = saved_watermark if args.incremental else None
+    if args.incremental and watermark is None:
+        print("No watermark found. Running a full backup to establish one.")
+    if watermark:
+        vlor_pages = get_changed_vlor_pages(site, watermark, executor)
+        if vlor_pages is not None and not vlor_pages:
+            save_watermark(run_started, watermark.get("pending_branch"))
+            print("No VLOR changes since the last run. Exiting backup process.")
+            sys.exit(0)
+    incremental = vlor_pages is not None
+    # The dashboard is rendered from the loop index, so an incremental run needs one covering every page
+    index = vlor_index.VLORIndex.load() or vlor_index.VLORIndex()
+    if incremental and not index.pages:
+        print("No VLOR index found; exporting all VLOR pages to rebuild it.")
+        incremental = False
+    if not incremental:
+        vlor_pages = iter_vlor_pages_from_categories(site, executor) # Streamed: fetched while exporting
 
     print("\n--- Processing Private MCT Repository... ---")
     timestamp = datetime.now().strftime('%Y-%m-%d-%H%M')
-    branch_name = f"auto-backup/{timestamp}"
-    run_command(['git', 'fetch', 'origin'], cwd=PRIVATE_REPO_PATH)
-    run_command(['git', 'checkout', 'origin/main', '-b', branch_name], cwd=PRIVATE_REPO_PATH)
-    
-    # Backup raw VLOR files
-    target_dir = os.path.join(PRIVATE_REPO_PATH, VLOR_FOLDER_NAME)
-    os.makedirs(target_dir, exist_ok=True)
-    for page in vlor_pages:
-        file_name = generate_filename_from_title(page.title())
-        file_path = os.path.join(target_dir, file_name)
-        with open(file_path, 'w', encoding='utf-8') as f: f.write(page.text)
-        
-    # Generate and write the dashboard file to the private repo
-    dashboard_path = os.path.join(PRIVATE_REPO_PATH, DASHBOARD_FILENAME)
-    with open(dashboard_path, 'w', encoding='utf-8') as f: f.write(dashboard_text)
-    
-    status_result = subprocess.run(['git', 'status', '--porcelain'], capture_output=True, text=True, cwd=PRIVATE_REPO_PATH)
-    if not status_result.stdout.strip():
-        print("No file changes detected. Exiting backup process.")
-        run_command(['git', 'checkout', 'main'], cwd=PRIVATE_REPO_PATH)
-        run_command(['git', 'branch', '-D', branch_name], cwd=PRIVATE_REPO_PATH)
-        sys.exit(0)
-    
-    run_command(['git', 'add', f'{VLOR_FOLDER_NAME}/'], cwd=PRIVATE_REPO_PATH)
-    run_command(['git', 'add', DASHBOARD_FILENAME], cwd=PRIVATE_REPO_PATH)
-    
     commit_message = f"docs(VLORs): Automated backup and dashboard update for {timestamp}"
-    run_command(['git', 'commit', '-m', commit_message], cwd=PRIVATE_REPO_PATH)
+    run_command(['git', 'fetch', '--prune', 'origin'], cwd=PRIVATE_REPO_PATH)
+    # While the last backup's pull request is open, add to its branch (and so to that PR) instead of main
+    pending_branch = find_pending_branch(saved_watermark)
+    branch_name = pending_branch or f"auto-backup/{timestamp}"
+    base_ref = f"refs/remotes/origin/{pending_branch}" if pending_branch else 'refs/remotes/origin/main'
+    if pending_branch:
+        print(f"Pull request for {pending_branch} is not merged yet; adding this backup to it.")
+    if args.plumbing:
+        # Build the commit in the object store: the clone's checkout and working tree are never touched
+        builder = git_plumbing.TreeCommitBuilder(PRIVATE_REPO_PATH, base_ref)
+        write_file = lambda relative_path, text: builder.add_file(relative_path, text.encode('utf-8'))
+    else:
+        run_command(['git', 'checkout', base_ref, '-b', branch_name], cwd=PRIVATE_REPO_PATH)
+        write_file = WorktreeWriter(PRIVATE_REPO_PATH)
+
+    # Backup raw VLOR files, indexing each page as it streams in
+    print("\n--- Exporting VLOR pages from wiki... ---")
+    exported_titles = export_vlor_pages(vlor_pages, index, write_file)
+    if not args.plumbing:
+        write_file.close()
+    if not incremental:
+        print(f"Total unique VLOR pages found: {len(exported_titles)}.")
+        index.retain_pages(exported_titles)
+
+    # Generate the dashboard and loop exports (into a scratch dir when building the commit directly)
+    print("\n--- Generating dashboard... ---")
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        output_dir = scratch_dir if args.plumbing else PRIVATE_REPO_PATH
+        write_dashboard(os.path.join(output_dir, DASHBOARD_FILENAME), index, get_fragment_cache())
+        export_paths = write_loop_exports(os.path.join(output_dir, os.path.splitext(DASHBOARD_FILENAME)[0]), index, export_formats)
+        if args.plumbing:
+            for path in [os.path.join(output_dir, DASHBOARD_FILENAME), *export_paths]:
+                with open(path, 'rb') as f:
+                    builder.add_file(os.path.basename(path), f.read())
+    index.save() # Lets preflight_check resolve loops without a category scan
+
+    if args.plumbing:
+        commit = builder.commit(f"refs/heads/{branch_name}", commit_message)
+        if commit is None:
+            print("No file changes detected. Exiting backup process.")
+            save_watermark(run_started, pending_branch)
+            sys.exit(0)
+        print(f"Created commit {commit} with {len(builder.changed_paths)} changed file(s).")
+    else:
+        status_result = subprocess.run(['git', 'status', '--porcelain'], capture_output=True, text=True, cwd=PRIVATE_REPO_PATH)
+        if not status_result.stdout.strip():
+            print("No file changes detected. Exiting backup process.")
+            run_command(['git', 'checkout', 'main'], cwd=PRIVATE_REPO_PATH)
+            run_command(['git', 'branch', '-D', branch_name], cwd=PRIVATE_REPO_PATH)
+            save_watermark(run_started, pending_branch)
+            sys.exit(0)
+
+        run_command(['git', 'add', f'{VLOR_FOLDER_NAME}/'], cwd=PRIVATE_REPO_PATH)
+        run_command(['git', 'add', DASHBOARD_FILENAME, *(os.path.basename(path) for path in export_paths)], cwd=PRIVATE_REPO_PATH)
+        run_command(['git', 'commit', '-m', commit_message], cwd=PRIVATE_REPO_PATH)
     
     repo_url_private = f"https://{github_token}@github.com/IsidoreLands/Isidore-Operations-MCT.git"
-    run_command(['git', 'push', repo_url_private, branch_name], cwd=PRIVATE_REPO_PATH)
+    run_command(['git', 'push', repo_url_private, f"refs/heads/{branch_name}:refs/heads/{branch_name}"], cwd=PRIVATE_REPO_PATH)
     
-    pr_title = f"Automated VLOR & Dashboard Backup: {timestamp}"
-    pr_body = "Automated periodic backup of VLOR pages and the Operations Dashboard. Please review and merge."
-    auth_env = os.environ.copy(); auth_env['GH_TOKEN'] = github_token
-    run_command(['gh', 'pr', 'create', '--title', pr_title, '--body', pr_body, '--base', 'main', '--head', branch_name], cwd=PRIVATE_REPO_PATH, env=auth_env)
+    if not pending_branch: # Otherwise the push above already updated the open pull request
+        pr_title = f"Automated VLOR & Dashboard Backup: {timestamp}"
+        pr_body = "Automated periodic backup of VLOR pages and the Operations Dashboard. Please review and merge."
+        auth_env = os.environ.copy(); auth_env['GH_TOKEN'] = github_token
+        run_command(['gh', 'pr', 'create', '--title', pr_title, '--body', pr_body, '--base', 'main', '--head', branch_name], cwd=PRIVATE_REPO_PATH, env=auth_env)
     
-    run_command(['git', 'checkout', 'main'], cwd=PRIVATE_REPO_PATH)
-    run_command(['git', 'branch', '-D', branch_name], cwd=PRIVATE_REPO_PATH)
+    if args.plumbing:
+        run_command(['git', 'update-ref', '-d', f"refs/heads/{branch_name}"], cwd=PRIVATE_REPO_PATH)
+    else:
+        run_command(['git', 'checkout', 'main'], cwd=PRIVATE_REPO_PATH)
+        run_command(['git', 'branch', '-D', branch_name], cwd=PRIVATE_REPO_PATH)
+    save_watermark(run_started, branch_name) # Only now: run_command exits before this if the push or PR failed
 
     print("\n--- Private Backup Protocol Complete ---")
 
+def main():
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Back up VLOR pages and the Operations Dashboard to the private MCT repository.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-export VLOR pages changed since the last successful run (watermark in the private repo's .git dir).")
+    parser.add_argument('--plumbing', action='store_true',
+                        help="Build the backup commit directly in the object store (git fast-import) and push it, without "
+                             "checking out a branch or writing the working tree. Safe to run while the clone is in use.")
+    parser.add_argument('--export-formats', default=",".join(DEFAULT_EXPORT_FORMATS),
+                        help=f"Comma-separated machine-readable loop exports written next to the dashboard ({', '.join(EXPORT_FORMATS)}; "
+                             f"'none' to disable). Default: {','.join(DEFAULT_EXPORT_FORMATS)}.")
+    parser.add_argument('--mirror', help=f"Read pages from an offline wiki_mirror snapshot instead of the live wiki. Default: ${wiki_mirror.MIRROR_ENV_VAR} if set.")
+    parser.add_argument('--workers', type=int, default=wiki_executor.DEFAULT_WORKERS,
+                        help=f"Concurrent page downloads. Default: {wiki_executor.DEFAULT_WORKERS}.")
+    args = parser.parse_args()
+    export_formats = [] if args.export_formats == 'none' else [f.strip() for f in args.export_formats.split(',') if f.strip()]
+    unknown_formats = sorted(set(export_formats) - set(EXPORT_FORMATS))
+    if unknown_formats:
+        parser.error(f"--export-formats: unknown format(s) {', '.join(unknown_formats)}. Choose from: {', '.join(EXPORT_FORMATS)}.")
+    with wiki_executor.WikiExecutor(args.workers) as executor: # Shut down on every exit path, sys.exit included
+        run_backup(args, export_formats, executor)
+
 if __name__ == '__main__':
     main()
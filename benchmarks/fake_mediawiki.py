@@ -0,0 +1,554 @@
+# fake_mediawiki.py
+# Version 1.0
+# A local stand-in for the MediaWiki Action API, for benchmarks and offline runs.
+#
+# Serves the subset of api.php that pywikibot and the toolkit use (siteinfo,
+# userinfo, tokens, page/revision queries, allpages, categorymembers,
+# recentchanges, logevents and edit) from an in-memory wiki seeded with
+# synthetic VLOR, OLOGO and filler pages. The bot account is always logged in.
+# Latency and periodic "ratelimited" errors can be injected, and every request
+# is counted by action and module (GET /_stats, POST /_reset).
+#
+#   python3 benchmarks/fake_mediawiki.py --port 8765 --vlor-pages 200 --latency-ms 20
+#   # pywikibot: family_files['fakewiki'] = 'http://127.0.0.1:8765/w/api.php'
+
+import argparse
+import collections
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# --- CONFIGURATION ---
+API_PATH = '/w/api.php'
+SITE_NAME = 'FakeWiki'
+BOT_NAME = 'BenchBot'
+CSRF_TOKEN = 'benchmarkcsrftoken+\\'
+# Everything the seeded wiki needs; 3000/3001 mirror the production OODA WIKI namespace
+NAMESPACES = {
+    -2: 'Media', -1: 'Special', 0: '', 1: 'Talk', 2: 'User', 3: 'User talk', 4: SITE_NAME, 5: f'{SITE_NAME} talk',
+    6: 'File', 7: 'File talk', 8: 'MediaWiki', 9: 'MediaWiki talk', 10: 'Template', 11: 'Template talk',
+    12: 'Help', 13: 'Help talk', 14: 'Category', 15: 'Category talk', 3000: 'OODA WIKI', 3001: 'OODA WIKI talk',
+}
+OODA_NAMESPACE = 3000
+CATEGORY_NAMESPACE = 14
+CATEGORY_LINK_RE = re.compile(r'\[\[\s*Category\s*:\s*([^\]|\n]+)', re.IGNORECASE)
+MAX_LIMIT = 500 # apihighlimits, as for a bot account
+MAX_CONTENT_TITLES = 50 # Page text is capped per request like the real API
+SEED_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# Query submodules served here: name -> (prefix, usable as generator, extra parameters)
+LIMIT_PARAMETER = {"name": "limit", "type": "limit", "min": 1, "max": 500, "highmax": 5000}
+QUERY_MODULES = {
+    'siteinfo': ('si', False, [{"name": "prop", "type": ["general", "namespaces", "namespacealiases", "extensions", "rightsinfo"], "multi": True}]),
+    'userinfo': ('ui', False, [{"name": "prop", "type": ["blockinfo", "groups", "hasmsg", "ratelimits", "rights"], "multi": True}]),
+    'tokens': ('', False, [{"name": "type", "type": ["csrf", "login", "patrol", "rollback", "watch"], "multi": True}]),
+    'info': ('in', False, [{"name": "prop", "type": ["protection", "talkid", "url"], "multi": True, "limit": 50, "highlimit": 500}]),
+    'revisions': ('rv', True, [{"name": "prop", "type": ["ids", "flags", "timestamp", "user", "comment", "size", "sha1", "content", "contentmodel"], "multi": True},
+                               {"name": "slots", "multi": True}, LIMIT_PARAMETER]),
+    'categories': ('cl', True, [LIMIT_PARAMETER]),
+    # Requested by pywikibot's preloading; accepted and answered with nothing
+    'imageinfo': ('ii', True, [LIMIT_PARAMETER]),
+    'categoryinfo': ('ci', True, []),
+    'pageprops': ('pp', False, []),
+    'templates': ('tl', True, [LIMIT_PARAMETER, {"name": "namespace", "type": "namespace", "multi": True}]), # Seeded pages transclude nothing
+    'allpages': ('ap', True, [LIMIT_PARAMETER, {"name": "namespace", "type": "namespace"}, {"name": "from"}, {"name": "to"}, {"name": "prefix"}]),
+    'categorymembers': ('cm', True, [LIMIT_PARAMETER, {"name": "namespace", "type": "namespace", "multi": True}, {"name": "title"}]),
+    'recentchanges': ('rc', True, [LIMIT_PARAMETER, {"name": "namespace", "type": "namespace", "multi": True}, {"name": "start"}, {"name": "end"},
+                                        {"name": "show", "type": ["minor", "!minor", "bot", "!bot", "anon", "!anon", "redirect", "!redirect", "patrolled", "!patrolled"], "multi": True},
+                                        {"name": "type", "type": ["edit", "new", "log", "external", "categorize"], "multi": True}]),
+    'logevents': ('le', False, [LIMIT_PARAMETER, {"name": "namespace", "type": "namespace"},
+                                {"name": "type", "type": ["", "create", "delete", "move", "upload"]}]),
+}
+QUERY_GROUPS = {'meta': ['siteinfo', 'userinfo', 'tokens'], 'prop': ['info', 'revisions', 'categories', 'imageinfo', 'categoryinfo', 'pageprops', 'templates'],
+                'list': ['allpages', 'categorymembers', 'recentchanges', 'logevents']}
+ACTION_MODULES = ['query', 'edit', 'login', 'logout', 'paraminfo']
+
+def api_timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def parse_timestamp(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+class APIError(Exception):
+    def __init__(self, code, info, **extra):
+        super().__init__(info)
+        self.code, self.info, self.extra = code, info, extra
+
+# --- Synthetic Content ---
+
+def vlor_page_text(operation, loops, page_bytes, category):
+    lines = [f"This is the Virtuous Loop of Reflection for Operation {operation}.", ""]
+    for number in range(1, loops + 1):
+        lines.append(f"== Loop {number} ==")
+        lines.append("{{IsidoreOodaVLOR\n"
+                     f"|loop_id={operation.upper()}-L{number:03d}\n"
+                     f"|operation={operation}\n"
+                     f"|status={'Active' if number % 3 else 'Planned'}\n"
+                     f"|human_title=Loop {number} of {operation}\n"
+                     f"|description=Observe, orient, decide and act on step {number} of {operation}.\n"
+                     f"|resources=[[OODA_WIKI:WikiProject {operation}/Resources]]\n"
+                     "}}")
+    text = "\n".join(lines)
+    filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore. "
+    if len(text) < page_bytes:
+        text += "\n\n== Notes ==\n" + (filler * (page_bytes // len(filler) + 1))[:page_bytes - len(text)]
+    return f"{text}\n[[Category:{category}]]"
+
+def ologo_page_text(loop_id, page_bytes):
+    text = (f"== Session Context: {loop_id} ==\n'''Loop ID:''' {loop_id}\n\n"
+            "== Log Summary ==\n(To be updated post-completion with tools built, challenges, changes, and costs)\n")
+    return text + "x" * max(0, page_bytes - len(text))
+
+# --- The Wiki ---
+
+class FakeWiki:
+    """In-memory pages, revisions, logs and request statistics. All access is under one lock."""
+
+    def __init__(self, latency_ms=0, rate_limit_every=0):
+        self.latency = latency_ms / 1000.0
+        self.rate_limit_every = rate_limit_every
+        self.lock = threading.Lock()
+        self.pages = {} # title -> {"pageid", "ns", "revid", "timestamp", "text", "categories", "redirect"}
+        self.recent_changes = [] # {"type", "ns", "title", "pageid", "revid", "old_revid", "timestamp"}
+        self.log_events = [] # {"logid", "type", "action", "ns", "title", "pageid", "timestamp", "params"}
+        self.next_pageid, self.next_revid = 1, 1
+        self.clock = SEED_START
+        self.reset_stats()
+
+    # --- Statistics ---
+
+    def reset_stats(self):
+        self.stats = collections.Counter()
+        self.bytes_sent = 0
+        self.injected_errors = 0
+        self.limited_requests = 0
+
+    def stats_snapshot(self):
+        return {"requests": self.stats['requests'], "by_module": {k: v for k, v in sorted(self.stats.items()) if k != 'requests'},
+                "bytes_sent": self.bytes_sent, "injected_rate_limits": self.injected_errors}
+
+    # --- Titles ---
+
+    def normalize(self, title):
+        """Returns (namespace_id, canonical full title) the way MediaWiki normalizes a title."""
+        title = re.sub(r'[ _]+', ' ', title).strip()
+        namespace, name = 0, title
+        if ':' in title:
+            prefix, rest = title.split(':', 1)
+            for namespace_id, namespace_name in NAMESPACES.items():
+                if namespace_id and namespace_name.casefold() == prefix.strip().casefold():
+                    namespace, name = namespace_id, rest.strip()
+                    break
+        name = name[:1].upper() + name[1:]
+        return namespace, f"{NAMESPACES[namespace]}:{name}" if namespace else name
+
+    def _tick(self):
+        self.clock += timedelta(seconds=1)
+        return api_timestamp(self.clock)
+
+    # --- Writes ---
+
+    def save(self, title, text, summary='', allow_create=True, allow_overwrite=True):
+        namespace, title = self.normalize(title)
+        page = self.pages.get(title)
+        if page is None and not allow_create:
+            raise APIError('missingtitle', "The page you specified doesn't exist.")
+        if page is not None and not allow_overwrite:
+            raise APIError('articleexists', "The article you tried to create has been created already.")
+        if page is not None and page['text'] == text:
+            return page, True
+        timestamp, revid = self._tick(), self.next_revid
+        self.next_revid += 1
+        old_revid = page['revid'] if page else 0
+        if page is None:
+            page = {"pageid": self.next_pageid, "ns": namespace}
+            self.next_pageid += 1
+            self.pages[title] = page
+            self.log_events.append({"logid": len(self.log_events) + 1, "type": "create", "action": "create", "ns": namespace,
+                                    "title": title, "pageid": page['pageid'], "timestamp": timestamp, "params": {}})
+        page.update(revid=revid, timestamp=timestamp, text=text, redirect=text.lstrip().upper().startswith('#REDIRECT'),
+                    categories=sorted({self.normalize(f"Category:{c.strip()}")[1] for c in CATEGORY_LINK_RE.findall(text)}))
+        self.recent_changes.append({"type": "new" if not old_revid else "edit", "ns": namespace, "title": title,
+                                    "pageid": page['pageid'], "revid": revid, "old_revid": old_revid, "timestamp": timestamp})
+        return page, False
+
+    def seed(self, vlor_pages=50, loops_per_page=10, page_bytes=8000, ologo_pages=50, filler_pages=500):
+        """Creates the synthetic wiki. Seed edits are stamped one second apart from SEED_START; later edits from now."""
+        for number in range(vlor_pages):
+            operation = f"Operation{number:04d}"
+            category = 'Operation VLOR' if number % 2 == 0 else 'Initiative VLOR'
+            self.save(f"OODA WIKI:WikiProject {operation}/VLOR", vlor_page_text(operation, loops_per_page, page_bytes, category))
+        for number in range(ologo_pages):
+            day = SEED_START + timedelta(days=number // 5)
+            session = ['Morning', 'Noon', 'Afternoon', 'Evening', 'Night'][number % 5]
+            loop_id = f"OPERATION{number % max(1, vlor_pages):04d}-L001"
+            self.save(f"OODA WIKI:WikiProject Isidore/OLOGO/{day:%Y-%m-%d}/{session}", ologo_page_text(loop_id, page_bytes // 4))
+        for number in range(filler_pages):
+            self.save(f"OODA WIKI:Page {number:05d}", f"Filler page {number}.\n" + "y" * (page_bytes // 8))
+        self.save("OODA WIKI:WikiProject Isidore/Alcuin/Master Document Index", "; VLORs:\n")
+        self.save("Category:Operation VLOR", "VLOR pages for operations.")
+        self.save("Category:Initiative VLOR", "VLOR pages for initiatives.")
+        self.clock = max(self.clock, datetime.now(timezone.utc))
+
+    # --- Request Handling ---
+
+    def handle(self, params):
+        """Answers one api.php request (params: {name: value}) with a JSON-ready dict."""
+        response = self._handle(params)
+        return response if params.get('formatversion') == '2' else to_formatversion_1(response, 'indexpageids' in params)
+
+    def _handle(self, params):
+        action = params.get('action', 'help')
+        modules = [action]
+        if action == 'query':
+            modules = [f"query:{m}" for key in ('meta', 'prop', 'list', 'generator') for m in params.get(key, '').split('|') if m] or ['query']
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.stats['requests'] += 1
+            for module in modules:
+                self.stats[module] += 1
+            if self.rate_limit_every and not all(m.startswith('query:') and m[6:] in ('siteinfo', 'userinfo', 'tokens') for m in modules):
+                self.limited_requests += 1
+                if self.limited_requests % self.rate_limit_every == 0:
+                    self.injected_errors += 1
+                    return {"error": {"code": "ratelimited", "info": "You've exceeded your rate limit. Please wait some time and try again."}}
+            try:
+                if action == 'query':
+                    return self.query(params)
+                if action == 'edit':
+                    return self.edit(params)
+                if action == 'paraminfo':
+                    return {"paraminfo": {"modules": [paraminfo(path) for path in params.get('modules', '').split('|') if path]}}
+                if action in ('login', 'clientlogin', 'logout'):
+                    return {action: {"result": "Success", "lgusername": BOT_NAME, "status": "PASS", "username": BOT_NAME}}
+                raise APIError('badvalue', f'Unrecognized value for parameter "action": {action}.')
+            except APIError as e:
+                return {"error": {"code": e.code, "info": e.info, **e.extra}}
+
+    def edit(self, params):
+        if params.get('token') != CSRF_TOKEN:
+            raise APIError('badtoken', 'Invalid CSRF token.')
+        _, title = self.normalize(params['title'])
+        page = self.pages.get(title)
+        base = params.get('basetimestamp')
+        if page is not None and base and parse_timestamp(base) < parse_timestamp(page['timestamp']):
+            raise APIError('editconflict', 'Edit conflict.')
+        if 'text' in params:
+            text = params['text']
+        else:
+            text = params.get('prependtext', '') + (page['text'] if page else '') + params.get('appendtext', '')
+        old_revid = page['revid'] if page else 0
+        page, unchanged = self.save(title, text, params.get('summary', ''), allow_create='nocreate' not in params,
+                                    allow_overwrite='createonly' not in params)
+        result = {"result": "Success", "pageid": page['pageid'], "title": title, "contentmodel": "wikitext"}
+        if unchanged:
+            result["nochange"] = True
+        else:
+            result.update(oldrevid=old_revid, newrevid=page['revid'], newtimestamp=page['timestamp'])
+            if not old_revid:
+                result["new"] = True
+        return {"edit": result}
+
+    def query(self, params):
+        result, response = {}, {"batchcomplete": True}
+        metas = params.get('meta', '').split('|')
+        if 'siteinfo' in metas:
+            result.update(self.siteinfo(params))
+        if 'userinfo' in metas:
+            result['userinfo'] = {"id": 1, "name": BOT_NAME, "groups": ["*", "user", "autoconfirmed", "bot"],
+                                  "rights": ["read", "edit", "createpage", "bot", "apihighlimits", "writeapi", "noratelimit"],
+                                  "ratelimits": {}, "messages": False}
+        if 'tokens' in metas:
+            result['tokens'] = {f"{kind}token": CSRF_TOKEN for kind in params.get('type', 'csrf').split('|')}
+        for list_name in params.get('list', '').split('|'):
+            if list_name:
+                items, continuation = self.list_module(list_name, params, '')
+                result[list_name] = items
+                if continuation:
+                    response.setdefault('continue', {"continue": "-||"}).update(continuation)
+        titles = self.page_set(params, result, response)
+        if titles is not None:
+            result['pages'] = self.page_props(titles, params)
+        if result:
+            response['query'] = result
+        return response
+
+    def siteinfo(self, params):
+        props = params.get('siprop', 'general').split('|')
+        info = {}
+        if 'general' in props:
+            info['general'] = {
+                "mainpage": "Main Page", "base": "http://localhost/wiki/Main_Page", "sitename": SITE_NAME,
+                "generator": "MediaWiki 1.39.0", "phpversion": "8.1.0", "phpsapi": "fpm-fcgi", "dbtype": "sqlite",
+                "case": "first-letter", "lang": "en", "fallback": [], "rtl": False, "fallback8bitEncoding": "windows-1252",
+                "writeapi": True, "timezone": "UTC", "timeoffset": 0, "articlepath": "/wiki/$1", "scriptpath": "/w",
+                "script": "/w/index.php", "server": "http://localhost", "servername": "localhost", "wikiid": "fakewiki",
+                "time": api_timestamp(datetime.now(timezone.utc)), "maxarticlesize": 2097152, "maxuploadsize": 104857600,
+                "legaltitlechars": " %!\"$&'()*,\\-.\\/0-9:;=?@A-Z\\\\^_`a-z~\\x80-\\xFF+", "invalidusernamechars": "@:",
+                "categorycollation": "uppercase", "linkprefixcharset": "", "linktrail": "/^([a-z]+)(.*)$/sD",
+                "thumblimits": {"0": 120, "1": 150, "2": 180}, "imagelimits": {"0": {"width": 320, "height": 240}},
+                "magiclinks": {"ISBN": False, "PMID": False, "RFC": False},
+            }
+        if 'namespaces' in props:
+            info['namespaces'] = {str(namespace_id): {
+                "id": namespace_id, "case": "first-letter", "name": name, "canonical": name, "subpages": namespace_id > 0,
+                "content": namespace_id in (0, OODA_NAMESPACE), "nonincludable": False} for namespace_id, name in NAMESPACES.items()}
+        if 'namespacealiases' in props:
+            info['namespacealiases'] = []
+        for prop in props:
+            info.setdefault(prop, [])
+        return info
+
+    # --- Lists and Generators ---
+
+    def list_module(self, name, params, prefix):
+        """Returns (items, continue params) for a list module; prefix is 'g' when used as a generator."""
+        if name == 'templates':
+            return [], {}
+        short = {'allpages': 'ap', 'categorymembers': 'cm', 'recentchanges': 'rc', 'logevents': 'le'}.get(name)
+        if short is None:
+            raise APIError('badvalue', f'Unrecognized value for parameter "list": {name}.')
+        p = lambda key, default=None: params.get(f"{prefix}{short}{key}", default)
+        limit_param = p('limit', '10')
+        limit = MAX_LIMIT if limit_param == 'max' else min(int(limit_param), MAX_LIMIT)
+        if name == 'allpages':
+            namespace = int(p('namespace', '0'))
+            start, until, title_prefix = p('from'), p('to'), p('prefix')
+            redirects = p('filterredir', 'all')
+            entries = sorted((t.split(':', 1)[1] if namespace else t, t) for t, page in self.pages.items()
+                             if page['ns'] == namespace and (redirects == 'all' or page['redirect'] == (redirects == 'redirects')))
+            if p('dir') == 'descending':
+                entries.reverse()
+            items = [self.pages[t] | {"title": t} for n, t in entries
+                     if (not start or (n >= start.replace('_', ' ') if p('dir') != 'descending' else n <= start.replace('_', ' ')))
+                     and (not until or n <= until.replace('_', ' ')) and (not title_prefix or n.startswith(title_prefix.replace('_', ' ')))]
+        elif name == 'categorymembers':
+            _, category = self.normalize(p('title'))
+            namespaces = {int(n) for n in p('namespace', '').split('|') if n}
+            types = set(p('type', 'page|subcat|file').split('|'))
+            items = [self.pages[t] | {"title": t} for t in sorted(self.pages) if category in self.pages[t]['categories']
+                     and (not namespaces or self.pages[t]['ns'] in namespaces)
+                     and ('subcat' if self.pages[t]['ns'] == CATEGORY_NAMESPACE else 'file' if self.pages[t]['ns'] == 6 else 'page') in types]
+        elif name == 'recentchanges':
+            items = self._time_window(self.recent_changes, p('start'), p('end'), p('dir', 'older'))
+            namespaces = {int(n) for n in p('namespace', '').split('|') if n}
+            items = [dict(change) for change in items if not namespaces or change['ns'] in namespaces]
+        else:
+            items = self._time_window(self.log_events, p('start'), p('end'), p('dir', 'older'))
+            items = [dict(event) for event in items if (not p('type') or event['type'] == p('type'))
+                     and (p('namespace') is None or event['ns'] == int(p('namespace')))]
+        offset = int(p('continue', '0'))
+        window = items[offset:offset + limit]
+        continuation = {f"{prefix}{short}continue": str(offset + limit)} if offset + limit < len(items) else {}
+        if name in ('allpages', 'categorymembers'):
+            window = [{"pageid": page['pageid'], "ns": page['ns'], "title": page['title']} for page in window]
+        return window, continuation
+
+    @staticmethod
+    def _time_window(entries, start, end, direction):
+        entries = sorted(entries, key=lambda e: e['timestamp'], reverse=direction != 'newer')
+        if direction == 'newer':
+            return [e for e in entries if (not start or e['timestamp'] >= start) and (not end or e['timestamp'] <= end)]
+        return [e for e in entries if (not start or e['timestamp'] <= start) and (not end or e['timestamp'] >= end)]
+
+    def page_set(self, params, result, response):
+        """Resolves titles=, pageids= or generator= to a list of normalized titles, or None if none was given."""
+        if 'generator' in params:
+            items, continuation = self.list_module(params['generator'], params, 'g')
+            if continuation:
+                response.setdefault('continue', {"continue": "g" + params['generator'][:2] + "||"}).update(continuation)
+            return [item['title'] for item in items]
+        if 'pageids' in params:
+            wanted = {int(pageid) for pageid in params['pageids'].split('|')}
+            return [title for title, page in self.pages.items() if page['pageid'] in wanted]
+        if 'titles' in params:
+            titles, normalized = [], []
+            for title in params['titles'].split('|'):
+                _, canonical = self.normalize(title)
+                if canonical != title:
+                    normalized.append({"fromencoded": False, "from": title, "to": canonical})
+                titles.append(canonical)
+            if normalized:
+                result['normalized'] = normalized
+            return titles
+        return None
+
+    def page_props(self, titles, params):
+        props = set(params.get('prop', '').split('|'))
+        rvprops = set(params.get('rvprop', 'ids|timestamp|flags|comment|user').split('|'))
+        if 'revisions' in props and 'content' in rvprops and len(titles) > MAX_CONTENT_TITLES:
+            raise APIError('toomanyvalues', f"Too many values supplied for parameter \"titles\". The limit is {MAX_CONTENT_TITLES}.")
+        pages = []
+        for title in titles:
+            page = self.pages.get(title)
+            if page is None:
+                namespace, _ = self.normalize(title)
+                pages.append({"ns": namespace, "title": title, "missing": True})
+                continue
+            entry = {"pageid": page['pageid'], "ns": page['ns'], "title": title}
+            if 'info' in props:
+                entry.update(contentmodel="wikitext", pagelanguage="en", pagelanguagehtmlcode="en", pagelanguagedir="ltr",
+                             touched=page['timestamp'], lastrevid=page['revid'], length=len(page['text'].encode('utf-8')))
+                if page['redirect']:
+                    entry['redirect'] = True
+            if 'revisions' in props:
+                revision = {"revid": page['revid'], "parentid": 0, "minor": False, "user": BOT_NAME, "userid": 1,
+                            "timestamp": page['timestamp'], "comment": "", "contentmodel": "wikitext"}
+                if 'sha1' in rvprops:
+                    revision['sha1'] = hashlib.sha1(page['text'].encode('utf-8')).hexdigest()
+                if 'size' in rvprops:
+                    revision['size'] = len(page['text'].encode('utf-8'))
+                if 'content' in rvprops:
+                    revision['slots'] = {"main": {"contentmodel": "wikitext", "contentformat": "text/x-wiki", "content": page['text']}}
+                entry['revisions'] = [revision]
+            if 'categories' in props:
+                entry['categories'] = [{"ns": CATEGORY_NAMESPACE, "title": category} for category in page['categories']]
+            pages.append(entry)
+        return pages
+
+def to_formatversion_1(value, index_page_ids=False):
+    """
+    Converts a formatversion=2 response to the legacy format pywikibot still requests for most queries:
+    pages keyed by id, booleans as present-and-empty, slot content under '*'.
+    """
+    if isinstance(value, list):
+        return [to_formatversion_1(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    converted = {}
+    for key, item in value.items():
+        if item is True:
+            converted[key] = ""
+        elif item is False:
+            continue
+        elif key == 'content' and 'contentformat' in value:
+            converted['*'] = item
+        elif key == 'pages' and isinstance(item, list):
+            pages = {}
+            for missing_number, page in enumerate(item, start=1):
+                pages[str(page.get('pageid', -missing_number))] = to_formatversion_1(page)
+            converted[key] = pages
+            if index_page_ids:
+                converted['pageids'] = list(pages)
+        else:
+            converted[key] = to_formatversion_1(item, index_page_ids)
+    return converted
+
+# --- Module Descriptions ---
+
+def paraminfo(path):
+    """The action=paraminfo description of one module path, with just the fields pywikibot reads."""
+    if path == 'main':
+        return {"name": "main", "path": "main", "classname": "ApiMain", "group": "action", "prefix": "", "parameters": [
+            {"name": "action", "type": ACTION_MODULES, "submodules": {action: action for action in ACTION_MODULES}},
+            {"name": "format", "type": ["json"], "submodules": {"json": "json"}},
+            {"name": "maxlag", "type": "integer"}]}
+    if path == 'query':
+        parameters = [{"name": group, "type": names, "multi": True, "limit": 50, "highlimit": 500,
+                       "submodules": {name: f"query+{name}" for name in names}} for group, names in QUERY_GROUPS.items()]
+        generators = [name for name, (_, is_generator, _) in QUERY_MODULES.items() if is_generator]
+        parameters.append({"name": "generator", "type": generators, "submodules": {name: f"query+{name}" for name in generators}})
+        parameters.extend({"name": name} for name in ('titles', 'pageids', 'revids', 'indexpageids', 'continue'))
+        return {"name": "query", "path": "query", "classname": "ApiQuery", "group": "action", "prefix": "", "parameters": parameters}
+    if path in ('edit', 'login', 'logout', 'paraminfo'):
+        return {"name": path, "path": path, "classname": f"Api{path.title()}", "group": "action", "prefix": "",
+                "mustbeposted": path != 'paraminfo', "parameters": [{"name": "title"}, {"name": "text"}, {"name": "token"}]}
+    name = path.split('+', 1)[-1]
+    if name not in QUERY_MODULES:
+        return {"name": name, "path": path, "missing": True}
+    prefix, is_generator, parameters = QUERY_MODULES[name]
+    group = next(group for group, names in QUERY_GROUPS.items() if name in names)
+    module = {"name": name, "path": f"query+{name}", "classname": f"ApiQuery{name.title()}", "group": group,
+              "prefix": prefix, "parameters": parameters}
+    if is_generator:
+        module["generator"] = True
+    return module
+
+# --- HTTP ---
+
+def make_handler(wiki):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle on, the client's delayed ACK adds ~40ms per request
+        disable_nagle_algorithm = True
+
+        def _respond(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            with wiki.lock:
+                wiki.bytes_sent += len(body)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _params(self, body=''):
+            query = parse_qs(urlparse(self.path).query, keep_blank_values=True)
+            query.update(parse_qs(body, keep_blank_values=True))
+            return {key: values[-1] for key, values in query.items()}
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/_stats':
+                with wiki.lock:
+                    snapshot = wiki.stats_snapshot()
+                return self._respond(snapshot)
+            if path != API_PATH:
+                return self._respond({"error": {"code": "notfound", "info": path}}, 404)
+            self._respond(wiki.handle(self._params()))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode('utf-8') if length else ''
+            path = urlparse(self.path).path
+            if path == '/_reset':
+                with wiki.lock:
+                    wiki.reset_stats()
+                return self._respond({"status": "ok"})
+            if path != API_PATH:
+                return self._respond({"error": {"code": "notfound", "info": path}}, 404)
+            self._respond(wiki.handle(self._params(body)))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(port=0, host='127.0.0.1', **options):
+    """Seeds a wiki and returns (server, api_url). The caller runs server.serve_forever()."""
+    seed_options = {key: options.pop(key) for key in ('vlor_pages', 'loops_per_page', 'page_bytes', 'ologo_pages', 'filler_pages') if key in options}
+    wiki = FakeWiki(**options)
+    wiki.seed(**seed_options)
+    wiki.reset_stats()
+    server = ThreadingHTTPServer((host, port), make_handler(wiki))
+    server.daemon_threads = True
+    return server, f"http://{host}:{server.server_address[1]}{API_PATH}"
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Serve a seeded, in-memory fake MediaWiki API.")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (0 picks a free one). Default: 8765.")
+    parser.add_argument('--vlor-pages', type=int, default=50)
+    parser.add_argument('--loops-per-page', type=int, default=10)
+    parser.add_argument('--page-bytes', type=int, default=8000, help="Approximate size of each VLOR page.")
+    parser.add_argument('--ologo-pages', type=int, default=50)
+    parser.add_argument('--filler-pages', type=int, default=500, help="Non-VLOR pages in the OODA WIKI namespace.")
+    parser.add_argument('--latency-ms', type=float, default=0, help="Delay added to every request.")
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="Answer every Nth non-meta request with 'ratelimited' (0: never).")
+    args = parser.parse_args()
+    server, api_url = serve(args.port, vlor_pages=args.vlor_pages, loops_per_page=args.loops_per_page, page_bytes=args.page_bytes,
+                            ologo_pages=args.ologo_pages, filler_pages=args.filler_pages, latency_ms=args.latency_ms,
+                            rate_limit_every=args.rate_limit_every)
+    print(api_url, flush=True) # First line of output: the harness reads the URL from here
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
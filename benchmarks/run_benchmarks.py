@@ -0,0 +1,314 @@
+# run_benchmarks.py
+# Version 1.0
+# End-to-end benchmarks of the toolkit's hot paths against fake_mediawiki.py.
+#
+# Starts a seeded fake wiki, then runs each benchmark in its own process (so
+# pywikibot, caches and peak memory start clean) with a throwaway toolkit cache
+# directory and pywikibot config. A benchmark's setup is untimed; the request
+# counters are reset before its timed body. For each benchmark the harness
+# reports API requests issued (total and per module), wall time and peak
+# Python memory (tracemalloc), and stores everything as JSON under
+# benchmarks/results/ so runs can be compared across versions.
+#
+#   python3 benchmarks/run_benchmarks.py                          # results/<git rev>.json
+#   python3 benchmarks/run_benchmarks.py --label v7 --vlor-pages 200 --latency-ms 20
+#   python3 benchmarks/run_benchmarks.py --only index_warm,page_tool_batch --compare benchmarks/results/v7.json
+#   python3 benchmarks/run_benchmarks.py --only index_cold --trace /tmp/traces   # plus a toolkit_trace profile per benchmark
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime, timezone
+
+# --- CONFIGURATION ---
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+TOOLKIT_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+FAMILY_NAME = 'fakewiki'
+# Benchmarks whose wall time moves by more than this against a baseline are flagged
+REGRESSION_THRESHOLD = 0.10
+USER_CONFIG_TEMPLATE = """\
+family_files['{family}'] = '{api_url}'
+family = '{family}'
+mylang = '{family}'
+usernames['{family}']['{family}'] = 'BenchBot'
+put_throttle = 0
+minthrottle = 0
+maxlag = 0
+retry_wait = 0
+retry_max = 0
+max_retries = 10
+noisysleep = 600
+"""
+
+# --- Benchmarks ---
+# Each returns the timed body as a callable after doing its (untimed) setup in the child process.
+
+def bench_index_cold(site, workdir):
+    """vlor_index.build_index with an empty revision cache: every VLOR page is downloaded and parsed."""
+    import vlor_index
+    return lambda: vlor_index.build_index(site)
+
+def bench_index_warm(site, workdir):
+    """vlor_index.build_index again: revids are unchanged, so texts come from the cache and nothing is re-parsed."""
+    import vlor_index
+    vlor_index.build_index(site)
+    return lambda: vlor_index.build_index(site)
+
+def bench_backup_export(site, workdir):
+    """backup_vlor_to_git's export: stream the VLOR pages into a worktree, then render the dashboard and loop exports."""
+    import backup_vlor_to_git as backup
+    import vlor_index
+    repo_path = os.path.join(workdir, 'mct')
+    subprocess.run(['git', 'init', '-q', repo_path], check=True)
+
+    def run():
+        index = vlor_index.VLORIndex()
+        write_file = backup.WorktreeWriter(repo_path)
+        titles = backup.export_vlor_pages(backup.iter_vlor_pages_from_categories(site), index, write_file)
+        write_file.close()
+        index.retain_pages(titles)
+        backup.write_dashboard(os.path.join(repo_path, backup.DASHBOARD_FILENAME), index, backup.get_fragment_cache())
+        backup.write_loop_exports(os.path.join(repo_path, os.path.splitext(backup.DASHBOARD_FILENAME)[0]), index)
+        index.save()
+    return run
+
+def bench_preflight_resolve(site, workdir):
+    """preflight_check.resolve_loop for the first loop of every VLOR page, from a persisted index."""
+    import preflight_check
+    import vlor_index
+    index = vlor_index.build_index(site)
+    loop_ids = sorted({loops[0]['loop_id'] for loops in (entry['loops'] for entry in index.pages.values()) if loops})
+
+    def run():
+        missing = [loop_id for loop_id in loop_ids if preflight_check.resolve_loop(site, loop_id) is None]
+        if missing:
+            raise RuntimeError(f"resolve_loop could not find: {', '.join(missing)}")
+    return run
+
+def bench_master_index(site, workdir):
+    """update_master_document_index.py end to end: index build plus one save."""
+    import runpy
+    script = os.path.join(TOOLKIT_DIR, 'update_master_document_index.py')
+    return lambda: runpy.run_path(script, run_name='__main__')
+
+def bench_page_tool_batch(site, workdir):
+    """page_tool --batch: two edits to each filler page, one fetch and one save per page, four workers."""
+    import page_tool
+    titles = [page.title() for page in site.allpages(prefix='Page ', namespace=3000, total=100)]
+    jobs_path = os.path.join(workdir, 'jobs.jsonl')
+    with open(jobs_path, 'w', encoding='utf-8') as f:
+        for title in titles:
+            f.write(json.dumps({"action": "append_to_page", "title": title, "content": "Benchmark note."}) + "\n")
+            f.write(json.dumps({"action": "find_and_replace", "title": title, "find": "Filler", "replace": "Benchmarked filler"}) + "\n")
+
+    def run():
+        try:
+            page_tool.main(['--batch', jobs_path, '--workers', '4'], site=site)
+        except SystemExit as e:
+            if e.code:
+                raise RuntimeError(f"page_tool --batch exited with status {e.code}") from None
+    return run
+
+BENCHMARKS = {
+    'index_cold': bench_index_cold,
+    'index_warm': bench_index_warm,
+    'backup_export': bench_backup_export,
+    'preflight_resolve': bench_preflight_resolve,
+    'master_index': bench_master_index,
+    'page_tool_batch': bench_page_tool_batch,
+}
+
+# --- Fake Wiki Server ---
+
+def server_call(api_url, path, method='GET'):
+    base = api_url.rsplit('/w/', 1)[0]
+    request = urllib.request.Request(base + path, method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read() or b'{}')
+
+def start_server(server_args):
+    """Starts fake_mediawiki.py on a free port. Returns (process, api_url)."""
+    process = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, 'fake_mediawiki.py'), '--port', '0', *server_args],
+                               stdout=subprocess.PIPE, text=True)
+    api_url = process.stdout.readline().strip() # Printed once seeding is done
+    if not api_url.startswith('http'):
+        process.kill()
+        raise RuntimeError(f"fake_mediawiki.py did not start (exit status {process.wait()}).")
+    return process, api_url
+
+# --- Child Process ---
+
+def run_child(name, api_url, workdir, result_path):
+    """Runs one benchmark in this process and writes its measurements to result_path."""
+    sys.path.insert(0, TOOLKIT_DIR)
+    import pywikibot
+    import toolkit_trace
+    if toolkit_trace.enabled():
+        toolkit_trace.get_tracer().run_name = name
+        toolkit_trace.instrument_pywikibot()
+    site = pywikibot.Site()
+    site.login()
+    body = BENCHMARKS[name](site, workdir)
+
+    server_call(api_url, '/_reset', 'POST')
+    if toolkit_trace.enabled():
+        toolkit_trace.get_tracer().reset()
+    tracemalloc.start()
+    started = time.perf_counter()
+    body()
+    wall_seconds = time.perf_counter() - started
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = server_call(api_url, '/_stats')
+
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump({"wall_seconds": wall_seconds, "peak_memory_mb": peak_bytes / 2**20, "requests": stats['requests'],
+                   "requests_by_module": stats['by_module'], "bytes_sent": stats['bytes_sent'],
+                   "injected_rate_limits": stats['injected_rate_limits']}, f)
+
+def run_benchmark(name, api_url, run_dir, trace_dir=None):
+    """Runs one benchmark in a fresh child process. Returns its measurements, or raises RuntimeError with its output."""
+    workdir = tempfile.mkdtemp(prefix=f"{name}-", dir=run_dir)
+    cache_dir = os.path.join(workdir, 'cache')
+    result_path = os.path.join(workdir, 'result.json')
+    env = dict(os.environ, PYWIKIBOT_DIR=os.path.join(run_dir, 'pywikibot'), AIOPS_TOOLKIT_CACHE_DIR=cache_dir,
+               AIOPS_TOOLKIT_NO_DAEMON='1', PYTHONPATH=TOOLKIT_DIR)
+    env.pop('AIOPS_TOOLKIT_NO_CACHE', None)
+    env.pop('AIOPS_TOOLKIT_MIRROR', None)
+    env.pop('AIOPS_TOOLKIT_TRACE', None)
+    if trace_dir:
+        env['AIOPS_TOOLKIT_TRACE'] = trace_dir # Traced runs are slower; keep their timings apart from untraced ones
+    child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, '--api-url', api_url,
+                            '--workdir', workdir, '--result-file', result_path],
+                           cwd=workdir, env=env, capture_output=True, text=True)
+    if child.returncode != 0 or not os.path.exists(result_path):
+        raise RuntimeError(f"Benchmark '{name}' failed (exit status {child.returncode}):\n{(child.stdout + child.stderr)[-4000:]}")
+    with open(result_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# --- Reporting ---
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=TOOLKIT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def summarize_runs(runs):
+    """Median wall time and worst peak memory over repeats; request counts come from the last run."""
+    summary = dict(runs[-1])
+    summary['wall_seconds'] = statistics.median(run['wall_seconds'] for run in runs)
+    summary['wall_seconds_runs'] = [run['wall_seconds'] for run in runs]
+    summary['peak_memory_mb'] = max(run['peak_memory_mb'] for run in runs)
+    return summary
+
+def print_table(results, baseline=None):
+    print(f"\n{'Benchmark':<20} {'Requests':>9} {'Wall (s)':>10} {'Peak MB':>9}" + ("   vs baseline" if baseline else ""))
+    for name, result in results.items():
+        line = f"{name:<20} {result['requests']:>9} {result['wall_seconds']:>10.3f} {result['peak_memory_mb']:>9.1f}"
+        previous = (baseline or {}).get(name)
+        if previous:
+            change = result['wall_seconds'] / previous['wall_seconds'] - 1 if previous['wall_seconds'] else 0.0
+            flag = '  SLOWER' if change > REGRESSION_THRESHOLD else '  faster' if change < -REGRESSION_THRESHOLD else ''
+            line += (f"   requests {result['requests'] - previous['requests']:+d}, wall {change:+.0%}, "
+                     f"memory {result['peak_memory_mb'] - previous['peak_memory_mb']:+.1f} MB{flag}")
+        print(line)
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the toolkit's hot paths against a local fake MediaWiki API.")
+    parser.add_argument('--only', help=f"Comma-separated benchmarks to run. Default: all ({', '.join(BENCHMARKS)}).")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per benchmark; wall time is the median. Default: 1.")
+    parser.add_argument('--label', help="Result name under benchmarks/results/. Default: the current git revision.")
+    parser.add_argument('--output', help="Write results to this path instead of benchmarks/results/<label>.json.")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="Show the change against an earlier results file.")
+    parser.add_argument('--api-url', help="Use an already running fake wiki instead of starting one.")
+    parser.add_argument('--trace', metavar='DIR', help="Also write a toolkit_trace profile of each benchmark run to DIR.")
+    server_group = parser.add_argument_group('fake wiki shape (passed to fake_mediawiki.py)')
+    server_group.add_argument('--vlor-pages', type=int, default=50)
+    server_group.add_argument('--loops-per-page', type=int, default=10)
+    server_group.add_argument('--page-bytes', type=int, default=8000)
+    server_group.add_argument('--ologo-pages', type=int, default=50)
+    server_group.add_argument('--filler-pages', type=int, default=500)
+    server_group.add_argument('--latency-ms', type=float, default=0)
+    server_group.add_argument('--rate-limit-every', type=int, default=0)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.api_url, args.workdir, args.result_file)
+        return
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"--only: unknown benchmark(s) {', '.join(unknown)}. Choose from: {', '.join(BENCHMARKS)}.")
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)['benchmarks']
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            print(f"Error: Cannot read baseline '{args.compare}': {e}")
+            sys.exit(1)
+
+    server_options = {"vlor_pages": args.vlor_pages, "loops_per_page": args.loops_per_page, "page_bytes": args.page_bytes,
+                      "ologo_pages": args.ologo_pages, "filler_pages": args.filler_pages, "latency_ms": args.latency_ms,
+                      "rate_limit_every": args.rate_limit_every}
+    server = None
+    run_dir = tempfile.mkdtemp(prefix='aiops-bench-')
+    try:
+        api_url = args.api_url
+        if not api_url:
+            server_args = [arg for option, value in server_options.items() for arg in (f"--{option.replace('_', '-')}", str(value))]
+            server, api_url = start_server(server_args)
+        print(f"Fake wiki: {api_url}")
+        os.makedirs(os.path.join(run_dir, 'pywikibot'))
+        with open(os.path.join(run_dir, 'pywikibot', 'user-config.py'), 'w', encoding='utf-8') as f:
+            f.write(USER_CONFIG_TEMPLATE.format(family=FAMILY_NAME, api_url=api_url))
+
+        if args.api_url and 'page_tool_batch' in names:
+            print("Note: page_tool_batch edits the shared wiki, so later runs see its changes.")
+        results = {}
+        for name in names:
+            runs = []
+            for run_number in range(args.repeat):
+                print(f"Running {name} ({run_number + 1}/{args.repeat})...", flush=True)
+                try:
+                    runs.append(run_benchmark(name, api_url, run_dir, args.trace and os.path.abspath(args.trace)))
+                except RuntimeError as e:
+                    print(f"Error: {e}")
+                    sys.exit(1)
+            results[name] = summarize_runs(runs)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    print_table(results, baseline)
+    label = args.label or git_revision()
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{label}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    report = {"label": label, "git_revision": git_revision(), "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+              "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat,
+              "fake_wiki": server_options if not args.api_url else {"api_url": args.api_url}, "benchmarks": results}
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+if __name__ == '__main__':
+    main()
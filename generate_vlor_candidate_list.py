@@ -2,105 +2,234 @@
 # -*- coding: utf-8 -*-
 #
 # AIOps Toolkit: VLOR Candidate Lister
-# Version: 3.2.0 (Space-Aware Discovery)
+# Version: 3.5.0 (Offline Mirror Support)
 #
 # This script robustly discovers VLORs and related pages by scanning only
 # within the OODA_WIKI namespace and correctly handling spaces in titles.
+#
+# Matches are appended to a scan log and to the in-progress report as they are
+# found, and the namespace position is checkpointed every CHECKPOINT_EVERY
+# pages, so an interrupted scan resumes where it stopped instead of starting
+# over. The sorted report is rendered once, when the scan ends or stops. Once
+# a full scan has completed, --incremental only classifies pages created or
+# moved since.
+# Titles are classified in batches by vlor_classifier; --rules swaps the
+# built-in confident/uncertain rules for a JSONL rule set. With --mirror (or
+# AIOPS_TOOLKIT_MIRROR) the scan reads a local wiki_mirror snapshot instead.
 
+import argparse
+import json
+import os
+import sys
 import pywikibot
 from datetime import datetime
+import vlor_classifier
+import wiki_mirror
 
 # --- CONFIGURATION ---
 TARGET_NAMESPACE = "OODA_WIKI"
 # Use spaces as returned by the API
-CONFIDENT_PREFIX = 'OODA WIKI:WikiProject ' 
+CONFIDENT_PREFIX = 'OODA WIKI:WikiProject '
 CONFIDENT_SUFFIX = '/VLOR'
 # Use spaces in keywords for accurate matching
-UNCERTAIN_KEYWORDS = ['VLOR', 'Virtuous Loop', 'Roadmap'] 
+UNCERTAIN_KEYWORDS = ['VLOR', 'Virtuous Loop', 'Roadmap']
 OUTPUT_FILENAME = 'vlor_candidate_report.txt'
+# One JSON line per classified title ({"title", "class"}); a null class removes a moved-away title
+SCAN_LOG_FILENAME = 'vlor_candidate_scan.jsonl'
+# Resume position and completion time of the scan
+CHECKPOINT_FILENAME = 'vlor_candidate_scan.checkpoint.json'
+# Titles per classification batch; the checkpoint advances one batch at a time
+CHECKPOINT_EVERY = 500
+# Report sections for the built-in classes; other classes from a rules file get a generic section
+CLASS_DESCRIPTIONS = {
+    'confident': ("Confident VLORs", f"Pages matching the '{CONFIDENT_PREFIX}...{CONFIDENT_SUFFIX}' pattern."),
+    'uncertain': ("Uncertain VLORs", f"Pages containing one of {UNCERTAIN_KEYWORDS} but not matching the confident pattern."),
+}
 
-def main():
+def get_rules(rules_path=None):
+    """The rules from a JSONL file, or the built-in confident/uncertain rules. Raises ValueError or OSError."""
+    if rules_path:
+        return vlor_classifier.load_rules(rules_path)
+    return vlor_classifier.default_rules(CONFIDENT_PREFIX, CONFIDENT_SUFFIX, UNCERTAIN_KEYWORDS)
+
+# --- Checkpoint and Scan Log ---
+
+def load_checkpoint():
+    """Returns the saved checkpoint dict, or None if no scan was recorded."""
+    try:
+        with open(CHECKPOINT_FILENAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_checkpoint(checkpoint):
+    """Writes the checkpoint atomically so a crash never leaves it half-written."""
+    temp_path = f"{CHECKPOINT_FILENAME}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, CHECKPOINT_FILENAME)
+
+def load_scan_log():
+    """Replays the scan log into {title: class}. Later lines win, so entries repeated after a resume are harmless."""
+    candidates = {}
+    try:
+        with open(SCAN_LOG_FILENAME, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # Torn last line from an interrupted run
+                if entry.get('class'):
+                    candidates[entry['title']] = entry['class']
+                else:
+                    candidates.pop(entry['title'], None)
+    except FileNotFoundError:
+        pass
+    return candidates
+
+def log_candidate(scan_log, page_title, candidate_class):
+    scan_log.write(json.dumps({"title": page_title, "class": candidate_class}) + "\n")
+
+# --- Scanning ---
+
+def scan_namespace(site, ns, checkpoint, scan_log, classifier):
     """
-    Main execution function. Connects to the wiki and generates a list of
-    pages with VLOR in their titles, sorted into categories.
+    Streams the namespace from the checkpoint's resume position, classifying CHECKPOINT_EVERY titles
+    at a time and logging matches. Returns the number of pages examined.
+    Exceptions propagate after the titles already listed have been classified and checkpointed.
     """
-    print("--- Starting VLOR Candidate Discovery Protocol ---")
-    site = pywikibot.Site()
-    site.login()
+    resume_title = checkpoint.get('last_title')
+    if resume_title:
+        print(f"Resuming after '{resume_title}' ({checkpoint['pages_scanned']} pages already scanned).")
+    examined = 0
+    batch = []
+    resume_from = None
 
-    try:
-        # Get the namespace object from its name
-        ns = site.namespaces[TARGET_NAMESPACE]
-    except KeyError:
-        print(f"FATAL ERROR: Namespace '{TARGET_NAMESPACE}' not found on this wiki.")
-        return
+    def flush_batch(resume_from):
+        """resume_from: the batch's last title without its namespace prefix, which is what 'start' expects."""
+        matches = [(page_title, candidate_class) for page_title, candidate_class in zip(batch, classifier.classify_batch(batch))
+                   if candidate_class]
+        for page_title, candidate_class in matches:
+            log_candidate(scan_log, page_title, candidate_class)
+        append_to_report(matches)
+        scan_log.flush()
+        os.fsync(scan_log.fileno()) # Log entries must be durable before the position that covers them
+        checkpoint['last_title'] = batch[-1]
+        checkpoint['resume_from'] = resume_from
+        checkpoint['pages_scanned'] += len(batch)
+        checkpoint['rule_counts'] = dict(classifier.counts)
+        save_checkpoint(checkpoint)
+        batch.clear()
 
-    print(f"\nDiscovering all pages in the '{TARGET_NAMESPACE}' namespace...")
-    all_pages_generator = site.allpages(namespace=ns.id)
-    
-    confident_vlors = []
-    uncertain_vlors = []
-    error_logs = []
-    
-    # This loop should now be safe from cross-namespace errors
-    while True:
-        try:
-            page = next(all_pages_generator)
+    try:
+        # 'start' is inclusive, so the checkpointed title comes back first and is skipped
+        for page in site.allpages(start=checkpoint.get('resume_from') or '!', namespace=ns.id):
             page_title = page.title()
-            
-            # Normalize the title to use spaces for consistent matching
-            normalized_title = page_title.replace('_', ' ')
-
-            # Classify the page based on its title
-            if normalized_title.startswith(CONFIDENT_PREFIX) and normalized_title.endswith(CONFIDENT_SUFFIX):
-                confident_vlors.append(page_title)
-            # A page is 'uncertain' if it contains any other keyword
-            elif any(keyword in normalized_title for keyword in UNCERTAIN_KEYWORDS):
-                uncertain_vlors.append(page_title)
-
-        except StopIteration:
-            print("Finished iterating through all namespace pages.")
-            break
-        except Exception as e:
-            # Catch any other unexpected errors during discovery
-            error_message = f"Unexpected error during page discovery: {e}"
-            print(f"  - WARNING: {error_message}")
-            error_logs.append(error_message)
-            continue
-            
-    # --- Generate the report file ---
-    print(f"\nWriting results to '{OUTPUT_FILENAME}'...")
-    with open(OUTPUT_FILENAME, 'w', encoding='utf-8') as f:
+            if page_title == resume_title:
+                continue
+            batch.append(page_title)
+            resume_from = page.title(with_ns=False)
+            examined += 1
+            if len(batch) >= CHECKPOINT_EVERY:
+                flush_batch(resume_from)
+                print(f"  - {checkpoint['pages_scanned']} pages scanned (at '{page_title}').")
+    finally:
+        if batch:
+            flush_batch(resume_from)
+    return examined
+
+def scan_changes(site, ns, checkpoint, scan_log, classifier):
+    """Classifies pages created in, or moved into or out of, the namespace since the last completed scan."""
+    since = pywikibot.Timestamp.fromISOformat(checkpoint['completed_at'])
+    print(f"Classifying pages created or moved since {checkpoint['completed_at']}...")
+    created = [entry.page().title() for entry in site.logevents(logtype='create', namespace=ns.id, start=since, reverse=True)]
+    for page_title, candidate_class in zip(created, classifier.classify_batch(created)):
+        if candidate_class:
+            log_candidate(scan_log, page_title, candidate_class)
+    # Moves are listed under the source namespace, so filter on both ends here
+    moves = 0
+    for entry in site.logevents(logtype='move', start=since, reverse=True):
+        old_page, new_page = entry.page(), entry.target_page
+        if old_page.namespace().id == ns.id:
+            log_candidate(scan_log, old_page.title(), None)
+        if new_page.namespace().id == ns.id:
+            log_candidate(scan_log, new_page.title(), classifier.classify(new_page.title()))
+        moves += 1
+    checkpoint['rule_counts'] = dict(classifier.counts)
+    return len(created) + moves
+
+# --- Report ---
+
+def write_section(f, heading, description, titles):
+    f.write(f"{heading} ({len(titles)})\n")
+    f.write(f"{description}\n")
+    f.write("-"*40 + "\n")
+    if titles:
+        for title in titles:
+            f.write(f"{title}\n")
+    else:
+        f.write("None found.\n")
+    f.write("\n\n")
+
+def start_progress_report(checkpoint):
+    """
+    Starts the report of a namespace scan: a header, then the matches logged so far. The scan
+    appends each batch's matches (append_to_report) until write_report replaces it when the scan ends or stops.
+    """
+    candidates = load_scan_log()
+    temp_path = f"{OUTPUT_FILENAME}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
         f.write(f"VLOR Candidate Report\n")
         f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}\n")
         f.write(f"Scope: Namespace '{TARGET_NAMESPACE}'\n")
+        f.write(f"Status: In progress (started {checkpoint['started_at']}). Matches are listed as they are found, "
+                "as 'title [class]'; the sorted report replaces this list when the scan ends.\n")
         f.write("="*40 + "\n\n")
+        for title in sorted(candidates):
+            f.write(f"{title} [{candidates[title]}]\n")
+    os.replace(temp_path, OUTPUT_FILENAME)
 
-        # Section 1: Confident VLORs
-        f.write(f"Confident VLORs ({len(confident_vlors)})\n")
-        f.write(f"Pages matching the '{CONFIDENT_PREFIX}...{CONFIDENT_SUFFIX}' pattern.\n")
-        f.write("-"*40 + "\n")
-        if confident_vlors:
-            confident_vlors.sort()
-            for title in confident_vlors:
-                f.write(f"{title}\n")
+def append_to_report(matches):
+    """Adds (title, class) matches to the in-progress report."""
+    if matches:
+        with open(OUTPUT_FILENAME, 'a', encoding='utf-8') as f:
+            f.writelines(f"{title} [{candidate_class}]\n" for title, candidate_class in matches)
+
+def write_report(checkpoint):
+    """Renders the sorted report from the scan log. Replays the whole log, so it runs once per scan, not per batch."""
+    candidates = load_scan_log()
+    titles_by_class = {candidate_class: [] for candidate_class in CLASS_DESCRIPTIONS}
+    for title in sorted(candidates):
+        titles_by_class.setdefault(candidates[title], []).append(title)
+    error_logs = checkpoint.get('errors', [])
+    temp_path = f"{OUTPUT_FILENAME}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(f"VLOR Candidate Report\n")
+        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}\n")
+        f.write(f"Scope: Namespace '{TARGET_NAMESPACE}'\n")
+        if checkpoint.get('completed_at'):
+            f.write(f"Status: Complete ({checkpoint['pages_scanned']} pages scanned, current as of {checkpoint['completed_at']})\n")
         else:
-            f.write("None found.\n")
-        f.write("\n\n")
+            f.write(f"Status: In progress ({checkpoint['pages_scanned']} pages scanned, resume after '{checkpoint.get('last_title')}')\n")
+        f.write("="*40 + "\n\n")
+
+        # One section per class: Confident and Uncertain VLORs first, then any classes from a rules file
+        for candidate_class, titles in titles_by_class.items():
+            heading, description = CLASS_DESCRIPTIONS.get(candidate_class, (f"Class '{candidate_class}'", f"Pages classified as '{candidate_class}' by the rule set."))
+            write_section(f, heading, description, titles)
 
-        # Section 2: Uncertain VLORs
-        f.write(f"Uncertain VLORs ({len(uncertain_vlors)})\n")
-        f.write(f"Pages containing one of {UNCERTAIN_KEYWORDS} but not matching the confident pattern.\n")
+        # Rule statistics
+        rule_counts = checkpoint.get('rule_counts', {})
+        f.write(f"Titles Decided per Rule\n")
+        f.write("Counts since the last full scan started, including exclusions.\n")
         f.write("-"*40 + "\n")
-        if uncertain_vlors:
-            uncertain_vlors.sort()
-            for title in uncertain_vlors:
-                f.write(f"{title}\n")
-        else:
-            f.write("None found.\n")
+        for rule_name, count in sorted(rule_counts.items(), key=lambda item: -item[1]):
+            f.write(f"{rule_name}: {count}\n")
+        if not rule_counts:
+            f.write("None.\n")
         f.write("\n\n")
 
-        # Section 3: Errors (should now be empty)
+        # Errors
         f.write(f"Errors Encountered During Discovery ({len(error_logs)})\n")
         f.write("These logs indicate pages that could not be processed by the API.\n")
         f.write("-"*40 + "\n")
@@ -109,6 +238,92 @@ def main():
                 f.write(f"- {error}\n")
         else:
             f.write("None.\n")
+    os.replace(temp_path, OUTPUT_FILENAME)
+
+def main():
+    """
+    Main execution function. Connects to the wiki and generates a list of
+    pages with VLOR in their titles, sorted into categories.
+    """
+    parser = argparse.ArgumentParser(description="List VLOR candidate pages in the OODA_WIKI namespace.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true',
+                      help="Only classify pages created or moved since the last completed scan.")
+    mode.add_argument('--restart', action='store_true',
+                      help="Discard an interrupted scan's checkpoint and scan the whole namespace again.")
+    parser.add_argument('--mirror', help=f"Scan an offline wiki_mirror snapshot instead of the live wiki. Default: ${wiki_mirror.MIRROR_ENV_VAR} if set.")
+    parser.add_argument('--rules', help="JSONL classification rules (see vlor_classifier.py). Default: the built-in confident/uncertain rules.")
+    args = parser.parse_args()
+
+    try:
+        classifier = vlor_classifier.TitleClassifier(get_rules(args.rules))
+    except (OSError, ValueError) as e:
+        print(f"FATAL ERROR: Could not load classification rules: {e}")
+        sys.exit(1)
+
+    print("--- Starting VLOR Candidate Discovery Protocol ---")
+    try:
+        site = wiki_mirror.get_site(args.mirror)
+    except wiki_mirror.MirrorError as e:
+        print(f"FATAL ERROR: {e}")
+        sys.exit(1)
+
+    try:
+        # Get the namespace object from its name
+        ns = site.namespaces[TARGET_NAMESPACE]
+    except KeyError:
+        print(f"FATAL ERROR: Namespace '{TARGET_NAMESPACE}' not found on this wiki.")
+        return
+
+    run_started = site.server_time()
+    checkpoint = load_checkpoint()
+    if args.incremental and wiki_mirror.is_mirror(site):
+        print("FATAL ERROR: --incremental reads the wiki's logs, which a mirror does not have. Run a full scan of the mirror instead.")
+        sys.exit(1)
+    if args.incremental and not (checkpoint and checkpoint.get('completed_at')):
+        print("No completed scan found. Running a full scan to establish one.")
+        args.incremental = False
+    if args.incremental:
+        with open(SCAN_LOG_FILENAME, 'a', encoding='utf-8') as scan_log:
+            classifier.counts.update(checkpoint.get('rule_counts', {}))
+            changes = scan_changes(site, ns, checkpoint, scan_log, classifier)
+        checkpoint['completed_at'] = run_started.isoformat()
+        save_checkpoint(checkpoint)
+        print(f"Processed {changes} creations and moves.")
+    else:
+        resuming = checkpoint is not None and not checkpoint.get('completed_at') and not args.restart
+        if not resuming:
+            checkpoint = {"namespace": TARGET_NAMESPACE, "started_at": run_started.isoformat(),
+                          "last_title": None, "resume_from": None, "pages_scanned": 0, "rule_counts": {}, "errors": [], "completed_at": None}
+            save_checkpoint(checkpoint)
+        classifier.counts.update(checkpoint.get('rule_counts', {}))
+        print(f"\nDiscovering all pages in the '{TARGET_NAMESPACE}' namespace...")
+        with open(SCAN_LOG_FILENAME, 'a' if resuming else 'w', encoding='utf-8') as scan_log:
+            start_progress_report(checkpoint)
+            try:
+                scan_namespace(site, ns, checkpoint, scan_log, classifier)
+            except KeyboardInterrupt:
+                write_report(checkpoint)
+                print(f"\nInterrupted. Partial report written to '{OUTPUT_FILENAME}'. Run the script again to resume.")
+                sys.exit(130)
+            except Exception as e:
+                # The listing cannot continue past an API failure; keep what was found and let a rerun resume
+                error_message = f"Unexpected error during page discovery after '{checkpoint['last_title']}': {e}"
+                print(f"  - WARNING: {error_message}")
+                checkpoint['errors'].append(error_message)
+                save_checkpoint(checkpoint)
+                write_report(checkpoint)
+                print(f"Partial report written to '{OUTPUT_FILENAME}'. Run the script again to resume.")
+                sys.exit(1)
+        print("Finished iterating through all namespace pages.")
+        # Changes made while the scan ran are picked up by the next --incremental run
+        checkpoint['completed_at'] = checkpoint['started_at']
+        checkpoint['errors'] = [] # Failures from interrupted attempts were recovered by resuming
+        save_checkpoint(checkpoint)
+
+    # --- Generate the report file ---
+    print(f"\nWriting results to '{OUTPUT_FILENAME}'...")
+    write_report(checkpoint)
 
     print("\n--- Discovery Protocol Complete ---")
     print(f"Review the generated report by running: nano {OUTPUT_FILENAME}")
@@ -0,0 +1,122 @@
+# git_plumbing.py
+# Version 1.0
+# Builds a commit straight into a repository's object store with one
+# "git fast-import" process: no checkout, no index, no working-tree writes.
+#
+# The base commit's tree is listed once (git ls-tree); files whose blob hash
+# matches it are skipped locally, so only changed files are streamed to
+# fast-import. Safe to run while someone works in the same clone: only a new
+# branch ref is written.
+#
+#   builder = TreeCommitBuilder(repo_path, 'refs/remotes/origin/main')
+#   builder.add_file('VLORs/Foo.mw', text.encode('utf-8'))
+#   commit = builder.commit('refs/heads/auto-backup/2024-01-01', "message")  # None if nothing changed
+
+import hashlib
+import os
+import subprocess
+import threading
+
+class GitPlumbingError(Exception):
+    """Raised when a git plumbing command fails."""
+
+def git(repo_path, *args, input_bytes=None):
+    """Runs one git command in repo_path and returns its stdout as bytes. Raises GitPlumbingError."""
+    result = subprocess.run(['git', *args], cwd=repo_path, input=input_bytes, capture_output=True)
+    if result.returncode != 0:
+        raise GitPlumbingError(f"git {' '.join(args)} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+def git_dir(repo_path):
+    """
+    The repository's git directory. Not always repo_path/.git: in a linked worktree or a
+    submodule, .git is a file pointing at the real one.
+    """
+    return os.path.join(repo_path, git(repo_path, 'rev-parse', '--git-dir').decode('utf-8').strip())
+
+def blob_sha1(data):
+    """The object id git assigns to a blob with this content (SHA-1 repositories)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def list_tree(repo_path, treeish):
+    """Returns {path: blob_sha} for every file in a commit's tree, from a single ls-tree call."""
+    entries = {}
+    for record in git(repo_path, 'ls-tree', '-r', '-z', treeish).split(b'\0'):
+        if not record:
+            continue
+        meta, path = record.split(b'\t', 1)
+        _mode, object_type, sha = meta.split(b' ')
+        if object_type == b'blob':
+            entries[path.decode('utf-8')] = sha.decode('ascii')
+    return entries
+
+class TreeCommitBuilder:
+    """Stages changed files against a base commit and writes one commit with git fast-import."""
+
+    def __init__(self, repo_path, base_ref):
+        self.repo_path = repo_path
+        self.base_commit = git(repo_path, 'rev-parse', '--verify', f"{base_ref}^{{commit}}").decode().strip()
+        self.base_tree = list_tree(repo_path, self.base_commit)
+        self.changed_paths = []
+        self._staged = {} # path -> blob mark
+        self._lock = threading.Lock() # add_file may be called from worker threads
+        self._process = None
+
+    def _stream(self):
+        if self._process is None:
+            self._process = subprocess.Popen(
+                ['git', 'fast-import', '--quiet', '--done'], cwd=self.repo_path,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._process.stdin.write(b"feature done\nfeature get-mark\n")
+        return self._process.stdin
+
+    def is_unchanged(self, path, data):
+        return self.base_tree.get(path) == blob_sha1(data)
+
+    def add_file(self, path, data):
+        """Stages path with data (bytes) unless the base tree already has identical content. Returns True if staged."""
+        if self.is_unchanged(path, data):
+            return False
+        with self._lock:
+            stream = self._stream()
+            mark = len(self._staged) + 1
+            stream.write(b"blob\nmark :%d\ndata %d\n" % (mark, len(data)))
+            stream.write(data)
+            stream.write(b"\n")
+            self._staged[path] = mark
+            self.changed_paths.append(path)
+        return True
+
+    def commit(self, ref, message, author_ident=None):
+        """
+        Writes a commit of the staged files on top of the base commit and points ref at it.
+        Returns the new commit id, or None (and writes nothing) if no file changed.
+        """
+        if not self._staged:
+            self.abort()
+            return None
+        committer = author_ident or git(self.repo_path, 'var', 'GIT_COMMITTER_IDENT').decode('utf-8').strip()
+        message_bytes = message.encode('utf-8')
+        commit_mark = len(self._staged) + 1
+        stream = self._stream()
+        stream.write(b"commit %s\nmark :%d\n" % (ref.encode('utf-8'), commit_mark))
+        stream.write(b"committer %s\n" % committer.encode('utf-8'))
+        stream.write(b"data %d\n%s\n" % (len(message_bytes), message_bytes))
+        stream.write(b"from %s\n" % self.base_commit.encode('ascii'))
+        for path, mark in self._staged.items():
+            stream.write(b'M 100644 :%d "%s"\n' % (mark, _quote_path(path)))
+        stream.write(b"\nget-mark :%d\ndone\n" % commit_mark)
+        stdout, stderr = self._process.communicate()
+        if self._process.returncode != 0:
+            raise GitPlumbingError(f"git fast-import failed: {stderr.decode('utf-8', 'replace').strip()}")
+        return stdout.decode('ascii').split()[-1]
+
+    def abort(self):
+        """Stops fast-import without writing a commit. Blobs already streamed are left as unreachable objects."""
+        if self._process is not None:
+            self._process.stdin.write(b"done\n")
+            self._process.communicate()
+            self._process = None
+
+def _quote_path(path):
+    return path.encode('utf-8').replace(b'\\', b'\\\\').replace(b'"', b'\\"').replace(b'\n', b'\\n')
@@ -1,58 +1,365 @@
 # llm_service.py
-# Version 1.0
+# Version 2.1
 # A simple, reusable module to interact with the Gemini API.
+#
+# LLMClient configures its backend once and reuses the model for every call,
+# and keeps an on-disk response cache keyed by a hash of (backend, model,
+# prompt) with a TTL and a byte budget. Backends are pluggable: GeminiBackend
+# talks to the API; StubBackend runs fully offline for tests and dry runs.
+# Select the default backend with AIOPS_TOOLKIT_LLM_BACKEND=gemini|stub.
+#
+# call_many() sends a batch of independent prompts concurrently under a
+# concurrency cap and requests-per-minute / tokens-per-minute token buckets,
+# retrying 429/5xx responses with jittered backoff; results keep prompt order.
+#
+# call_gemini() keeps its original contract (returns error text instead of
+# raising) for existing callers; new code should use get_client().
 
+import asyncio
+import hashlib
 import os
-import google.generativeai as genai
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import revision_cache
+import toolkit_trace
 
-def call_gemini(prompt_text):
-    """
-    Sends a prompt to the Gemini API and returns the response.
+# --- CONFIGURATION ---
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+BACKEND_ENV_VAR = "AIOPS_TOOLKIT_LLM_BACKEND"
+DEFAULT_CACHE_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_FILENAME = 'llm_responses.sqlite'
+# Batch limits for call_many(); set them to your API quota.
+DEFAULT_CONCURRENCY = int(os.environ.get('AIOPS_TOOLKIT_LLM_CONCURRENCY', 8))
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get('AIOPS_TOOLKIT_LLM_RPM', 300))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get('AIOPS_TOOLKIT_LLM_TPM', 1000000))
+BURST_SECONDS = 10 # A bucket holds this many seconds' worth of its rate
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+CHARS_PER_TOKEN = 4 # Rough estimate used for tokens-per-minute accounting
 
-    Args:
-        prompt_text (str): The text prompt to send to the model.
+class LLMError(Exception):
+    """Raised when the model cannot be configured or a request fails. status is the HTTP status, if known."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+def is_retryable(error):
+    """True for rate limiting (429) and server-side (5xx) failures."""
+    status = getattr(error, 'status', None)
+    return isinstance(status, int) and (status == 429 or 500 <= status < 600)
+
+# --- Backends ---
+
+class GeminiBackend:
+    """Backend for the Gemini API. The SDK is configured once per backend instance."""
+    name = 'gemini'
+
+    def __init__(self, model_name=GEMINI_MODEL_NAME, api_key=None):
+        try:
+            import google.generativeai as genai # Deferred: only needed when this backend is used
+        except ImportError as e:
+            raise LLMError(f"google-generativeai is not installed: {e}") from e
 
-    Returns:
-        str: The generated text from the model, or an error message.
-    """
-    try:
         # Load environment variables from the .env file in the current directory
         load_dotenv()
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise LLMError("GEMINI_API_KEY not found. Please check your .env file.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
 
-        # Get the API key from the environment variable
-        api_key = os.getenv("GEMINI_API_KEY")
+    def generate(self, prompt):
+        try:
+            return self.model.generate_content(prompt).text
+        except Exception as e:
+            # google.api_core errors carry the HTTP status in .code
+            raise LLMError(str(e), status=getattr(e, 'code', None)) from e
 
-        if not api_key:
-            return "Error: GEMINI_API_KEY not found. Please check your .env file."
+    def stream(self, prompt):
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                yield chunk.text
+        except Exception as e:
+            raise LLMError(str(e), status=getattr(e, 'code', None)) from e
 
-        # Configure the generative AI client with the API key
-        genai.configure(api_key=api_key)
+class StubBackend:
+    """Offline backend: 'answers' by echoing the first words of the prompt's last text block."""
+    name = 'stub'
+    model_name = 'stub'
+
+    def __init__(self, words=25):
+        self.words = words
+        self.calls = []
+
+    def generate(self, prompt):
+        self.calls.append(prompt)
+        body = prompt.split('---', 1)[-1].strip('-\n ')
+        words = body.split()
+        return " ".join(words[:self.words]) + (" ..." if len(words) > self.words else "")
+
+    def stream(self, prompt):
+        for word in self.generate(prompt).split(' '):
+            yield word + ' '
+
+BACKENDS = {'gemini': GeminiBackend, 'stub': StubBackend}
+
+def make_backend(name=None):
+    """Builds a backend by name (default: $AIOPS_TOOLKIT_LLM_BACKEND, else 'gemini')."""
+    name = name or os.environ.get(BACKEND_ENV_VAR) or 'gemini'
+    if name not in BACKENDS:
+        raise LLMError(f"Unknown LLM backend '{name}'. Choose from: {', '.join(BACKENDS)}.")
+    return BACKENDS[name]()
+
+# --- Response Cache ---
+
+class ResponseCache:
+    """SQLite cache of prompt-hash -> response with TTL expiry and LRU eviction by size."""
+
+    def __init__(self, path=None, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.path = path or os.path.join(revision_cache.get_cache_dir(), CACHE_FILENAME)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(backend, prompt):
+        return hashlib.sha256(f"{backend.name}\0{backend.model_name}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response.encode('utf-8')), now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                victims = []
+                for victim_key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append((victim_key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self._conn.commit()
+
+# --- Client ---
+
+class LLMClient:
+    """Long-lived client: one configured backend, reused for every call, with an optional response cache."""
+
+    def __init__(self, backend=None, cache=None, use_cache=True):
+        self.backend = backend or make_backend()
+        self.cache = (cache or ResponseCache()) if use_cache else None
 
-        # Create an instance of the Gemini 1.5 Flash model
-        model = genai.GenerativeModel('gemini-1.5-flash')
+    def lookup(self, prompt):
+        """Returns the cached response for prompt, or None."""
+        if not self.cache:
+            return None
+        return self.cache.get(ResponseCache.make_key(self.backend, prompt))
 
-        # Send the prompt and get the response
-        response = model.generate_content(prompt_text)
+    def generate(self, prompt):
+        """Returns the model's response to prompt. Raises LLMError on failure."""
+        with toolkit_trace.span('llm.generate', backend=self.backend.name, model=self.backend.model_name,
+                                prompt_bytes=len(prompt.encode('utf-8'))) as span:
+            key = ResponseCache.make_key(self.backend, prompt) if self.cache else None
+            if key:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    span.set(cache='hit', bytes=len(cached.encode('utf-8')))
+                    return cached
+            response = self.backend.generate(prompt)
+            if key:
+                self.cache.put(key, response)
+            span.set(cache='miss' if key else 'off', bytes=len(response.encode('utf-8')))
+            return response
 
-        # Return the text part of the response
-        return response.text
+    def stream(self, prompt):
+        """Yields the response in pieces as they arrive (all at once on a cache hit). Raises LLMError on failure."""
+        key = ResponseCache.make_key(self.backend, prompt) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        pieces = []
+        for piece in self.backend.stream(prompt):
+            pieces.append(piece)
+            yield piece
+        if key:
+            self.cache.put(key, "".join(pieces))
 
-    except Exception as e:
-        # Return a formatted error string if anything goes wrong
-        return f"An error occurred: {e}"
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared process-wide client, creating (and configuring) it on first use."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = LLMClient(use_cache=not os.environ.get(revision_cache.DISABLE_CACHE_ENV_VAR))
+        return _default_client
+
+# --- Batch Calls ---
+
+class TokenBucket:
+    """Async token bucket refilled at per_minute / 60 per second; callers wait in FIFO order."""
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity) # An oversized request still goes through, on a full bucket
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+async def call_many(prompts, client=None, concurrency=DEFAULT_CONCURRENCY,
+                    requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                    max_retries=MAX_RETRIES, return_exceptions=False):
+    """
+    Sends independent prompts concurrently and returns the responses in prompt order.
+
+    At most concurrency requests are in flight; requests and estimated prompt tokens
+    are rate limited per minute (pass 0/None to disable a limit). Cached prompts
+    return immediately without using quota. 429/5xx failures are retried with
+    jittered exponential backoff. As with asyncio.gather, the first failure is raised
+    unless return_exceptions is True, in which case it takes that prompt's slot.
+    """
+    client = client or get_client()
+    prompts = list(prompts)
+    if not prompts:
+        return []
+    semaphore = asyncio.Semaphore(concurrency)
+    request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+    lookup = getattr(client, 'lookup', None)
+    loop = asyncio.get_running_loop()
+
+    # Not a with block: its shutdown(wait=True) would block the event loop until every thread finished
+    pool = ThreadPoolExecutor(max_workers=min(concurrency, len(prompts)), thread_name_prefix='llm')
+
+    async def call_one(prompt):
+        if lookup is not None:
+            cached = lookup(prompt)
+            if cached is not None:
+                return cached
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                if request_bucket:
+                    await request_bucket.acquire()
+                if token_bucket:
+                    await token_bucket.acquire(estimate_tokens(prompt))
+                try:
+                    return await loop.run_in_executor(pool, client.generate, prompt)
+                except LLMError as e:
+                    if attempt == max_retries or not is_retryable(e):
+                        raise
+                    delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    await asyncio.sleep(delay)
+
+    tasks = [asyncio.ensure_future(call_one(prompt)) for prompt in prompts]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    except BaseException:
+        # Stop the prompts still waiting for a slot, and collect their outcomes so none is left unretrieved
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True) # Requests already sent finish in the background
+
+def run_many(prompts, **kwargs):
+    """Synchronous wrapper around call_many() for code that is not already running an event loop."""
+    return asyncio.run(call_many(prompts, **kwargs))
+
+def stream_gemini(prompt_text):
+    """
+    Sends a prompt through the shared client and yields the response text in
+    pieces as the model produces them. Unlike call_gemini, errors are raised.
+    """
+    yield from get_client().stream(prompt_text)
+
+def call_gemini(prompt_text):
+    """
+    Sends a prompt to the Gemini API and returns the response.
+
+    Args:
+        prompt_text (str): The text prompt to send to the model.
+
+    Returns:
+        str: The generated text from the model, or an error message.
+    """
+    with toolkit_trace.span('llm.call_gemini') as span:
+        try:
+            client = get_client()
+        except LLMError as e:
+            span.set(outcome='LLMError')
+            return f"Error: {e}"
+        try:
+            return client.generate(prompt_text)
+        except Exception as e:
+            # Return a formatted error string if anything goes wrong
+            span.set(outcome=type(e).__name__)
+            return f"An error occurred: {e}"
 
 # This block allows us to test the module directly
 if __name__ == '__main__':
     print("--- Running llm_service.py test ---")
-    
+
     # Define a simple test prompt
     test_prompt = "In one sentence, what is the OODA Loop?"
     print(f"Sending prompt: \"{test_prompt}\"")
-    
+
     # Call the main function
     model_response = call_gemini(test_prompt)
-    
+
     # Print the result
     print("\n--- Model Response ---")
     print(model_response)
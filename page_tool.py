@@ -8,18 +8,39 @@ Version 18.1.0 (Stable Main Dispatcher)
 
 import sys
 import argparse
+import json
+
+if __name__ == '__main__':
+    # Hand the command line to a running page_tool daemon, if any, before paying for the imports below
+    import page_tool_daemon
+    page_tool_daemon.forward_if_running(sys.argv[1:])
+
+import collections
+import csv
+from concurrent.futures import as_completed
 import pywikibot
 import mwparserfromhell
 import os
-import llm_service # Assuming llm_service.py is in the same directory orPYTHONPATH
+import revision_cache
+import wiki_executor
+import vlor_discovery
+import vlor_index
+import replace_engine
+import toolkit_trace
+import llm_service # Assuming llm_service.py is in the same directory or PYTHONPATH
+import summarizer
 
 # --- Environment Variable Name for Overwrite Confirmation ---
 OVERWRITE_APPROVAL_ENV_VAR = "AIOPS_TOOLKIT_OVERWRITE_APPROVAL_TOKEN"
 EXPECTED_OVERWRITE_TOKEN = "20 Second Boyd!"
+# Parsed pages kept per process, keyed by (title, revid); matters mostly for the daemon
+PARSED_PAGE_CACHE_SIZE = 32
+_parsed_pages = collections.OrderedDict()
 
 # --- Core Functions ---
 def get_wiki_site():
     """Connects to the site using configured credentials and returns a site object."""
+    toolkit_trace.instrument_pywikibot()
     site = pywikibot.Site()
     site.login()
     return site
@@ -27,33 +48,76 @@ def get_wiki_site():
 def get_page_and_wikicode(site, page_title, ensure_exists=True):
     """
     Gets a page object and its parsed wikitext.
+    The text is reused from the local revision cache when the latest revision is already cached.
     """
     page = pywikibot.Page(site, page_title)
-    if ensure_exists and not page.exists():
-        print(f"Error: Page '{page_title}' does not exist.")
+    try:
+        text = revision_cache.get_page_text(page)
+    except pywikibot.exceptions.NoPageError:
+        if ensure_exists:
+            print(f"Error: Page '{page_title}' does not exist.")
+            sys.exit(1)
+        return page, mwparserfromhell.parse("")
+    return page, parse_page_text(page, text)
+
+def parse_page_text(page, text):
+    """
+    Parses a page's current text, reusing the parse from an earlier call for the same revision.
+    Callers edit the returned wikicode in place, so a cached parse is only reused while it
+    still renders to the original text.
+    """
+    key = (page.title(), page.latest_revision_id)
+    entry = _parsed_pages.get(key)
+    if entry is not None and entry[0] == text and str(entry[1]) == text:
+        _parsed_pages.move_to_end(key)
+        toolkit_trace.count('page.parse_reused')
+        return entry[1]
+    with toolkit_trace.span('page.parse', title=page.title(), bytes=len(text.encode('utf-8'))):
+        wikicode = mwparserfromhell.parse(text)
+    _parsed_pages[key] = (text, wikicode)
+    while len(_parsed_pages) > PARSED_PAGE_CACHE_SIZE:
+        _parsed_pages.popitem(last=False)
+    return wikicode
+
+def save_page_text(page, original_text, new_text, summary, action_label, conflict_message=None, **save_options):
+    """
+    Saves new_text over the revision original_text was fetched from, unless nothing changed.
+    The save is pinned to that revision, so a concurrent edit (or, with createonly=True, an
+    existing page) fails as an edit conflict instead of being overwritten.
+    Returns True if an edit was made, False for a no-op. Exits on save errors.
+    """
+    page_title = page.title()
+    if new_text == original_text:
+        print(f"No change: '{action_label}' leaves page '{page_title}' identical to its current revision. No edit was made.")
+        return False
+    page.text = new_text
+    try:
+        page.save(summary=summary, bot=True, **save_options)
+    except pywikibot.exceptions.EditConflictError as e:
+        print(conflict_message or f"Error: Page '{page_title}' changed since it was fetched ({e}). No edit was made; re-run to apply against the latest revision.")
         sys.exit(1)
-    return page, mwparserfromhell.parse(page.text)
+    except pywikibot.exceptions.Error as e:
+        print(f"Error saving ({action_label}) page '{page_title}': {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"An unexpected error occurred during {action_label} save: {e}")
+        sys.exit(1)
+    return True
 
-# --- Action Functions ---
+def report_saved(page, original_text, new_text, message):
+    print(message)
+    old_size, new_size = len(original_text.encode('utf-8')), len(new_text.encode('utf-8'))
+    print(f"Bytes changed: {new_size - old_size:+d} ({old_size} -> {new_size}).")
+    print(f"Revision URL: {page.permalink()}")
 
 def write_full_page(site, page_title, new_content, summary):
     """Writes content to a new page. FOR CREATING NEW PAGES ONLY."""
     page = pywikibot.Page(site, page_title)
-    if page.exists():
-        print(f"CRITICAL ERROR: Page '{page_title}' already exists. Use '--action overwrite' for existing pages (with confirmation).")
-        print(f"Halting 'write' action as per safety protocols.")
-        sys.exit(1)
-    page.text = new_content
-    try:
-        page.save(summary=summary, bot=True)
-        print(f"Success: Page '{page_title}' was created.")
-        print(f"Revision URL: {page.permalink()}")
-    except pywikibot.exceptions.Error as e:
-        print(f"Error saving (create) page '{page_title}': {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during page creation: {e}")
-        sys.exit(1)
+    # createonly makes the wiki refuse an existing title atomically, without a separate exists() request
+    conflict_message = (f"CRITICAL ERROR: Page '{page_title}' already exists. Use '--action overwrite' for existing pages (with confirmation).\n"
+                        f"Halting 'write' action as per safety protocols.")
+    if save_page_text(page, "", new_content, summary, 'create', conflict_message, createonly=True):
+        report_saved(page, "", new_content, f"Success: Page '{page_title}' was created.")
 
 def overwrite_page(site, page_title, new_content, summary):
     """Overwrites an existing page with new content. Requires environment variable confirmation."""
@@ -65,185 +129,594 @@ def overwrite_page(site, page_title, new_content, summary):
         print(f"Current value of {OVERWRITE_APPROVAL_ENV_VAR}: '{approval_token if approval_token else 'Not Set'}'")
         sys.exit(1)
     page, _ = get_page_and_wikicode(site, page_title, ensure_exists=True)
+    original_text = page.text
     print(f"\nProceeding with overwrite for page: '{page_title}' (Approval token accepted).")
-    page.text = new_content
-    try:
-        page.save(summary=summary, bot=True)
-        print(f"Success: Page '{page_title}' was overwritten.")
-        print(f"Revision URL: {page.permalink()}")
-    except pywikibot.exceptions.Error as e:
-        print(f"Error saving (overwrite) page '{page_title}': {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during page overwrite: {e}")
-        sys.exit(1)
+    if save_page_text(page, original_text, new_content, summary, 'overwrite', nocreate=True):
+        report_saved(page, original_text, new_content, f"Success: Page '{page_title}' was overwritten.")
+
+# --- Section Index ---
+LEAD_SECTION_ALIASES = ['0', 'lead', 'introduction']
+
+def build_section_index(wikicode):
+    """
+    Indexes a page's top-level sections in one pass over its nodes. Each entry records the
+    heading title and level, the path of enclosing headings, and the flat section's node
+    range [start, end) and character range (the section runs up to the next heading of any level).
+    The first entry is always the lead section (title None).
+    """
+    sections = [{"title": None, "level": 0, "path": [], "start": 0, "char_start": 0}]
+    open_headings = [] # Stack of (level, title) for nested path matching
+    char_offset = 0
+    for node_index, node in enumerate(wikicode.nodes):
+        if isinstance(node, mwparserfromhell.nodes.Heading):
+            sections[-1]["end"], sections[-1]["char_end"] = node_index, char_offset
+            while open_headings and open_headings[-1][0] >= node.level:
+                open_headings.pop()
+            title = node.title.strip()
+            sections.append({"title": title, "level": node.level, "path": [t for _, t in open_headings] + [title],
+                             "start": node_index, "char_start": char_offset})
+            open_headings.append((node.level, title))
+        char_offset += len(str(node))
+    sections[-1]["end"], sections[-1]["char_end"] = len(wikicode.nodes), char_offset
+    return sections
+
+def find_section(section_index, section_title, ignore_case=False):
+    """
+    Returns the first indexed section matching section_title, or None. Matches the exact heading
+    title first, then a nested 'Parent/Child' path (trailing path segments). '0', 'lead' or
+    'introduction' select the lead section.
+    """
+    if section_title.lower() in LEAD_SECTION_ALIASES:
+        return section_index[0]
+    normalize = (lambda text: text.casefold()) if ignore_case else (lambda text: text)
+    wanted = normalize(section_title.strip())
+    for section in section_index[1:]:
+        if normalize(section["title"]) == wanted:
+            return section
+    wanted_path = [normalize(part.strip()) for part in section_title.split('/')]
+    for section in section_index[1:]:
+        if [normalize(part) for part in section["path"][-len(wanted_path):]] == wanted_path:
+            return section
+    return None
+
+def insert_into_sections(wikicode, section_titles, append_content, ignore_case=False):
+    """
+    Appends append_content to the end of each named section in place, using a single
+    section index. Returns the list of titles that could not be found.
+    """
+    section_index = build_section_index(wikicode)
+    targets, missing = [], []
+    for section_title in section_titles:
+        section = find_section(section_index, section_title, ignore_case)
+        if section is None:
+            missing.append(section_title)
+        else:
+            targets.append(section)
+    # Insert from the end of the page backwards so earlier node offsets stay valid
+    for section in sorted(targets, key=lambda s: s["end"], reverse=True):
+        content = append_content
+        # Keep the following heading on its own line
+        if section["end"] < len(wikicode.nodes) and not content.endswith('\n'):
+            content += '\n'
+        # Ensure there's a newline before appended content if the section has content
+        current_section_str = "".join(str(node) for node in wikicode.nodes[section["start"]:section["end"]]).rstrip('\n')
+        wikicode.insert(section["end"], f"\n{content}" if current_section_str else content)
+    return missing
+
+def insert_into_section(wikicode, section_title, append_content, ignore_case=False):
+    """Appends append_content to the end of the named section in place. Returns True if the section was found."""
+    return not insert_into_sections(wikicode, [section_title], append_content, ignore_case)
+
+def get_section_text(wikicode, section):
+    """Returns the plain text (markup stripped) of an indexed section, heading included."""
+    return mwparserfromhell.wikicode.Wikicode(wikicode.nodes[section["start"]:section["end"]]).strip_code().strip()
+
+# --- Edit Helpers (shared by single actions and batch mode) ---
+
+def replace_in_text(original_text, find_text, replace_text, count=1):
+    """Returns original_text with find_text replaced. count=0 replaces all occurrences."""
+    if count == 0: # Replace all occurrences if count is 0
+        return original_text.replace(find_text, replace_text)
+    if count > 0: # Replace a specific number of occurrences
+        return original_text.replace(find_text, replace_text, count)
+    # Negative count is invalid
+    raise ValueError(f"Invalid replace_count '{count}'. Must be 0 (all) or positive.")
+
+def set_template_field(wikicode, template_name, target_id_param_name, target_id_value, field_to_edit, new_field_value):
+    """
+    Sets a field on the first matching template instance in place. Returns True if a template was edited.
+    IDs match case-insensitively, as in the VLOR index.
+    """
+    target_id = vlor_index.normalize_id(target_id_value)
+    for template in wikicode.filter_templates():
+        if template.name.matches(template_name):
+            if template.has(target_id_param_name) and vlor_index.normalize_id(str(template.get(target_id_param_name).value)) == target_id:
+                if template.has(field_to_edit):
+                    old_value = str(template.get(field_to_edit).value)
+                    if old_value.strip() == new_field_value.strip():
+                        return True # Already set: leave the text byte-identical
+                    if old_value.strip():
+                        # Keep the field's existing layout (e.g. "| status = x\n") so the diff is just the value
+                        leading = old_value[:len(old_value) - len(old_value.lstrip())]
+                        trailing = old_value[len(old_value.rstrip()):]
+                    else:
+                        leading, trailing = " ", (old_value if '\n' in old_value else " ")
+                    template.get(field_to_edit).value = f"{leading}{new_field_value}{trailing}"
+                else:
+                    template.add(field_to_edit, f" {new_field_value} ", before=None) # Add new param if not exist
+                return True # Assuming only one such template instance needs editing
+    return False
+
+def append_to_text(original_text, append_content):
+    """Returns original_text with append_content added on a new line at the end."""
+    # Ensure there's a newline before the new content
+    if not original_text.endswith('\n'):
+        original_text += '\n'
+    return original_text + append_content
+
+# --- Action Functions ---
 
 def find_and_replace(site, page_title, find_text, replace_text, summary, count=1):
     """Finds and replaces occurrences of a specific string on a page."""
     page, _ = get_page_and_wikicode(site, page_title) # Ensure page exists for reading
     original_text = page.text
-    if count == 0: # Replace all occurrences if count is 0
-        new_text = original_text.replace(find_text, replace_text)
-    elif count > 0: # Replace a specific number of occurrences
-        new_text = original_text.replace(find_text, replace_text, count)
-    else: # Negative count is invalid
-        print(f"Error: Invalid replace_count '{count}'. Must be 0 (all) or positive.")
+    try:
+        new_text = replace_in_text(original_text, find_text, replace_text, count)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
     if new_text == original_text:
         print(f"Warning: The text '{find_text}' was not found on page '{page_title}' (or replace_text is identical). No edit was made.")
         sys.exit(0) # Not an error, but no change made
-    page.text = new_text
-    try:
-        page.save(summary=summary, bot=True)
-        print(f"Success: Replaced text on page '{page_title}'.")
-        print(f"Revision URL: {page.permalink()}")
-    except pywikibot.exceptions.Error as e:
-        print(f"Error saving (find_and_replace) page '{page_title}': {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during find_and_replace save: {e}")
-        sys.exit(1)
+    if save_page_text(page, original_text, new_text, summary, 'find_and_replace', nocreate=True):
+        report_saved(page, original_text, new_text, f"Success: Replaced text on page '{page_title}'.")
 
-def append_to_section(site, page_title, section_title, append_content, summary):
-    """Safely appends text to the end of a specific section of a page."""
+def append_to_section(site, page_title, section_titles, append_content, summary, ignore_case=False):
+    """Safely appends text to the end of one or more sections of a page, saving once."""
+    if isinstance(section_titles, str):
+        section_titles = [section_titles]
     page, wikicode = get_page_and_wikicode(site, page_title) # Ensure page exists
 
-    section_found = False
-    for section_idx, section in enumerate(wikicode.get_sections(flat=True, include_lead=True)):
-        headings = section.filter_headings()
-        current_section_title = ""
-        if headings:
-            current_section_title = headings[0].title.strip()
-
-        # Match lead/intro section (section_title can be '0', 'lead', or 'introduction')
-        is_lead_section_match = not headings and section_title.lower() in ['0', 'lead', 'introduction']
-
-        if is_lead_section_match or current_section_title == section_title:
-            # Append new content to the found section
-            # Ensure there's a newline before appended content if section isn't empty and doesn't end with newline
-            current_section_str = str(section).rstrip('\n')
-            if current_section_str: # If section has content
-                 wikicode.insert(wikicode.index(section) + len(section), f"\n{append_content}")
-            else: # Section is empty or just whitespace
-                 wikicode.insert(wikicode.index(section) + len(section), append_content)
-
-            section_found = True
-            break
-
-    if not section_found:
-        print(f"Error: Could not find section titled '{section_title}'. Ensure title matches exactly (case-sensitive) or use '0' for lead section.")
+    missing_titles = insert_into_sections(wikicode, section_titles, append_content, ignore_case)
+    if missing_titles:
+        for section_title in missing_titles:
+            print(f"Error: Could not find section titled '{section_title}'. Ensure title matches exactly (case-sensitive unless --ignore-case), use 'Parent/Child' for nested sections, or use '0' for lead section.")
         sys.exit(1)
+    section_title = "', '".join(section_titles)
 
-    page.text = str(wikicode)
-    try:
-        page.save(summary=summary, bot=True)
-        print(f"Success: Content appended to section '{section_title}' on page '{page_title}'.")
-        print(f"Revision URL: {page.permalink()}")
-    except pywikibot.exceptions.Error as e:
-        print(f"Error saving (append_to_section) page '{page_title}': {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during append_to_section save: {e}")
-        sys.exit(1)
+    original_text, new_text = page.text, str(wikicode)
+    if save_page_text(page, original_text, new_text, summary, 'append_to_section', nocreate=True):
+        report_saved(page, original_text, new_text, f"Success: Content appended to section '{section_title}' on page '{page_title}'.")
 
 def write_template_field(site, page_title, template_name, target_id_param_name, target_id_value, field_to_edit, new_field_value, summary):
     """Writes a value to a specific field in a targeted template on a page."""
     page, wikicode = get_page_and_wikicode(site, page_title) # Ensure page exists
-    template_found_and_edited = False
-    for template in wikicode.filter_templates():
-        if template.name.matches(template_name):
-            if template.has(target_id_param_name) and template.get(target_id_param_name).value.strip() == target_id_value:
-                if template.has(field_to_edit):
-                    template.get(field_to_edit).value = f" {new_field_value} " # Add spaces for cleaner formatting
-                else:
-                    template.add(field_to_edit, f" {new_field_value} ", before=None) # Add new param if not exist
-                template_found_and_edited = True
-                break # Assuming only one such template instance needs editing
 
-    if not template_found_and_edited:
+    if not set_template_field(wikicode, template_name, target_id_param_name, target_id_value, field_to_edit, new_field_value):
         print(f"Error: Template '{template_name}' with '{target_id_param_name}={target_id_value}' and field '{field_to_edit}' not found or field not editable as expected.")
         sys.exit(1)
 
-    page.text = str(wikicode)
-    try:
-        page.save(summary=summary, bot=True)
-        print(f"Success: Field '{field_to_edit}' in template '{template_name}' (ID: {target_id_value}) updated on page '{page_title}'.")
-        print(f"Revision URL: {page.permalink()}")
-    except pywikibot.exceptions.Error as e:
-        print(f"Error saving (write_template_field) page '{page_title}': {e}")
-        sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred during write_template_field save: {e}")
-        sys.exit(1)
+    original_text, new_text = page.text, str(wikicode)
+    if save_page_text(page, original_text, new_text, summary, 'write_template_field', nocreate=True):
+        report_saved(page, original_text, new_text, f"Success: Field '{field_to_edit}' in template '{template_name}' (ID: {target_id_value}) updated on page '{page_title}'.")
 
 
-def summarize_section(site, page_title, section_title):
-    """Gets section text and uses an LLM to summarize it."""
+def summarize_section(site, page_title, section_titles, ignore_case=False):
+    """Gets the text of one or more sections and uses an LLM to summarize each."""
+    if isinstance(section_titles, str):
+        section_titles = [section_titles]
     page, wikicode = get_page_and_wikicode(site, page_title) # Ensure page exists
+    section_index = build_section_index(wikicode)
 
-    section_text_found = ""
-    for section in wikicode.get_sections(include_lead=True, flat=True):
-        headings = section.filter_headings()
-        current_section_title_from_heading = ""
-        if headings:
-            current_section_title_from_heading = headings[0].title.strip()
+    section_texts = []
+    for section_title in section_titles:
+        section = find_section(section_index, section_title, ignore_case)
+        section_text_found = get_section_text(wikicode, section) if section else "" # Get clean text
+        if not section_text_found:
+            print(f"Error: Could not find section titled '{section_title}' for summarization.")
+            sys.exit(1)
+        section_texts.append((section_title, section_text_found))
 
-        is_lead_section_match = not headings and section_title.lower() in ['0', 'lead', 'introduction']
-
-        if is_lead_section_match or current_section_title_from_heading == section_title:
-            section_text_found = section.strip_code().strip() # Get clean text
-            break
-
-    if not section_text_found:
-        print(f"Error: Could not find section titled '{section_title}' for summarization.")
+    try:
+        backend = llm_service.get_client() # Configured once, with a response cache
+    except llm_service.LLMError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
-    print(f"Content fetched from section '{section_title}'. Sending to LLM for summarization...")
-    # Ensure llm_service.py and its functions (e.g., call_gemini) are correctly implemented and imported
-    prompt = f"Please provide a concise, one-paragraph summary of the following text:\n\n---\n{section_text_found}\n---"
-    llm_summary = llm_service.call_gemini(prompt) # Changed variable name to avoid conflict
-
-    print("\n--- Summary from Model ---")
-    print(llm_summary)
-    print("--------------------------")
+    for section_title, section_text_found in section_texts:
+        print(f"Content fetched from section '{section_title}'. Sending to LLM for summarization...")
+        print(f"\n--- Summary from Model ({section_title}) ---" if len(section_texts) > 1 else "\n--- Summary from Model ---")
+        # Long sections are chunked and summarized map-reduce style; the final summary streams as it arrives
+        try:
+            summarizer.summarize(section_text_found, backend)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        print("\n--------------------------")
 
 def append_to_page(site, page_title, append_content, summary):
     """Appends content to the very end of a page."""
     page, _ = get_page_and_wikicode(site, page_title) # Ensure page exists
-    
-    # Ensure there's a newline before the new content
-    if not page.text.endswith('\n'):
-        page.text += '\n'
-        
-    page.text += append_content
-    
+    original_text = page.text
+    new_text = append_to_text(original_text, append_content)
+    if save_page_text(page, original_text, new_text, summary, 'append_to_page', nocreate=True):
+        report_saved(page, original_text, new_text, f"Success: Content appended to page '{page_title}'.")
+
+# --- Batch Mode ---
+# A batch job file is JSON Lines, one edit per line, e.g.:
+#   {"action": "find_and_replace", "title": "Some Page", "find": "old", "replace": "new", "count": 0}
+#   {"action": "write_field", "title": "Some Page", "template_name": "IsidoreOodaVLOR", "target_id_value": "ALCUIN-L001", "field": "status", "value": "Done"}
+#   {"action": "append_to_section", "title": "Some Page", "section_title": "Log", "content": "* entry"}
+#     ("section_title" may also be a list of sections or a 'Parent/Child' path; add "ignore_case": true to relax matching)
+#   {"action": "append_to_page", "title": "Some Page", "content": "* entry"}
+# An optional "summary" key overrides the default edit summary for that job.
+BATCH_REQUIRED_FIELDS = {
+    'find_and_replace': ['find', 'replace'],
+    'write_field': ['template_name', 'target_id_value', 'field'],
+    'append_to_section': ['section_title', 'content'],
+    'append_to_page': ['content'],
+}
+
+def load_batch_jobs(jobs_path):
+    """Reads a JSONL job file and returns a list of (job_number, job) tuples. Blank lines are skipped."""
+    jobs = []
+    with open(jobs_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                job = {'_parse_error': f"Invalid JSON on line {line_number}: {e}"}
+            jobs.append((line_number, job))
+    return jobs
+
+def validate_job(job):
+    """Raises ValueError if a batch job is malformed. Performs no network I/O."""
+    if not isinstance(job, dict):
+        raise ValueError("Job must be a JSON object.")
+    if '_parse_error' in job:
+        raise ValueError(job['_parse_error'])
+    action = job.get('action')
+    if action not in BATCH_REQUIRED_FIELDS:
+        raise ValueError(f"Unsupported batch action '{action}'. Choose from: {', '.join(BATCH_REQUIRED_FIELDS)}.")
+    if not job.get('title'):
+        raise ValueError(f"Action '{action}' requires 'title'.")
+    missing = [field for field in BATCH_REQUIRED_FIELDS[action] if job.get(field) is None]
+    if missing:
+        raise ValueError(f"Action '{action}' requires: {', '.join(missing)}.")
+    if action == 'find_and_replace' and not isinstance(job.get('count', 1), int):
+        raise ValueError("'count' must be an integer (0 for all).")
+
+def apply_job(wikicode, job):
+    """Applies one validated job to a parsed page and returns the (possibly re-parsed) wikicode."""
+    action = job['action']
+    if action == 'find_and_replace':
+        original_text = str(wikicode)
+        new_text = replace_in_text(original_text, job['find'], job['replace'], job.get('count', 1))
+        if new_text == original_text:
+            raise ValueError(f"The text '{job['find']}' was not found (or replace text is identical).")
+        return mwparserfromhell.parse(new_text)
+    if action == 'write_field':
+        if not set_template_field(wikicode, job['template_name'], job.get('target_id_param', 'loop_id'),
+                                  job['target_id_value'], job['field'], job.get('value', '')):
+            raise ValueError(f"Template '{job['template_name']}' with '{job.get('target_id_param', 'loop_id')}={job['target_id_value']}' not found.")
+        return wikicode
+    if action == 'append_to_section':
+        section_titles = job['section_title'] if isinstance(job['section_title'], list) else [job['section_title']]
+        missing_titles = insert_into_sections(wikicode, section_titles, job['content'], job.get('ignore_case', False))
+        if missing_titles:
+            raise ValueError(f"Could not find section(s) titled: {', '.join(missing_titles)}.")
+        return wikicode
+    if action == 'append_to_page':
+        return mwparserfromhell.parse(append_to_text(str(wikicode), job['content']))
+    raise ValueError(f"Unsupported batch action '{action}'.")
+
+def job_result(job_number, job, status, result=None, error_message=None):
+    """Builds one per-job result record in the same shape the Arnanebtarium instrumenta report."""
+    record = {"status": status, "action": job.get('action') if isinstance(job, dict) else None,
+              "job": job_number, "title": job.get('title') if isinstance(job, dict) else None}
+    if result is not None:
+        record["result"] = result
+    if error_message is not None:
+        record["error_message"] = str(error_message)
+    return record
+
+def apply_page_jobs(site, page_title, page_jobs, make_summary=None):
+    """
+    Fetches and parses one page, applies all of its jobs in order and saves once.
+    make_summary(page_title, applied_jobs), if given, builds the edit summary.
+    Returns a list of per-job result records. Rate limiting and server errors are raised
+    instead, so a WikiExecutor can back off and run the page again.
+    """
+    page = pywikibot.Page(site, page_title)
     try:
-        page.save(summary=summary, bot=True)
-        print(f"Success: Content appended to page '{page_title}'.")
-        print(f"Revision URL: {page.permalink()}")
+        original_text = revision_cache.get_page_text(page)
+    except pywikibot.exceptions.NoPageError:
+        return [job_result(n, job, "failure", error_message=f"Page '{page_title}' does not exist.") for n, job in page_jobs]
     except pywikibot.exceptions.Error as e:
-        print(f"Error saving (append_to_page) page '{page_title}': {e}")
-        sys.exit(1)
+        if wiki_executor.is_rate_limit_error(e):
+            raise
+        return [job_result(n, job, "failure", error_message=f"Error fetching page: {e}") for n, job in page_jobs]
+
+    with toolkit_trace.span('page.parse', title=page_title, bytes=len(original_text.encode('utf-8'))):
+        wikicode = mwparserfromhell.parse(original_text)
+    results, applied = [], []
+    for job_number, job in page_jobs:
+        try:
+            wikicode = apply_job(wikicode, job)
+            applied.append((job_number, job))
+        except ValueError as e:
+            results.append(job_result(job_number, job, "failure", error_message=e))
+
+    if applied:
+        new_text = str(wikicode)
+        if new_text == original_text:
+            results.extend(job_result(n, job, "no_change") for n, job in applied)
+        else:
+            if make_summary:
+                summary = make_summary(page_title, applied)
+            else:
+                custom_summaries = [job['summary'] for _, job in applied if job.get('summary')]
+                actions = sorted({job['action'].replace('_', ' ') for _, job in applied})
+                summary = "; ".join(custom_summaries) or f"AIOps Toolkit (v18.1.0): batch of {len(applied)} edit(s) ({', '.join(actions)}) on page '{page_title}'"
+            page.text = new_text
+            try:
+                page.save(summary=summary, bot=True, nocreate=True) # Pinned to the fetched revision
+                revision = {"revision_url": page.permalink(),
+                            "bytes_changed": len(new_text.encode('utf-8')) - len(original_text.encode('utf-8'))}
+                results.extend(job_result(n, job, "success", result=revision) for n, job in applied)
+            except Exception as e:
+                if wiki_executor.is_rate_limit_error(e):
+                    raise # Nothing was saved, so the whole page can be re-run
+                results.extend(job_result(n, job, "failure", error_message=f"Error saving page: {e}") for n, job in applied)
+
+    return sorted(results, key=lambda r: r["job"])
+
+def run_batch(site, jobs_path, workers=1):
+    """
+    Applies every job in a JSONL file using one site session. Jobs are grouped by page title
+    so each page is fetched, parsed and saved once. With workers > 1, pages are processed
+    concurrently (jobs for one page still apply in order). Prints one JSON result line per job.
+    Returns True if every job succeeded (or needed no change).
+    """
+    return run_jobs(site, load_batch_jobs(jobs_path), workers)
+
+def run_jobs(site, numbered_jobs, workers=1, make_summary=None):
+    """Validates, groups and applies (job_number, job) pairs as run_batch does."""
+    grouped_jobs = {} # Insertion-ordered: pages are processed in order of first appearance
+    all_ok = True
+    for job_number, job in numbered_jobs:
+        try:
+            validate_job(job)
+        except ValueError as e:
+            print(json.dumps(job_result(job_number, job, "failure", error_message=e)), flush=True)
+            all_ok = False
+            continue
+        grouped_jobs.setdefault(job['title'], []).append((job_number, job))
+
+    def throttled(title, error):
+        return [job_result(n, job, "failure", error_message=f"The wiki is throttling requests: {error}") for n, job in grouped_jobs[title]]
+
+    if workers > 1:
+        with wiki_executor.WikiExecutor(workers) as executor:
+            page_results = (_result_or_failure(future.result, lambda e: throttled(title, e)) for title, future in executor.map_pages(
+                grouped_jobs, lambda title: apply_page_jobs(site, title, grouped_jobs[title], make_summary)))
+            all_ok = _print_batch_results(page_results) and all_ok
+    else:
+        page_results = (_result_or_failure(lambda: apply_page_jobs(site, title, page_jobs, make_summary), lambda e: throttled(title, e))
+                        for title, page_jobs in grouped_jobs.items())
+        all_ok = _print_batch_results(page_results) and all_ok
+    return all_ok
+
+def _result_or_failure(get_result, make_failure):
+    """Returns get_result(), or make_failure(error) for a rate-limit error still raised after any retries."""
+    try:
+        return get_result()
     except Exception as e:
-        print(f"An unexpected error occurred during append_to_page save: {e}")
-        sys.exit(1)
+        if not wiki_executor.is_rate_limit_error(e):
+            raise
+        return make_failure(e)
+
+def _print_batch_results(page_results):
+    """Streams per-job result lines as each page finishes. Returns True if none failed."""
+    all_ok = True
+    for records in page_results:
+        for record in records:
+            print(json.dumps(record), flush=True)
+            all_ok = all_ok and record["status"] != "failure"
+    return all_ok
+
+# --- Bulk Field Updates ---
+# A fields file sets VLOR loop fields across pages. CSV needs a header row; JSONL has one object per line:
+#   loop_id,field,value
+#   ALCUIN-L001,status,Done
+#   {"loop_id": "ALCUIN-L002", "field": "status", "value": "In Progress"}
+# Each loop is resolved to its page through the VLOR index (an optional "title" column skips the lookup).
+# Rows are grouped by page and written as batch jobs: one parse, one serialize and one save per page.
+FIELD_UPDATE_COLUMNS = ['loop_id', 'field', 'value']
+EDIT_SUMMARY_LIMIT = 500 # MediaWiki truncates longer summaries
+
+def load_field_updates(fields_path):
+    """Reads a CSV or JSONL fields file into (row_number, row) pairs. Raises ValueError for malformed rows."""
+    rows = []
+    with open(fields_path, 'r', encoding='utf-8', newline='') as f:
+        if fields_path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            missing = [c for c in FIELD_UPDATE_COLUMNS if c not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}.")
+            rows = [(reader.line_num, row) for row in reader]
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        rows.append((line_number, json.loads(line)))
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Invalid JSON on line {line_number}: {e}") from e
+    for row_number, row in rows:
+        if not isinstance(row, dict) or not row.get('loop_id') or not row.get('field') or row.get('value') is None:
+            raise ValueError(f"Row {row_number} needs non-empty 'loop_id' and 'field', and a 'value' (which may be empty).")
+    return rows
+
+def field_update_summary(page_title, applied):
+    changes = ", ".join(f"{job['target_id_value']}.{job['field']}={job['value']}" for _, job in applied)
+    summary = f"AIOps Toolkit (v18.1.0): set {len(applied)} loop field(s) on page '{page_title}': {changes}"
+    return summary if len(summary) <= EDIT_SUMMARY_LIMIT else summary[:EDIT_SUMMARY_LIMIT - 3] + "..."
+
+def run_field_updates(site, rows, workers=1):
+    """Resolves each row's loop to its page, then applies all writes per page with one save. Returns True if none failed."""
+    index = vlor_index.get_index(site)
+    if any(not row.get('title') and index.get_loop(row['loop_id']) is None for _, row in rows):
+        print("Some loop IDs are not in the VLOR index; rebuilding it once...")
+        index = vlor_index.build_index(site, index)
+
+    numbered_jobs, all_resolved = [], True
+    for row_number, row in rows:
+        loop = None if row.get('title') else index.get_loop(row['loop_id'])
+        job = {"action": "write_field", "title": row.get('title') or (loop and loop['page']),
+               "template_name": vlor_index.VLOR_TEMPLATE_NAME, "target_id_param": 'loop_id',
+               "target_id_value": row['loop_id'], "field": row['field'], "value": str(row['value'])}
+        if not job['title']:
+            print(json.dumps(job_result(row_number, job, "failure",
+                                        error_message=f"Loop ID '{row['loop_id']}' was not found on any VLOR page.")), flush=True)
+            all_resolved = False
+            continue
+        numbered_jobs.append((row_number, job))
+    return run_jobs(site, numbered_jobs, workers, field_update_summary) and all_resolved
+
+# --- Rules Mode ---
+# Applies a rules file (see replace_engine.py) to many pages: each page is fetched in a
+# multi-title batch, rewritten in a single pass by all rules and saved at most once.
+
+def nested_section_span(section_index, section):
+    """Character range of a section including its subsections (up to the next heading of the same or higher level)."""
+    if section["level"] == 0:
+        return section["char_start"], section["char_end"]
+    position = next(i for i, entry in enumerate(section_index) if entry is section)
+    for later in section_index[position + 1:]:
+        if later["level"] <= section["level"]:
+            return section["char_start"], later["char_start"]
+    return section["char_start"], section_index[-1]["char_end"]
+
+def make_section_resolver(text):
+    section_index = build_section_index(mwparserfromhell.parse(text))
+
+    def resolve(section_title):
+        section = find_section(section_index, section_title)
+        return nested_section_span(section_index, section) if section else None
+    return resolve
+
+def load_titles_file(titles_path):
+    """One title per line; blank lines and lines starting with '#' are skipped."""
+    with open(titles_path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def apply_rules_to_page(page, rule_set, rules_name):
+    """
+    Applies a compiled rule set to one preloaded page and saves once. Returns a result record.
+    Rate limiting and server errors are raised instead, so a WikiExecutor can back off and retry.
+    """
+    page_title = page.title()
+    record = {"status": "no_change", "action": "replace_rules", "title": page_title}
+    if not page.exists(): # Preloaded without the revision cache, a missing page still comes back
+        record.update(status="failure", error_message=f"Page '{page_title}' does not exist.")
+        return record
+    try:
+        original_text = page.text
+        resolver = make_section_resolver(original_text) if rule_set.needs_sections() else None
+        new_text, counts, missing_sections = rule_set.apply(original_text, resolver)
+    except Exception as e:
+        if wiki_executor.is_rate_limit_error(e):
+            raise
+        record.update(status="failure", error_message=f"Error applying rules: {e}")
+        return record
+    result = {"replacements": {rule['name']: count for rule, count in zip(rule_set.rules, counts) if count}}
+    if missing_sections:
+        result["missing_sections"] = missing_sections
+    if new_text != original_text:
+        summary = f"AIOps Toolkit (v18.1.0): {sum(counts)} replacement(s) from rules '{rules_name}' on page '{page_title}'"
+        page.text = new_text
+        try:
+            page.save(summary=summary, bot=True, nocreate=True) # Pinned to the fetched revision
+            record["status"] = "success"
+            result["revision_url"] = page.permalink()
+            result["bytes_changed"] = len(new_text.encode('utf-8')) - len(original_text.encode('utf-8'))
+        except Exception as e:
+            if wiki_executor.is_rate_limit_error(e):
+                revision_cache.attach_text(page, original_text) # A retry must start from the unsaved text
+                raise
+            record.update(status="failure", error_message=f"Error saving page: {e}")
+    record["result"] = result
+    return record
+
+def run_rules(site, rule_set, rules_name, titles, categories=None, workers=1):
+    """
+    Applies rule_set to every page in titles and categories, fetching text in batches.
+    Prints one JSON result line per page (a failure for each given title that does not exist).
+    Returns True if no page failed.
+    """
+    explicit_pages = [pywikibot.Page(site, title) for title in titles]
+    seen_titles, loaded_titles = set(), set()
+
+    def target_pages():
+        category_pages = vlor_discovery.iter_category_members(site, categories) if categories else ()
+        for page in (*explicit_pages, *category_pages):
+            if page.title() not in seen_titles:
+                seen_titles.add(page.title())
+                yield page
+
+    def loaded(pages):
+        for page in pages:
+            loaded_titles.add(page.title())
+            yield page
+
+    def throttled(title, error):
+        return {"status": "failure", "action": "replace_rules", "title": title,
+                "error_message": f"The wiki is throttling requests: {error}"}
+
+    preloaded = loaded(vlor_discovery.preload_pages(target_pages()))
+    if workers > 1:
+        with wiki_executor.WikiExecutor(workers) as executor:
+            futures = {executor.submit(page.title(), apply_rules_to_page, page, rule_set, rules_name): page.title() for page in preloaded}
+            all_ok = _print_batch_results([_result_or_failure(future.result, lambda e: throttled(futures[future], e))]
+                                          for future in as_completed(futures))
+    else:
+        all_ok = _print_batch_results([_result_or_failure(lambda: apply_rules_to_page(page, rule_set, rules_name),
+                                                          lambda e: throttled(page.title(), e))] for page in preloaded)
+    # With the revision cache on, the preload drops pages that do not exist; report the titles that were asked for
+    missing_titles = sorted({page.title() for page in explicit_pages} - loaded_titles)
+    _print_batch_results([{"status": "failure", "action": "replace_rules", "title": title,
+                           "error_message": f"Page '{title}' does not exist."}] for title in missing_titles)
+    return all_ok and not missing_titles
 
 # --- Main Dispatcher ---
-def main():
+def main(argv=None, site=None):
+    """Runs one command line. The daemon passes its own argv and already logged-in site."""
     parser = argparse.ArgumentParser(
         description='A unified tool for MediaWiki editing, now with LLM summarization. Version 18.1.0 (Stable Main Dispatcher)',
         formatter_class=argparse.RawTextHelpFormatter
     )
-    parser.add_argument('--action',
+    mode_group = parser.add_mutually_exclusive_group(required=True)
+    mode_group.add_argument('--action',
                     choices=['write', 'overwrite', 'append_to_section', 'find_and_replace', 'write_field', 'summarize_section', 'append_to_page'],
-                    required=True,
                     help="The action to perform.")
+    mode_group.add_argument('--batch', metavar='JOBS_JSONL',
+                    help="Path to a JSONL job file. Applies all edits with one login, one fetch and one save per page,\nprinting one JSON result line per job.")
+    mode_group.add_argument('--rules', metavar='RULES_JSONL',
+                    help="Path to a JSONL rules file of literal/regex replacements (see replace_engine.py). Applies all rules\nin one pass per page and saves each page at most once. Target pages with --title, --titles-file and/or --category.")
+    mode_group.add_argument('--fields', metavar='FIELDS_FILE',
+                    help="Path to a CSV (header: loop_id,field,value[,title]) or JSONL file of VLOR loop field writes.\nLoops are resolved to pages via the VLOR index; each page is saved once with a combined summary.")
+    parser.add_argument('--workers', type=int, default=1,
+                    help="With --batch, --rules or --fields: number of pages to process concurrently. Default is 1 (sequential).")
+    parser.add_argument('--titles-file', help="With --rules: file with one page title per line.")
+    parser.add_argument('--category', action='append', help="With --rules: apply to every page in this category. Repeatable.")
     # ... (all other argparse arguments as they were, they are correct) ...
-    parser.add_argument('--title', required=True, help="The title of the MediaWiki page.")
+    parser.add_argument('--title', help="The title of the MediaWiki page. Required with --action.")
     parser.add_argument('--content', help="Direct string content for write/overwrite/append actions.")
     parser.add_argument('--from-file', help="Path to a file containing content for write/overwrite/append actions.")
-    parser.add_argument('--section-title', help="The title of the section for 'append_to_section' or 'summarize_section'. Use '0' or 'lead' for the lead section.")
+    parser.add_argument('--section-title', action='append', help="The title of the section for 'append_to_section' or 'summarize_section'. Use '0' or 'lead' for the lead section.\nUse 'Parent/Child' to target a nested section. Repeat to target several sections in one call.")
+    parser.add_argument('--ignore-case', action='store_true', help="Match --section-title case-insensitively.")
     parser.add_argument('--find', help="String to find for 'find_and_replace'.")
     parser.add_argument('--replace', help="String to replace with for 'find_and_replace'. Can be empty.")
     parser.add_argument('--replace-count', type=int, default=1, help="Occurrences to replace for 'find_and_replace'. Use 0 for all. Default is 1.")
@@ -253,17 +726,43 @@ def main():
     parser.add_argument('--field', help="Template field name (parameter name) to write to. For 'write_field'.")
     parser.add_argument('--value', help="New value for the template field. Can be empty. For 'write_field'.")
 
-    args = parser.parse_args()
-
-    try:
-        site = get_wiki_site()
-    except Exception as e:
-        print(f"Failed to connect to wiki or login: {e}")
-        sys.exit(1)
+    args = parser.parse_args(argv)
+    if args.action and not args.title:
+        parser.error("--title is required with --action.")
+    if args.batch and not os.path.isfile(args.batch):
+        parser.error(f"--batch: File not found at '{args.batch}'")
+    if args.fields:
+        try:
+            field_rows = load_field_updates(args.fields)
+        except (OSError, ValueError) as e:
+            parser.error(f"--fields: {e}")
+    if args.rules:
+        if not (args.title or args.titles_file or args.category):
+            parser.error("--rules requires --title, --titles-file and/or --category.")
+        # Rules and titles are checked before logging in, so mistakes cost no network round trips
+        try:
+            rule_set = replace_engine.RuleSet(replace_engine.load_rules(args.rules))
+            rule_titles = ([args.title] if args.title else []) + (load_titles_file(args.titles_file) if args.titles_file else [])
+        except (OSError, ValueError) as e:
+            parser.error(f"--rules: {e}")
+
+    if site is None:
+        try:
+            site = get_wiki_site()
+        except Exception as e:
+            print(f"Failed to connect to wiki or login: {e}")
+            sys.exit(1)
+
+    if args.batch:
+        sys.exit(0 if run_batch(site, args.batch, args.workers) else 1)
+    if args.fields:
+        sys.exit(0 if run_field_updates(site, field_rows, args.workers) else 1)
+    if args.rules:
+        sys.exit(0 if run_rules(site, rule_set, os.path.basename(args.rules), rule_titles, args.category, args.workers) else 1)
 
     # Determine content source for actions that need it
     content_for_actions = ""
-    if args.action in ['write', 'overwrite', 'append_to_section']:
+    if args.action in ['write', 'overwrite', 'append_to_section', 'append_to_page']:
         if args.content:
             content_for_actions = args.content
         elif args.from_file:
@@ -282,7 +781,7 @@ def main():
     summary_action_verb = args.action.replace('_', ' ')
     summary = f"AIOps Toolkit (v18.1.0): {summary_action_verb} on page '{args.title}'"
     if args.action == 'summarize_section': # summarize_section doesn't make an edit, so summary is less relevant unless logged
-        summary = f"AIOps Toolkit (v18.1.0): analyzed section '{args.section_title}' on page '{args.title}' for summarization"
+        summary = f"AIOps Toolkit (v18.1.0): analyzed section '{', '.join(args.section_title or [])}' on page '{args.title}' for summarization"
 
     # Dispatch to appropriate action function
     if args.action == 'write':
@@ -297,7 +796,7 @@ def main():
         if not args.section_title:
             parser.error("Action 'append_to_section' requires --section-title.")
         # content_for_actions will be the text to append (can be empty if desired, though usually not)
-        append_to_section(site, args.title, args.section_title, content_for_actions, summary)
+        append_to_section(site, args.title, args.section_title, content_for_actions, summary, args.ignore_case)
     elif args.action == 'find_and_replace':
         if args.find is None or args.replace is None: # find is required, replace can be empty
             parser.error("Action 'find_and_replace' requires --find and --replace arguments.")
@@ -311,13 +810,10 @@ def main():
     elif args.action == 'append_to_page':
         # This action requires content, which is already handled by content_for_actions
         append_to_page(site, args.title, content_for_actions, summary)
-    elif args.action == 'append_to_page':
-        # This action requires content, which is already handled by content_for_actions
-        append_to_page(site, args.title, content_for_actions, summary)
     elif args.action == 'summarize_section':
         if not args.section_title:
             parser.error("Action 'summarize_section' requires --section-title.")
-        summarize_section(site, args.title, args.section_title) # This action prints, doesn't save to wiki with 'summary'
+        summarize_section(site, args.title, args.section_title, args.ignore_case) # This action prints, doesn't save to wiki with 'summary'
     else:
         # This should not be reached due to 'choices' in argparse
         print(f"Internal Error: Unhandled action '{args.action}'.")
@@ -0,0 +1,327 @@
+# page_tool_daemon.py
+# Version 1.0
+# A resident page_tool server on a local Unix domain socket.
+#
+# The daemon imports page_tool once, logs in once, and keeps the revision
+# cache, LLM client and parsed-page LRU warm between requests, so a command
+# costs only its own API calls. Requests are served one at a time.
+#
+#   python3 page_tool_daemon.py serve            # start (foreground)
+#   python3 page_tool_daemon.py status | stop
+#   python3 page_tool_daemon.py instrumentum create_page < command.json
+#
+# While the daemon runs, "python3 page_tool.py --action ..." forwards itself
+# to it automatically (set AIOPS_TOOLKIT_NO_DAEMON=1 to run in-process).
+#
+# Protocol: one JSON object per connection, answered with JSON lines. Output is
+# streamed as the command writes it, so batch results and summaries arrive live;
+# the last line is the result.
+#   {"argv": [...], "cwd": "...", "env": {...}}
+#       -> {"stream": "stdout" | "stderr", "text": "..."} lines, then {"exit_code": n}
+#   {"instrumentum": "create_page", "stdin": "...", "env": {...}} -> same shape
+#   {"command": "ping" | "stop"} -> {"status": "ok", ...}
+# pywikibot's log messages are part of stderr: its terminal interface writes to
+# whatever sys.stderr is when the message is logged.
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+
+# --- CONFIGURATION ---
+SOCKET_ENV_VAR = "AIOPS_TOOLKIT_DAEMON_SOCKET"
+NO_DAEMON_ENV_VAR = "AIOPS_TOOLKIT_NO_DAEMON"
+SOCKET_FILENAME = 'page_tool.sock'
+ENV_PREFIX = "AIOPS_TOOLKIT_" # Client variables applied to each request (e.g. the overwrite approval token)
+CLIENT_TIMEOUT_SECONDS = 600
+OUTPUT_CHUNK_CHARS = 8192 # Output without a newline is still sent once this much has built up
+# Only approved instrumenta may run inside the daemon
+INSTRUMENTA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Arnanebtarium', 'Licet_Agere')
+
+def get_socket_path():
+    path = os.environ.get(SOCKET_ENV_VAR)
+    if path:
+        return path
+    # Mirrors revision_cache.get_cache_dir() without importing it on the client path
+    cache_dir = os.environ.get('AIOPS_TOOLKIT_CACHE_DIR') or os.path.expanduser('~/.cache/aiops_toolkit')
+    return os.path.join(cache_dir, SOCKET_FILENAME)
+
+# --- Client ---
+
+def send_request(request, socket_path=None, timeout=CLIENT_TIMEOUT_SECONDS, on_output=None):
+    """
+    Sends one request and returns the decoded result. Raises OSError if no daemon is listening.
+    Streamed output is passed to on_output(stream_name, text) as it arrives or, without
+    on_output, collected into the result's "stdout" and "stderr".
+    """
+    collected = {"stdout": [], "stderr": []}
+    response = None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path or get_socket_path())
+        client.sendall(json.dumps(request).encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+        with client.makefile('rb') as reader:
+            for line in reader:
+                message = json.loads(line.decode('utf-8'))
+                if 'stream' not in message:
+                    response = message
+                    break
+                if on_output:
+                    on_output(message['stream'], message['text'])
+                else:
+                    collected[message['stream']].append(message['text'])
+    if response is None:
+        raise ValueError("The daemon closed the connection without a result.")
+    for name, texts in collected.items():
+        if texts:
+            response[name] = "".join(texts) + response.get(name, '')
+    return response
+
+def client_env():
+    return {key: value for key, value in os.environ.items() if key.startswith(ENV_PREFIX)}
+
+def _write_output(stream_name, text):
+    stream = sys.stdout if stream_name == 'stdout' else sys.stderr
+    stream.write(text)
+    stream.flush()
+
+def _emit_and_exit(response):
+    sys.stdout.write(response.get('stdout', ''))
+    sys.stderr.write(response.get('stderr', ''))
+    sys.exit(response.get('exit_code', 1))
+
+def forward_if_running(argv):
+    """
+    Runs a page_tool command line in the daemon and exits with its result.
+    Returns without doing anything if no daemon is running, so the caller falls back to in-process.
+    """
+    if os.environ.get(NO_DAEMON_ENV_VAR):
+        return
+    socket_path = get_socket_path()
+    if not os.path.exists(socket_path):
+        return
+    output_seen = []
+
+    def on_output(stream_name, text):
+        output_seen.append(True)
+        _write_output(stream_name, text)
+
+    try:
+        response = send_request({"argv": list(argv), "cwd": os.getcwd(), "env": client_env()}, socket_path, on_output=on_output)
+    except (OSError, ValueError) as e:
+        if not output_seen:
+            return # Stale socket or daemon gone: run in-process
+        # The command was already running: running it again in-process could repeat its edits
+        print(f"\nError: Lost the page_tool daemon mid-command: {e}", file=sys.stderr)
+        sys.exit(1)
+    _emit_and_exit(response)
+
+# --- Server ---
+
+class _LineSender:
+    """Sends JSON lines to one client. Thread-safe; once the client has gone away, lines are dropped."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def __call__(self, message):
+        with self.lock:
+            if self.connection is None:
+                return
+            try:
+                self.connection.sendall((json.dumps(message) + "\n").encode('utf-8'))
+            except OSError:
+                self.connection = None # Client went away; the command still runs to completion
+
+class _StreamedOutput:
+    """A write-only text stream whose output goes to the client a line (or OUTPUT_CHUNK_CHARS) at a time."""
+
+    def __init__(self, name, send):
+        self.name = name
+        self.send = send
+        self.pending = []
+        self.pending_chars = 0
+        self.lock = threading.Lock() # pywikibot logs from worker threads
+
+    def write(self, text):
+        with self.lock:
+            self.pending.append(text)
+            self.pending_chars += len(text)
+            if '\n' in text or self.pending_chars >= OUTPUT_CHUNK_CHARS:
+                self._send_pending()
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            self._send_pending()
+
+    def _send_pending(self):
+        if self.pending:
+            self.send({"stream": self.name, "text": "".join(self.pending)})
+            self.pending, self.pending_chars = [], 0
+
+    def isatty(self):
+        return False
+
+    def writable(self):
+        return True
+
+class _RequestContext:
+    """Applies a client's cwd, AIOPS_TOOLKIT_* environment and stdin for one request, streaming its output."""
+
+    def __init__(self, request, send):
+        import io
+        self.request = request
+        self.stdout = _StreamedOutput('stdout', send)
+        self.stderr = _StreamedOutput('stderr', send)
+        self.stdin = io.StringIO(request.get('stdin', ''))
+
+    def __enter__(self):
+        self.saved_cwd = os.getcwd()
+        self.saved_env = {key: value for key, value in os.environ.items() if key.startswith(ENV_PREFIX)}
+        self.saved_streams = (sys.stdin, sys.stdout, sys.stderr)
+        for key in self.saved_env:
+            del os.environ[key]
+        os.environ.update(self.request.get('env', {}))
+        if self.request.get('cwd'):
+            os.chdir(self.request['cwd'])
+        sys.stdin, sys.stdout, sys.stderr = self.stdin, self.stdout, self.stderr
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stdout.flush()
+        self.stderr.flush()
+        sys.stdin, sys.stdout, sys.stderr = self.saved_streams
+        os.chdir(self.saved_cwd)
+        for key in [k for k in os.environ if k.startswith(ENV_PREFIX)]:
+            del os.environ[key]
+        os.environ.update(self.saved_env)
+
+def _run_streamed(request, fn, send):
+    """Runs fn() in the request's context, streaming its output through send. Returns the result message."""
+    exit_code = 0
+    with _RequestContext(request, send):
+        try:
+            fn()
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if not isinstance(e.code, (int, type(None))):
+                print(e.code, file=sys.stderr)
+        except Exception as e:
+            import traceback
+            print(f"An unhandled error occurred: {e}")
+            traceback.print_exc()
+            exit_code = 1
+    return {"exit_code": exit_code}
+
+class PageToolServer:
+    """Holds the logged-in site and serves requests on a Unix socket, one at a time."""
+
+    def __init__(self, socket_path=None):
+        import page_tool # Deferred: the client path must stay light
+        self.page_tool = page_tool
+        self.socket_path = socket_path or get_socket_path()
+        self.site = page_tool.get_wiki_site()
+        self.instrumenta = {}
+        self.running = False
+
+    def handle(self, request, send):
+        """Serves one request, streaming command output through send. Returns the result message."""
+        command = request.get('command')
+        if command == 'ping':
+            return {"status": "ok", "pid": os.getpid(), "site": str(self.site)}
+        if command == 'stop':
+            self.running = False
+            return {"status": "ok", "stopping": True}
+        if 'argv' in request:
+            return _run_streamed(request, lambda: self.page_tool.main(request['argv'], site=self.site), send)
+        if 'instrumentum' in request:
+            return self.run_instrumentum(request, send)
+        return {"exit_code": 2, "stdout": "", "stderr": f"Unknown request: {sorted(request)}\n"}
+
+    def run_instrumentum(self, request, send):
+        """Runs an approved instrumentum's main() in-process; it reuses the daemon's pywikibot site and session."""
+        import runpy
+        name = request['instrumentum']
+        path = os.path.join(INSTRUMENTA_DIR, f"instrumentum_{name}.py")
+        if os.path.basename(name) != name or not os.path.isfile(path):
+            return {"exit_code": 2, "stdout": "", "stderr": f"No approved instrumentum named '{name}'.\n"}
+        return _run_streamed(request, lambda: runpy.run_path(path, run_name='__main__'), send)
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            try:
+                send_request({"command": "ping"}, self.socket_path, timeout=2)
+                print(f"Error: A daemon is already listening on '{self.socket_path}'.")
+                sys.exit(1)
+            except (OSError, ValueError):
+                os.unlink(self.socket_path) # Stale socket from a previous run
+        # The default directory (the toolkit cache) may not exist yet on a fresh account
+        os.makedirs(os.path.dirname(self.socket_path) or '.', mode=0o700, exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177) # The socket carries a logged-in session: owner only
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        self.running = True
+        print(f"page_tool daemon listening on '{self.socket_path}' (pid {os.getpid()}).", flush=True)
+        try:
+            while self.running:
+                connection, _ = server.accept()
+                with connection:
+                    self._serve_connection(connection)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            print("page_tool daemon stopped.", flush=True)
+
+    def _serve_connection(self, connection):
+        chunks = []
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        send = _LineSender(connection)
+        try:
+            request = json.loads(b"".join(chunks).decode('utf-8'))
+            response = self.handle(request, send)
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"exit_code": 2, "stdout": "", "stderr": f"Invalid request: {e}\n"}
+        send(response)
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Resident page_tool server on a local Unix socket.")
+    parser.add_argument('command', choices=['serve', 'status', 'stop', 'instrumentum'])
+    parser.add_argument('name', nargs='?', help="With 'instrumentum': the approved instrumentum to run (e.g. create_page). Its JSON command is read from stdin.")
+    parser.add_argument('--socket', help=f"Socket path. Default: ${SOCKET_ENV_VAR} or the toolkit cache directory.")
+    args = parser.parse_args()
+    socket_path = args.socket or get_socket_path()
+
+    if args.command == 'serve':
+        PageToolServer(socket_path).serve_forever()
+        return
+    if args.command == 'instrumentum' and not args.name:
+        parser.error("'instrumentum' requires the instrumentum name.")
+    try:
+        if args.command == 'instrumentum':
+            _emit_and_exit(send_request({"instrumentum": args.name, "stdin": sys.stdin.read(), "env": client_env()}, socket_path,
+                                        on_output=_write_output))
+        response = send_request({"command": 'ping' if args.command == 'status' else 'stop'}, socket_path)
+    except (OSError, ValueError) as e:
+        print(f"No page_tool daemon is running on '{socket_path}': {e}")
+        sys.exit(1)
+    print(json.dumps(response))
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,43 @@
 import pywikibot
-import mwparserfromhell
 import datetime
 import re
 import sys
+import revision_cache
+import toolkit_trace
+import vlor_index
 
-def get_dynamic_vlor_map(site):
-    """Dynamically builds VLOR_PAGE_MAP from category pages using template data."""
-    vlor_map = {}
-    for category_name in ["Initiative_VLOR", "Operation_VLOR"]:
-        category = pywikibot.Category(site, f"Category:{category_name}")
-        pages = list(category.articles())
-        print(f"  - Found {len(pages)} pages in '{category_name}'.")
-        for page in pages:
-            title = page.title()
-            wikicode = mwparserfromhell.parse(page.text)
-            for t in wikicode.filter_templates(matches="IsidoreOodaVLOR"):
-                if t.has("operation"):
-                    operation = t.get("operation").value.strip().upper()
-                    vlor_map[operation] = title
-                    print(f"  - Mapped: {operation} -> {title}")
-    print(f"Total unique VLOR pages mapped: {len(vlor_map)}.")
-    return vlor_map
+def resolve_loop(site, loop_id):
+    """
+    Resolves a loop ID through the persisted VLOR index without scanning categories.
+    The index is rebuilt only if the loop is unknown, and the loop's page is re-indexed
+    if it has a newer revision. Returns the loop record, or None if it does not exist.
+    """
+    index = vlor_index.VLORIndex.load()
+    loop = index.get_loop(loop_id) if index else None
+    if loop is None:
+        print("Loop not found in the local VLOR index. Rebuilding index from the wiki...")
+        return vlor_index.build_index(site, index).get_loop(loop_id)
+
+    vlor_page = pywikibot.Page(site, loop['page'])
+    try:
+        latest_revid = vlor_page.latest_revision_id
+    except pywikibot.exceptions.NoPageError:
+        print(f"VLOR page '{loop['page']}' no longer exists. Rebuilding index from the wiki...")
+        return vlor_index.build_index(site, index).get_loop(loop_id)
+    if latest_revid != loop['revid']:
+        index.update_page(loop['page'], latest_revid, revision_cache.get_page_text(vlor_page))
+        index.save()
+        loop = index.get_loop(loop_id)
+        if loop is None:
+            print("Loop has moved off its indexed VLOR page. Rebuilding index from the wiki...")
+            return vlor_index.build_index(site, index).get_loop(loop_id)
+    return loop
 
 def preflight_check():
     if len(sys.argv) > 1 and sys.argv[1] != __file__:  # Avoid running if imported
         return
     
+    toolkit_trace.instrument_pywikibot()
     site = pywikibot.Site()
     site.login()
     print(f"Logged in as: {site.user()}")  # Debug login
@@ -58,28 +70,12 @@ def preflight_check():
             print("Aborted.")
             return
     
-    vlor_page_title = get_dynamic_vlor_map(site).get(re.match(r'^([A-Z]+)', loop_id).group(1))
-    if not vlor_page_title:
-        print(f"Error: Operation for '{loop_id}' not found in dynamic VLOR map.")
-        return
-    
-    vlor_page = pywikibot.Page(site, vlor_page_title)
-    if not vlor_page.exists():
-        print(f"Error: VLOR page '{vlor_page_title}' does not exist.")
-        return
-        
-    wikicode = mwparserfromhell.parse(vlor_page.text)
-    loop_content = None
-    for template in wikicode.filter_templates():
-        if (template.name.strip() == "IsidoreOodaVLOR" and 
-            template.has("loop_id") and 
-            template.get("loop_id").value.strip().upper() == loop_id):
-            loop_content = str(template)
-            break
-    
-    if not loop_content:
-        print(f"Error: Loop '{loop_id}' not found in '{vlor_page_title}'.")
+    loop = resolve_loop(site, loop_id)
+    if not loop:
+        print(f"Error: Loop '{loop_id}' not found in any VLOR page.")
         return
+    vlor_page_title = loop['page']
+    loop_content = loop['wikitext']
     
     vlor_url = f"https://www.ooda.wiki/wiki/{vlor_page_title.replace(' ', '_')}"
     page_content = f"== Session Context: {loop_id} ==\n"
@@ -0,0 +1,186 @@
+# replace_engine.py
+# Version 1.0
+# Multi-rule find/replace applied in a single pass over a page's text.
+#
+# All rules (literal and regex) are compiled once into one alternation
+# pattern, so a page is scanned a single time however many rules there are.
+# Where rules overlap, the leftmost match wins, and at the same position the
+# rule listed first wins; if that rule may not replace there (out of its
+# section, over its count, inside a skipped tag), the next rules are tried at
+# the same position. Each rule may limit its number of replacements,
+# be confined to one or more sections, and skips text inside <pre>/<nowiki>
+# unless told otherwise.
+#
+# A rules file is JSON Lines, one rule per line, e.g.:
+#   {"find": "Operation Foo", "replace": "Operation Bar"}
+#   {"find": "\\bTODO\\b", "replace": "DONE", "regex": true, "count": 1, "section": "Status"}
+#   {"find": "colour", "replace": "color", "ignore_case": true, "skip_tags": []}
+# Regex rules may use \1 or \g<name> in "replace". Optional "name" labels
+# the rule in reports.
+
+import bisect
+import json
+import re
+
+# --- CONFIGURATION ---
+DEFAULT_SKIP_TAGS = ['pre', 'nowiki']
+RULE_FIELDS = {'find', 'replace', 'regex', 'count', 'ignore_case', 'section', 'skip_tags', 'name'}
+GROUP_PREFIX = '_rule'
+LEADING_FLAGS_RE = re.compile(r'^\(\?([aiLmsux]+)\)')
+NUMBERED_BACKREFERENCE_RE = re.compile(r'(?<!\\)\\[1-9]')
+
+def load_rules(rules_path):
+    """Reads and validates a JSONL rules file. Raises ValueError naming the offending line."""
+    rules = []
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                rule = json.loads(line)
+                validate_rule(rule)
+            except (json.JSONDecodeError, ValueError) as e:
+                raise ValueError(f"Rules file line {line_number}: {e}") from e
+            rule.setdefault('name', f"line {line_number}")
+            rules.append(rule)
+    if not rules:
+        raise ValueError(f"Rules file '{rules_path}' contains no rules.")
+    return rules
+
+def validate_rule(rule):
+    """Raises ValueError if a rule is malformed."""
+    if not isinstance(rule, dict):
+        raise ValueError("Rule must be a JSON object.")
+    unknown = sorted(set(rule) - RULE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown rule field(s): {', '.join(unknown)}.")
+    if not isinstance(rule.get('find'), str) or not rule['find']:
+        raise ValueError("'find' must be a non-empty string.")
+    if not isinstance(rule.get('replace'), str):
+        raise ValueError("'replace' must be a string (it may be empty).")
+    count = rule.get('count', 0)
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        raise ValueError("'count' must be a non-negative integer (0 for all).")
+    section = rule.get('section')
+    if section is not None and not (isinstance(section, str) or (isinstance(section, list) and all(isinstance(s, str) for s in section))):
+        raise ValueError("'section' must be a section title or a list of them.")
+    skip_tags = rule.get('skip_tags', DEFAULT_SKIP_TAGS)
+    if not isinstance(skip_tags, list) or not all(isinstance(tag, str) and tag.isalnum() for tag in skip_tags):
+        raise ValueError("'skip_tags' must be a list of tag names.")
+    if rule.get('regex'):
+        if NUMBERED_BACKREFERENCE_RE.search(rule['find']):
+            raise ValueError("Numbered backreferences in 'find' are not supported; use (?P<name>...) and (?P=name).")
+        try:
+            re.compile(rule['find'])
+        except re.error as e:
+            raise ValueError(f"Invalid regex in 'find': {e}") from e
+
+def _rule_body(rule):
+    """Returns the rule's pattern, safe to embed in the combined alternation."""
+    if not rule.get('regex'):
+        body = re.escape(rule['find'])
+    else:
+        body = rule['find']
+        # Global inline flags are only legal at the very start, so scope them to this rule
+        leading_flags = LEADING_FLAGS_RE.match(body)
+        if leading_flags:
+            body = f"(?{leading_flags.group(1)}:{body[leading_flags.end():]})"
+    return f"(?i:{body})" if rule.get('ignore_case') else body
+
+def _protected_spans(text, tags):
+    pattern = re.compile(r'<(' + '|'.join(tags) + r')\b[^>]*?(?<!/)>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+    return [(m.start(), m.end()) for m in pattern.finditer(text)]
+
+def _overlaps(spans, starts, start, end):
+    """True if [start, end) overlaps any of the sorted, non-overlapping spans."""
+    i = bisect.bisect_right(starts, start) - 1
+    if i >= 0 and spans[i][1] > start:
+        return True
+    return i + 1 < len(spans) and spans[i + 1][0] < end
+
+class RuleSet:
+    """A list of validated rules compiled into one pattern."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.rule_patterns = [re.compile(_rule_body(rule)) for rule in rules] # For retrying a position rule by rule
+        try:
+            self.pattern = re.compile('|'.join(f"(?P<{GROUP_PREFIX}{i}>{_rule_body(rule)})" for i, rule in enumerate(rules)))
+        except re.error as e:
+            raise ValueError(f"Rules cannot be combined into one pattern (duplicate group names?): {e}") from e
+
+    def apply(self, text, resolve_section=None):
+        """
+        Applies every rule to text in one pass.
+        resolve_section(title) -> (char_start, char_end) or None locates section scopes.
+        Returns (new_text, counts, missing_sections), counts listing replacements per rule.
+        """
+        counts = [0] * len(self.rules)
+        missing_sections = []
+        protected = {} # tuple(skip_tags) -> (spans, starts), computed once per tag set
+        scopes = []
+        for rule in self.rules:
+            tags = tuple(sorted(rule.get('skip_tags', DEFAULT_SKIP_TAGS)))
+            if tags and tags not in protected:
+                spans = _protected_spans(text, tags)
+                protected[tags] = (spans, [start for start, _ in spans])
+            section = rule.get('section')
+            if section is None:
+                scopes.append((tags, None))
+                continue
+            spans = []
+            for section_title in ([section] if isinstance(section, str) else section):
+                span = resolve_section(section_title) if resolve_section else None
+                if span is None:
+                    missing_sections.append(section_title)
+                else:
+                    spans.append(span)
+            scopes.append((tags, spans))
+
+        def replace_at(start, first_rule):
+            """The first rule, from first_rule on, allowed to replace at start: (rule index, match) or None."""
+            for i in range(first_rule, len(self.rules)):
+                rule_match = self.rule_patterns[i].match(text, start)
+                if rule_match is None:
+                    continue
+                tags, section_spans = scopes[i]
+                end = rule_match.end()
+                limit = self.rules[i].get('count', 0)
+                if limit and counts[i] >= limit:
+                    continue
+                if section_spans is not None and not any(s <= start and end <= e for s, e in section_spans):
+                    continue
+                if tags and _overlaps(*protected[tags], start, end):
+                    continue
+                return i, rule_match
+            return None
+
+        pieces, copied_to, search_from = [], 0, 0
+        while search_from <= len(text):
+            match = self.pattern.search(text, search_from)
+            if match is None:
+                break
+            group = match.lastgroup
+            if group is None or not group.startswith(GROUP_PREFIX):
+                group = next(name for name, value in match.groupdict().items() if name.startswith(GROUP_PREFIX) and value is not None)
+            start = match.start()
+            # Rules listed before the matching one cannot match here, so retrying starts with it
+            accepted = replace_at(start, int(group[len(GROUP_PREFIX):]))
+            if accepted is None:
+                search_from = start + 1
+                continue
+            i, rule_match = accepted
+            rule = self.rules[i]
+            pieces.append(text[copied_to:start])
+            pieces.append(rule_match.expand(rule['replace']) if rule.get('regex') else rule['replace'])
+            counts[i] += 1
+            copied_to = rule_match.end()
+            search_from = copied_to if copied_to > start else start + 1 # Step past empty matches
+            if copied_to == start and start < len(text):
+                pieces.append(text[start])
+                copied_to = start + 1
+        pieces.append(text[copied_to:])
+        return "".join(pieces), counts, sorted(set(missing_sections))
+
+    def needs_sections(self):
+        return any(rule.get('section') is not None for rule in self.rules)
@@ -0,0 +1,138 @@
+# revision_cache.py
+# Version 1.0
+# A persistent, size-bounded cache of wiki page text keyed by title + revision id.
+#
+# Callers ask the API only for a page's latest revid (a metadata-only request)
+# and reuse the cached wikitext on a hit, so unchanged pages are never
+# downloaded twice. Entries are evicted least-recently-used first once the
+# cache exceeds its byte budget.
+
+import os
+import sqlite3
+import threading
+import time
+import toolkit_trace
+
+# --- CONFIGURATION ---
+CACHE_DIR_ENV_VAR = "AIOPS_TOOLKIT_CACHE_DIR"
+DISABLE_CACHE_ENV_VAR = "AIOPS_TOOLKIT_NO_CACHE"
+DEFAULT_CACHE_DIR = os.path.expanduser('~/.cache/aiops_toolkit')
+DEFAULT_CACHE_FILENAME = 'revisions.sqlite'
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def get_cache_dir():
+    """Returns the toolkit's cache directory, creating it if needed."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR) or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+class RevisionCache:
+    """SQLite-backed store of (title, revid) -> text with LRU eviction by total size."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(get_cache_dir(), DEFAULT_CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS revisions ("
+            " title TEXT NOT NULL, revid INTEGER NOT NULL, text TEXT NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL,"
+            " PRIMARY KEY (title, revid))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS revisions_lru ON revisions (last_access)")
+        self._conn.commit()
+
+    def get(self, title, revid):
+        """Returns the cached text for this exact revision, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM revisions WHERE title = ? AND revid = ?", (title, revid)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE revisions SET last_access = ? WHERE title = ? AND revid = ?", (time.time(), title, revid)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, title, revid, text):
+        """Stores text for a revision, dropping older revisions of the same page."""
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            self._conn.execute("DELETE FROM revisions WHERE title = ? AND revid < ?", (title, revid))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revisions (title, revid, text, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (title, revid, text, size, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Deletes least-recently-used entries until the cache fits in max_bytes. Caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM revisions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for title, revid, size in self._conn.execute("SELECT title, revid, size FROM revisions ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((title, revid))
+            total -= size
+        self._conn.executemany("DELETE FROM revisions WHERE title = ? AND revid = ?", victims)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_default_cache = None
+
+def get_default_cache():
+    """Returns the shared process-wide cache, or None if disabled via AIOPS_TOOLKIT_NO_CACHE."""
+    global _default_cache
+    if os.environ.get(DISABLE_CACHE_ENV_VAR):
+        return None
+    if _default_cache is None:
+        _default_cache = RevisionCache()
+    return _default_cache
+
+# --- pywikibot Integration ---
+
+def attach_text(page, text):
+    """
+    Gives a pywikibot Page its current text without a request. Assigning page.text
+    would run pywikibot's botMayEdit() check, which fetches the page's templates
+    and then its full text: two requests that defeat the cache on every hit.
+    The check still runs when the page is saved.
+    """
+    del page.text # Clears derived state (expanded text, extracted templates) without a request
+    page._text = text
+
+def get_page_text(page, cache=None):
+    """
+    Returns the current text of a pywikibot Page, downloading it only when its
+    latest revid is not already cached. Raises pywikibot's NoPageError for
+    missing pages. On a hit the text is attached to the page so later
+    page.text reads and page.save() conflict checks use it without a refetch.
+    """
+    cache = cache or get_default_cache()
+    with toolkit_trace.span('page.fetch', title=page.title()) as span:
+        if cache is None:
+            page.latest_revision_id # Raises NoPageError for missing pages
+            text = page.text
+            span.set(cache='off', bytes=len(text.encode('utf-8')))
+            return text
+        revid = page.latest_revision_id # Metadata-only request unless already preloaded
+        title = page.title()
+        text = cache.get(title, revid)
+        if text is None:
+            text = page.text
+            cache.put(title, revid, text)
+            span.set(cache='miss')
+        else:
+            attach_text(page, text)
+            span.set(cache='hit')
+        span.set(bytes=len(text.encode('utf-8')))
+        return text
@@ -0,0 +1,116 @@
+# summarizer.py
+# Version 1.0
+# Chunked map-reduce summarization with streamed output.
+#
+# Text that fits in one prompt is summarized directly. Larger text is split
+# into token-budgeted chunks on paragraph/line boundaries, the chunks are
+# summarized concurrently (map), and the partial summaries are combined
+# (reduce) -- recursively if they still exceed the budget. The final answer is
+# streamed to the output as the model produces it.
+#
+# A backend is any object with generate(prompt) -> str and
+# stream(prompt) -> iterable of str, normally an llm_service.LLMClient. Chunk
+# summaries go through llm_service.run_many, so they share its rate limits.
+# Use llm_service.StubBackend to run fully offline.
+
+import argparse
+import sys
+import llm_service
+
+# --- CONFIGURATION ---
+CHARS_PER_TOKEN = llm_service.CHARS_PER_TOKEN # Rough estimate; good enough to stay under the context limit
+DEFAULT_CHUNK_TOKENS = 6000
+DEFAULT_WORKERS = 4
+MAX_REDUCE_ROUNDS = 5 # A model that stops condensing would otherwise keep the loop going forever
+
+SINGLE_PROMPT = "Please provide a concise, one-paragraph summary of the following text:\n\n---\n{text}\n---"
+MAP_PROMPT = ("The following is part {index} of {total} of a longer document. Summarize its key points "
+              "concisely, keeping names, IDs, dates and decisions:\n\n---\n{text}\n---")
+REDUCE_PROMPT = ("The following are summaries of consecutive parts of one document. Combine them into a "
+                 "concise, one-paragraph summary of the whole document:\n\n---\n{text}\n---")
+
+estimate_tokens = llm_service.estimate_tokens
+
+def split_into_chunks(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Splits text into chunks under max_tokens, preferring paragraph, then line, boundaries."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in text.split('\n\n'):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.split('\n'):
+            # Hard-split any single line that is still too long
+            pieces.extend(line[i:i + max_chars] for i in range(0, max(len(line), 1), max_chars))
+
+    chunks, current, current_len = [], [], 0
+    for piece in pieces:
+        if current and current_len + len(piece) + 2 > max_chars:
+            chunks.append('\n\n'.join(current))
+            current, current_len = [], 0
+        current.append(piece)
+        current_len += len(piece) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return [chunk for chunk in chunks if chunk.strip()] or [text]
+
+def _map(backend, prompts, workers):
+    """Runs backend.generate over prompts concurrently, returning results in order."""
+    if len(prompts) == 1 or workers <= 1:
+        return [backend.generate(prompt) for prompt in prompts]
+    return llm_service.run_many(prompts, client=backend, concurrency=workers)
+
+def _stream(backend, prompt, out):
+    pieces = []
+    for piece in backend.stream(prompt):
+        pieces.append(piece)
+        if out is not None:
+            out.write(piece)
+            out.flush()
+    return "".join(pieces)
+
+def summarize(text, backend=None, max_chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=DEFAULT_WORKERS, out=None, stream=True):
+    """
+    Summarizes text of any length, streaming the final summary to out (default: sys.stdout)
+    unless stream is False. Returns the full summary string.
+    """
+    backend = backend or llm_service.get_client()
+    out = (out or sys.stdout) if stream else None
+    chunks = split_into_chunks(text, max_chunk_tokens)
+    if len(chunks) == 1:
+        return _stream(backend, SINGLE_PROMPT.format(text=text), out)
+
+    partials = _map(backend, [MAP_PROMPT.format(index=i, total=len(chunks), text=chunk)
+                              for i, chunk in enumerate(chunks, start=1)], workers)
+    combined = '\n\n'.join(partials)
+    # Reduce in rounds until the partial summaries fit in one prompt, or stop shrinking
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if estimate_tokens(combined) <= max_chunk_tokens:
+            break
+        groups = split_into_chunks(combined, max_chunk_tokens)
+        if len(groups) == 1:
+            break
+        partials = _map(backend, [REDUCE_PROMPT.format(text=group) for group in groups], workers)
+        previous_len, combined = len(combined), '\n\n'.join(partials)
+        if len(combined) >= previous_len:
+            break
+    return _stream(backend, REDUCE_PROMPT.format(text=combined), out)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Summarize a text file with chunked map-reduce, streaming the result.")
+    parser.add_argument('path', help="Text file to summarize. Use '-' for stdin.")
+    parser.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS, help=f"Token budget per chunk. Default: {DEFAULT_CHUNK_TOKENS}.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f"Concurrent chunk summaries. Default: {DEFAULT_WORKERS}.")
+    parser.add_argument('--stub', action='store_true', help="Use the offline stub backend instead of Gemini.")
+    args = parser.parse_args()
+
+    if args.path == '-':
+        source_text = sys.stdin.read()
+    else:
+        with open(args.path, 'r', encoding='utf-8') as f:
+            source_text = f.read()
+    stub = llm_service.StubBackend() if args.stub else None
+    summarize(source_text, llm_service.LLMClient(stub, use_cache=False) if stub else None, args.chunk_tokens, args.workers)
+    print()
+    if stub:
+        print(f"(stub backend: {len(stub.calls)} model calls)", file=sys.stderr)
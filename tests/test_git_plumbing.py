@@ -0,0 +1,103 @@
+# test_git_plumbing.py
+# Tests for git_plumbing.TreeCommitBuilder against a local bare "origin" and a clone of it.
+#
+#   python3 -m unittest discover -s tests    (or: python3 -m pytest tests)
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import git_plumbing
+
+IDENTITY = {"GIT_AUTHOR_NAME": "Backup Test", "GIT_AUTHOR_EMAIL": "backup@example.org",
+            "GIT_COMMITTER_NAME": "Backup Test", "GIT_COMMITTER_EMAIL": "backup@example.org"}
+BASE_FILES = {"VLORs/Alcuin_Orchard.mw": "{{IsidoreOodaVLOR|loop_id=ORCHARD-L001}}\n",
+              "Operations_Dashboard.md": "# Operations Dashboard\n"}
+BRANCH_REF = "refs/heads/auto-backup/test"
+
+class TreeCommitBuilderTests(unittest.TestCase):
+
+    def setUp(self):
+        environment = mock.patch.dict(os.environ, IDENTITY)
+        environment.start()
+        self.addCleanup(environment.stop)
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.origin = os.path.join(temp_dir.name, 'origin.git')
+        self.clone = os.path.join(temp_dir.name, 'clone')
+        self.run_git(temp_dir.name, 'init', '-q', '--bare', '-b', 'main', self.origin)
+        self.run_git(temp_dir.name, 'clone', '-q', self.origin, self.clone)
+        self.run_git(self.clone, 'checkout', '-q', '-b', 'main')
+        for path, text in BASE_FILES.items():
+            self.write(path, text)
+        self.run_git(self.clone, 'add', '.')
+        self.run_git(self.clone, 'commit', '-q', '-m', "Initial backup")
+        self.run_git(self.clone, 'push', '-q', 'origin', 'main')
+        self.run_git(self.clone, 'fetch', '-q', 'origin')
+        self.base_commit = self.run_git(self.clone, 'rev-parse', 'refs/remotes/origin/main')
+
+    @staticmethod
+    def run_git(cwd, *args):
+        return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+    def write(self, path, text):
+        file_path = os.path.join(self.clone, path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def builder(self):
+        return git_plumbing.TreeCommitBuilder(self.clone, 'refs/remotes/origin/main')
+
+    def test_commits_only_changed_files(self):
+        builder = self.builder()
+        quoted_path = 'VLORs/Operation "Harvest" Moon.mw'
+        self.assertFalse(builder.add_file("VLORs/Alcuin_Orchard.mw", BASE_FILES["VLORs/Alcuin_Orchard.mw"].encode('utf-8')))
+        self.assertTrue(builder.add_file("Operations_Dashboard.md", b"# Operations Dashboard\n\nUpdated.\n"))
+        self.assertTrue(builder.add_file(quoted_path, b"{{IsidoreOodaVLOR|loop_id=HARVEST-L001}}\n"))
+        commit = builder.commit(BRANCH_REF, "docs(VLORs): test backup")
+
+        self.assertIsNotNone(commit)
+        self.assertEqual(builder.changed_paths, ["Operations_Dashboard.md", quoted_path])
+        self.assertEqual(self.run_git(self.clone, 'rev-parse', BRANCH_REF), commit)
+        self.assertEqual(self.run_git(self.clone, 'rev-parse', f"{commit}^"), self.base_commit)
+        self.assertEqual(self.run_git(self.clone, 'show', f"{commit}:{quoted_path}"), "{{IsidoreOodaVLOR|loop_id=HARVEST-L001}}")
+        self.assertEqual(self.run_git(self.clone, 'show', f"{commit}:VLORs/Alcuin_Orchard.mw"),
+                         BASE_FILES["VLORs/Alcuin_Orchard.mw"].strip())
+        # The branch pushes to the bare origin like any other
+        self.run_git(self.clone, 'push', '-q', 'origin', f"{BRANCH_REF}:{BRANCH_REF}")
+        self.assertEqual(self.run_git(self.origin, 'rev-parse', BRANCH_REF), commit)
+
+    def test_no_commit_when_nothing_changed(self):
+        builder = self.builder()
+        for path, text in BASE_FILES.items():
+            self.assertFalse(builder.add_file(path, text.encode('utf-8')))
+        self.assertIsNone(builder.commit(BRANCH_REF, "docs(VLORs): nothing to back up"))
+        self.assertEqual(builder.changed_paths, [])
+        branches = self.run_git(self.clone, 'for-each-ref', '--format=%(refname)', 'refs/heads/')
+        self.assertEqual(branches.splitlines(), ["refs/heads/main"])
+
+    def test_working_tree_and_head_untouched(self):
+        self.write("notes.txt", "uncommitted work in progress\n") # Someone is using the clone
+        head, symbolic_head = self.run_git(self.clone, 'rev-parse', 'HEAD'), self.run_git(self.clone, 'symbolic-ref', 'HEAD')
+        status = self.run_git(self.clone, 'status', '--porcelain')
+
+        builder = self.builder()
+        builder.add_file("Operations_Dashboard.md", b"# Operations Dashboard\n\nUpdated.\n")
+        builder.add_file("VLORs/New_Operation.mw", b"new page\n")
+        self.assertIsNotNone(builder.commit(BRANCH_REF, "docs(VLORs): test backup"))
+
+        self.assertEqual(self.run_git(self.clone, 'rev-parse', 'HEAD'), head)
+        self.assertEqual(self.run_git(self.clone, 'symbolic-ref', 'HEAD'), symbolic_head)
+        self.assertEqual(self.run_git(self.clone, 'status', '--porcelain'), status)
+        self.assertEqual(self.run_git(self.clone, 'diff', '--cached', '--name-only'), "")
+        self.assertFalse(os.path.exists(os.path.join(self.clone, "VLORs", "New_Operation.mw")))
+        with open(os.path.join(self.clone, "Operations_Dashboard.md"), encoding='utf-8') as f:
+            self.assertEqual(f.read(), BASE_FILES["Operations_Dashboard.md"])
+
+if __name__ == '__main__':
+    unittest.main()
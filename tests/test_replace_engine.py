@@ -0,0 +1,51 @@
+# test_replace_engine.py
+# Regression tests for replace_engine.RuleSet.apply.
+#
+#   python3 -m unittest discover -s tests    (or: python3 -m pytest tests)
+
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import replace_engine
+
+def rule_set(*rules):
+    for rule in rules:
+        replace_engine.validate_rule(rule)
+    return replace_engine.RuleSet(list(rules))
+
+class RejectedMatchTests(unittest.TestCase):
+    """A match one rule may not replace must not hide that position from the rules after it."""
+
+    def test_out_of_section_match_falls_through_to_unscoped_rule(self):
+        text = 'Foo here\n== S ==\nFoo\n'
+        section_start = text.index('== S ==')
+        rules = rule_set({"find": "Foo", "replace": "Bar", "section": "S"}, {"find": "Foo", "replace": "Baz"})
+        new_text, counts, missing = rules.apply(text, lambda title: (section_start, len(text)) if title == 'S' else None)
+        self.assertEqual(new_text, 'Baz here\n== S ==\nBar\n')
+        self.assertEqual(counts, [1, 1])
+        self.assertEqual(missing, [])
+
+    def test_match_over_count_falls_through_to_next_rule(self):
+        new_text, counts, _ = rule_set({"find": "a", "replace": "X", "count": 1}, {"find": "a", "replace": "Y"}).apply('aaa')
+        self.assertEqual(new_text, 'XYY')
+        self.assertEqual(counts, [1, 2])
+
+    def test_match_in_skipped_tag_falls_through_to_rule_without_skip_tags(self):
+        rules = rule_set({"find": "cat", "replace": "dog", "skip_tags": ["pre"]}, {"find": "cat", "replace": "CAT", "skip_tags": []})
+        new_text, counts, _ = rules.apply('<pre>cat</pre> cat')
+        self.assertEqual(new_text, '<pre>CAT</pre> dog')
+        self.assertEqual(counts, [1, 1])
+
+class UnrestrictedRuleTests(unittest.TestCase):
+
+    def test_matches_re_sub_when_no_rule_is_restricted(self):
+        text = 'abc aXc a_c abc ac\n' * 3
+        for find, replace in [(r'a(?P<m>.)c', r'<\g<m>>'), (r'x*', '-'), (r'\b', '|'), ('c', '')]:
+            new_text, _, _ = rule_set({"find": find, "replace": replace, "regex": True, "skip_tags": []}).apply(text)
+            self.assertEqual(new_text, re.sub(find, replace, text), find)
+
+if __name__ == '__main__':
+    unittest.main()
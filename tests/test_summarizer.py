@@ -0,0 +1,53 @@
+# test_summarizer.py
+# Regression tests for the reduce rounds in summarizer.summarize.
+#
+#   python3 -m unittest discover -s tests    (or: python3 -m pytest tests)
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import summarizer
+
+class EchoBackend:
+    """A model that never condenses: every 'summary' is its whole prompt."""
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        return prompt
+
+    def stream(self, prompt):
+        yield "final"
+
+class SlowlyShrinking(EchoBackend):
+    """Returns 90% of the text it was given, so every round shrinks but never fits."""
+    def generate(self, prompt):
+        self.calls += 1
+        body = prompt.split('---\n', 1)[1].rsplit('\n---', 1)[0]
+        return body[:len(body) * 9 // 10]
+
+class ReduceRoundTests(unittest.TestCase):
+    def count_map_rounds(self, backend, max_rounds=summarizer.MAX_REDUCE_ROUNDS):
+        """Summarizes a long text and returns how often _map ran: the map, then each reduce round."""
+        rounds = []
+        original_map, original_max = summarizer._map, summarizer.MAX_REDUCE_ROUNDS
+        summarizer._map = lambda *args: rounds.append(1) or original_map(*args)
+        summarizer.MAX_REDUCE_ROUNDS = max_rounds
+        try:
+            summary = summarizer.summarize("word " * 20000, backend, max_chunk_tokens=500, workers=1, stream=False)
+        finally:
+            summarizer._map, summarizer.MAX_REDUCE_ROUNDS = original_map, original_max
+        self.assertEqual(summary, "final")
+        return len(rounds)
+
+    def test_stops_when_summaries_do_not_shrink(self):
+        self.assertEqual(self.count_map_rounds(EchoBackend()), 1 + 1) # One reduce round made the text longer
+
+    def test_rounds_are_capped(self):
+        self.assertEqual(self.count_map_rounds(SlowlyShrinking(), max_rounds=2), 1 + 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+# test_toolkit_trace.py
+# Regression tests for enabling toolkit_trace from the environment.
+#
+#   python3 -m unittest discover -s tests    (or: python3 -m pytest tests)
+
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class DefaultDirectoryTests(unittest.TestCase):
+    """AIOPS_TOOLKIT_TRACE=1 puts profiles under the cache dir, which must not be resolved mid-import."""
+
+    def run_traced(self, code):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = {**os.environ, "AIOPS_TOOLKIT_TRACE": "1", "AIOPS_TOOLKIT_CACHE_DIR": cache_dir,
+                   "PYWIKIBOT_DIR": cache_dir, "PYWIKIBOT_NO_USER_CONFIG": "1"}
+            code = f"import sys; sys.path.insert(0, {REPO_ROOT!r})\n" + code
+            result = subprocess.run([sys.executable, '-c', code], cwd=cache_dir, env=env, capture_output=True, text=True)
+            profiles = glob.glob(os.path.join(cache_dir, 'traces', '*.json'))
+        return result, profiles
+
+    def test_import_page_tool(self):
+        result, _ = self.run_traced("import page_tool")
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_import_revision_cache_first_and_write_profile(self):
+        result, profiles = self.run_traced(
+            "import revision_cache, toolkit_trace\n"
+            "with toolkit_trace.span('test.span'):\n"
+            "    pass\n")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(len(profiles), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,50 +1,294 @@
 # tool_registry.py
-# Version 1.2
-# Corrected input string parsing for tool functions.
+# Version 1.4
+# Lazy tool construction: importing this module and building the tool list
+# loads neither pywikibot nor the LLM stack and does not touch the network.
+# page_tool is imported, and the wiki session logged in, on the first tool
+# invocation; the session is then reused by every tool.
+#
+# Tools take structured, JSON-schema'd arguments (no string splitting) that are
+# validated before any wiki I/O, and cover every page_tool action.
 
-from langchain.tools import Tool
-import page_tool
+import contextlib
+import io
+import json
+import sys
+import threading
+
+# --- CONFIGURATION ---
+# Target for "import tool_registry + get_approved_tools()" in a fresh interpreter
+COLD_START_BUDGET_SECONDS = 0.5
+# Modules that must not be loaded until a tool is actually used
+DEFERRED_MODULES = ('pywikibot', 'mwparserfromhell', 'google.generativeai', 'page_tool')
+
+_site = None
+_site_lock = threading.Lock()
+_output_lock = threading.Lock() # redirect_stdout swaps the process-wide sys.stdout
+
+def get_site():
+    """Returns the shared, logged-in wiki site, connecting on first use."""
+    global _site
+    with _site_lock:
+        if _site is None:
+            import page_tool # Deferred: pulls in pywikibot and the LLM stack
+            _site = page_tool.get_wiki_site()
+        return _site
+
+# --- Tool Schemas ---
+# Every tool takes JSON-schema'd keyword arguments. Edit tools map their arguments
+# one-to-one onto page_tool batch jobs, so they share its validation and its
+# one-fetch/one-save path; apply_wiki_page_edits sends several edits in one save.
+
+TITLE_PROPERTY = {"type": "string", "description": "Exact title of the wiki page."}
+SUMMARY_PROPERTY = {"type": "string", "description": "Optional edit summary."}
+SECTION_PROPERTY = {"type": ["string", "array"], "items": {"type": "string"},
+                    "description": "Section title, 'Parent/Child' path, or '0'/'lead' for the lead section. A list targets several sections."}
+
+EDIT_PROPERTIES = {
+    'find_and_replace': {
+        "find": {"type": "string", "description": "Exact text to find."},
+        "replace": {"type": "string", "description": "Replacement text. May be empty."},
+        "count": {"type": "integer", "description": "Occurrences to replace; 0 (default) replaces all."},
+    },
+    'append_to_page': {
+        "content": {"type": "string", "description": "Wikitext to append to the end of the page."},
+    },
+    'append_to_section': {
+        "section_title": SECTION_PROPERTY,
+        "content": {"type": "string", "description": "Wikitext to append to the end of the section(s)."},
+        "ignore_case": {"type": "boolean", "description": "Match section titles case-insensitively."},
+    },
+    'write_field': {
+        "template_name": {"type": "string", "description": "Template name, e.g. 'IsidoreOodaVLOR'."},
+        "target_id_param": {"type": "string", "description": "Parameter holding the template instance ID. Default 'loop_id'."},
+        "target_id_value": {"type": "string", "description": "ID of the template instance to edit, e.g. 'ALCUIN-L001'."},
+        "field": {"type": "string", "description": "Template parameter to write."},
+        "value": {"type": "string", "description": "New value. May be empty."},
+    },
+}
+
+# Mirrors page_tool.BATCH_REQUIRED_FIELDS without importing page_tool at registration time
+EDIT_REQUIRED_FIELDS = {
+    'find_and_replace': ['find', 'replace'],
+    'append_to_page': ['content'],
+    'append_to_section': ['section_title', 'content'],
+    'write_field': ['template_name', 'target_id_value', 'field'],
+}
+
+def edit_schema(action):
+    properties = {"title": TITLE_PROPERTY, **EDIT_PROPERTIES[action], "summary": SUMMARY_PROPERTY}
+    return {"type": "object", "properties": properties, "required": ['title'] + EDIT_REQUIRED_FIELDS[action],
+            "additionalProperties": False}
+
+MULTI_EDIT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": TITLE_PROPERTY,
+        "edits": {"type": "array", "description": (
+            "Edits applied in order, then saved once. Each edit is an object with an 'action' "
+            f"({', '.join(EDIT_PROPERTIES)}) plus that action's arguments (without 'title')."),
+            "items": {"type": "object"}},
+        "summary": SUMMARY_PROPERTY,
+    },
+    "required": ['title', 'edits'],
+    "additionalProperties": False,
+}
+
+CONTENT_SCHEMA = {
+    "type": "object",
+    "properties": {"title": TITLE_PROPERTY, "content": {"type": "string", "description": "Full wikitext of the page."},
+                   "summary": SUMMARY_PROPERTY},
+    "required": ['title', 'content'],
+    "additionalProperties": False,
+}
+
+SUMMARIZE_SCHEMA = {
+    "type": "object",
+    "properties": {"title": TITLE_PROPERTY, "section_title": SECTION_PROPERTY,
+                   "ignore_case": {"type": "boolean", "description": "Match section titles case-insensitively."}},
+    "required": ['title', 'section_title'],
+    "additionalProperties": False,
+}
+
+JSON_TYPES = {'string': str, 'integer': int, 'boolean': bool, 'array': list, 'object': dict}
+
+def validate_arguments(schema, arguments):
+    """Checks tool arguments against the subset of JSON Schema used above. Raises ValueError."""
+    unknown = sorted(set(arguments) - set(schema['properties']))
+    if unknown and not schema.get('additionalProperties', True):
+        raise ValueError(f"Unknown argument(s): {', '.join(unknown)}.")
+    missing = [name for name in schema.get('required', []) if arguments.get(name) is None]
+    if missing:
+        raise ValueError(f"Missing required argument(s): {', '.join(missing)}.")
+    for name, value in arguments.items():
+        if value is None or name not in schema['properties']:
+            continue
+        spec = schema['properties'][name]
+        allowed = spec['type'] if isinstance(spec['type'], list) else [spec['type']]
+        # bool is a subclass of int; don't let True pass as an integer
+        if not any(isinstance(value, JSON_TYPES[t]) and not (t == 'integer' and isinstance(value, bool)) for t in allowed):
+            raise ValueError(f"Argument '{name}' must be of type {' or '.join(allowed)}.")
+        if isinstance(value, list) and 'items' in spec:
+            item_type = JSON_TYPES[spec['items']['type']]
+            if not all(isinstance(item, item_type) for item in value):
+                raise ValueError(f"Every item of '{name}' must be of type {spec['items']['type']}.")
+
+def failure(action, title, error_message):
+    """A result record in page_tool's batch shape, for errors caught before any wiki I/O."""
+    return json.dumps([{"status": "failure", "action": action, "title": title, "error_message": str(error_message)}])
+
+# --- Tool Functions ---
+
+def run_edit_jobs(title, jobs, make_summary=None):
+    """
+    Validates jobs (no network), then applies them to one page with a single save. Returns JSON results.
+    make_summary is passed through to page_tool.apply_page_jobs.
+    """
+    import page_tool
+    numbered_jobs = list(enumerate(jobs, start=1))
+    errors = []
+    for job_number, job in numbered_jobs:
+        try:
+            page_tool.validate_job(job)
+        except ValueError as e:
+            errors.append(page_tool.job_result(job_number, job, "failure", error_message=e))
+    if errors:
+        return json.dumps(errors)
+    try:
+        return json.dumps(page_tool.apply_page_jobs(get_site(), title, numbered_jobs, make_summary))
+    except Exception as e:
+        if not page_tool.wiki_executor.is_rate_limit_error(e): # Not imported at the top: it pulls in pywikibot
+            raise
+        return json.dumps([page_tool.job_result(job_number, job, "failure", error_message=f"The wiki is throttling requests: {e}")
+                           for job_number, job in numbered_jobs])
+
+def make_edit_tool_function(action, default_count=None):
+    schema = edit_schema(action)
+
+    def run(**arguments):
+        try:
+            validate_arguments(schema, arguments)
+        except ValueError as e:
+            return failure(action, arguments.get('title'), e)
+        job = {"action": action, "summary": f"AIOps Agent: {action}", **{k: v for k, v in arguments.items() if v is not None}}
+        if default_count is not None:
+            job.setdefault('count', default_count)
+        return run_edit_jobs(job['title'], [job])
+    return run
+
+def apply_page_edits_tool(**arguments):
+    try:
+        validate_arguments(MULTI_EDIT_SCHEMA, arguments)
+        jobs = []
+        for position, edit in enumerate(arguments['edits'], start=1):
+            action = edit.get('action')
+            if action not in EDIT_PROPERTIES:
+                raise ValueError(f"Edit {position}: 'action' must be one of: {', '.join(EDIT_PROPERTIES)}.")
+            fields = {k: v for k, v in edit.items() if k != 'action'}
+            try:
+                validate_arguments(edit_schema(action), {"title": arguments['title'], **fields})
+            except ValueError as e:
+                raise ValueError(f"Edit {position} ({action}): {e}") from e
+            jobs.append({"action": action, "title": arguments['title'], **fields})
+    except ValueError as e:
+        return failure('apply_page_edits', arguments.get('title'), e)
+    summary = arguments.get('summary')
+    # One summary for the whole save, whichever of the edits end up applied
+    return run_edit_jobs(arguments['title'], jobs, (lambda page_title, applied: summary) if summary else None)
+
+def run_page_tool_action(action, schema, arguments, call):
+    """Runs a printing page_tool action after validation and returns its output as a result record."""
+    try:
+        validate_arguments(schema, arguments)
+    except ValueError as e:
+        return failure(action, arguments.get('title'), e)
+    output = io.StringIO()
+    status = "success"
+    # One capture at a time: concurrent tool calls would otherwise print into each other's output
+    with _output_lock, contextlib.redirect_stdout(output):
+        try:
+            call(get_site())
+        except SystemExit as e:
+            status = "success" if e.code in (0, None) else "failure"
+    return json.dumps([{"status": status, "action": action, "title": arguments['title'], "output": output.getvalue().strip()}])
+
+def create_page_tool(**arguments):
+    import page_tool
+    return run_page_tool_action('write', CONTENT_SCHEMA, arguments, lambda site: page_tool.write_full_page(
+        site, arguments['title'], arguments['content'], arguments.get('summary') or "AIOps Agent: write"))
+
+def overwrite_page_tool(**arguments):
+    import page_tool
+    return run_page_tool_action('overwrite', CONTENT_SCHEMA, arguments, lambda site: page_tool.overwrite_page(
+        site, arguments['title'], arguments['content'], arguments.get('summary') or "AIOps Agent: overwrite"))
+
+def summarize_section_tool(**arguments):
+    import page_tool
+    return run_page_tool_action('summarize_section', SUMMARIZE_SCHEMA, arguments, lambda site: page_tool.summarize_section(
+        site, arguments['title'], arguments['section_title'], arguments.get('ignore_case', False)))
 
 def get_approved_tools():
     """
     Initializes and returns a curated list of approved tools for the agent.
+    No wiki connection is made here; see get_site(). Every tool returns a JSON
+    list of result records ({"status", "action", "title", ...}).
     """
+    from langchain.tools import StructuredTool # Deferred: only needed once the agent builds its tools
     print("--- Initializing approved tools from registry ---")
 
-    site = page_tool.get_wiki_site()
-
-    approved_tool_list = [
-        Tool(
-            name="find_and_replace_on_wiki_page",
-            # CORRECTED: Use rsplit to handle complex strings.
-            func=lambda input_str: page_tool.find_and_replace(
-                site,
-                input_str.rsplit(',', 2)[2].strip().strip("'\""), # title_str
-                input_str.rsplit(',', 2)[0].strip().strip("'\""), # find_str
-                input_str.rsplit(',', 2)[1].strip().strip("'\""), # replace_str
-                "AIOps Agent: find_and_replace",
-                0 # count=0 for all instances
-            ),
-            description="Use this to surgically find and replace a specific string on a given wiki page. Input must be a comma-separated list of three strings in this order: string_to_find, string_to_replace_with, page_title."
-        ),
-        Tool(
-            name="append_text_to_wiki_page",
-            # CORRECTED: Use rsplit for robust parsing.
-            func=lambda input_str: page_tool.append_to_page(
-                site,
-                input_str.rsplit(',', 1)[1].strip().strip("'\""), # title_str
-                input_str.rsplit(',', 1)[0].strip().strip("'\""), # content_str
-                "AIOps Agent: append_to_page"
-            ),
-            description="Use this to append a block of text to the very end of a given wiki page. Input must be a comma-separated list of two strings in this order: content_to_append, page_title."
-        ),
+    tool_specs = [
+        ("find_and_replace_on_wiki_page", make_edit_tool_function('find_and_replace', default_count=0), edit_schema('find_and_replace'),
+         "Use this to surgically find and replace a specific string on a given wiki page. Replaces all occurrences unless 'count' is given."),
+        ("append_text_to_wiki_page", make_edit_tool_function('append_to_page'), edit_schema('append_to_page'),
+         "Use this to append a block of text to the very end of a given wiki page."),
+        ("append_text_to_wiki_section", make_edit_tool_function('append_to_section'), edit_schema('append_to_section'),
+         "Use this to append a block of text to the end of one or more sections of a wiki page."),
+        ("write_wiki_template_field", make_edit_tool_function('write_field'), edit_schema('write_field'),
+         "Use this to set one field of a specific template instance (e.g. a VLOR loop's status) on a wiki page."),
+        ("apply_wiki_page_edits", apply_page_edits_tool, MULTI_EDIT_SCHEMA,
+         "Use this to apply several edits to one wiki page in a single save. Prefer it over repeated single-edit calls on the same page."),
+        ("summarize_wiki_section", summarize_section_tool, SUMMARIZE_SCHEMA,
+         "Use this to get an LLM summary of one or more sections of a wiki page. Makes no edit."),
+        ("create_wiki_page", create_page_tool, CONTENT_SCHEMA,
+         "Use this to create a NEW wiki page. Fails if the page already exists."),
+        ("overwrite_wiki_page", overwrite_page_tool, CONTENT_SCHEMA,
+         "Use this to replace the entire content of an existing wiki page. Requires operator approval to be configured."),
     ]
+    approved_tool_list = [StructuredTool(name=name, func=func, args_schema=schema, description=description)
+                          for name, func, schema, description in tool_specs]
 
     return approved_tool_list
 
+def measure_cold_start():
+    """
+    Times "import tool_registry; get_approved_tools()" in a fresh interpreter.
+    Returns (seconds, deferred_modules_that_were_loaded_anyway).
+    """
+    import os
+    import subprocess
+    probe = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import tool_registry\n"
+        "tool_registry.get_approved_tools()\n"
+        "elapsed = time.perf_counter() - started\n"
+        "loaded = [m for m in tool_registry.DEFERRED_MODULES if m in sys.modules]\n"
+        "print(json.dumps([elapsed, loaded]))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return elapsed, loaded
+
 # For testing purposes
 if __name__ == '__main__':
     tools = get_approved_tools()
     print(f"Registry contains {len(tools)} approved tools:")
     for tool in tools:
         print(f"- {tool.name}")
+
+    elapsed, loaded = measure_cold_start()
+    print(f"Cold start: {elapsed:.3f}s (budget {COLD_START_BUDGET_SECONDS:.3f}s).")
+    if loaded:
+        print(f"Eagerly loaded modules that should be deferred: {', '.join(loaded)}")
+    if elapsed > COLD_START_BUDGET_SECONDS or loaded:
+        sys.exit(1)
@@ -0,0 +1,363 @@
+# toolkit_trace.py
+# Version 1.0
+# Opt-in tracing of wiki and LLM calls, with a per-run profile.
+#
+# Set AIOPS_TOOLKIT_TRACE=1 (profiles go to <cache dir>/traces) or
+# AIOPS_TOOLKIT_TRACE=/some/dir and every span -- pywikibot API requests and
+# the HTTP calls under them, page fetches, parses and saves, VLOR parsing and
+# LLM calls -- is recorded with its duration, bytes and outcome. Each span name
+# gets a call counter, an outcome breakdown and a duration histogram; code can
+# add its own counters (count) and histograms (observe). At exit the run is
+# written as <script>-<time>-<pid>.json and a .folded file of collapsed stacks
+# (self time in microseconds) for flamegraph.pl, speedscope or inferno.
+#
+# Disabled, span() returns a shared no-op object and count()/observe() return
+# at once, so instrumented code pays one global lookup per call.
+#
+#   with toolkit_trace.span('page.parse', title=title) as span:
+#       wikicode = mwparserfromhell.parse(text)
+#       span.set(bytes=len(text))
+#
+#   python3 toolkit_trace.py summary ~/.cache/aiops_toolkit/traces/page_tool-20250101-120000-4242.json
+
+import argparse
+import atexit
+import bisect
+import collections
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# --- CONFIGURATION ---
+TRACE_ENV_VAR = "AIOPS_TOOLKIT_TRACE"
+TRACE_DIRNAME = 'traces'
+MAX_SPANS = 200000 # Individual spans kept for the profile; counters and histograms keep counting past this
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+SUMMARY_ROWS = 15
+
+# --- Histograms ---
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds in HISTOGRAM_BOUNDS_MS, plus overflow) with count, sum, min and max."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, value)] += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the maximum for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, bucket_count in zip(HISTOGRAM_BOUNDS_MS, self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.total, 3), "min": self.min, "max": self.max,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": {f"le_{bound}": n for bound, n in zip(HISTOGRAM_BOUNDS_MS, self.buckets) if n}
+                           | ({"overflow": self.buckets[-1]} if self.buckets[-1] else {})}
+
+# --- Spans ---
+
+class _NullSpan:
+    """Returned by span() while tracing is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+_local = threading.local()
+_span_ids = itertools.count(1)
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+class Span:
+    """One timed operation. Nested spans on the same thread become its children."""
+    __slots__ = ('tracer', 'name', 'attrs', 'outcome', 'id', 'parent', 'path', 'start', 'duration', 'child_time')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.outcome = 'ok'
+        self.child_time = 0.0
+
+    def set(self, **attrs):
+        """Adds attributes; 'bytes' is summed per span name and 'outcome' replaces the default 'ok'."""
+        if 'outcome' in attrs:
+            self.outcome = attrs.pop('outcome')
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.path = f"{self.parent.path};{self.name}" if self.parent else f"{self.tracer.run_name};{self.name}"
+        self.id = next(_span_ids)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        _stack().pop()
+        if exc_type is not None and self.outcome == 'ok':
+            code = getattr(exc, 'code', None)
+            self.outcome = f"{exc_type.__name__}:{code}" if isinstance(code, str) else exc_type.__name__
+        if self.parent is not None:
+            self.parent.child_time += self.duration
+        self.tracer.record(self)
+        return False
+
+# --- Tracer ---
+
+class Tracer:
+    """Collects spans, counters and histograms for one run. Thread-safe."""
+
+    def __init__(self, output_dir=None, run_name=None):
+        self.output_dir = output_dir # None: <cache dir>/traces, resolved when the profile is written
+        script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv else ''))[0]
+        self.run_name = run_name or (script if script and not script.startswith('-') else 'python')
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.dropped_spans = 0
+        self.span_stats = {} # name -> {"calls", "bytes", "outcomes": Counter, "duration": Histogram}
+        self.counters = collections.Counter()
+        self.histograms = collections.defaultdict(Histogram)
+        self.folded = collections.Counter() # collapsed stack -> self time in microseconds
+
+    def record(self, span):
+        duration_ms = span.duration * 1000
+        span_bytes = span.attrs.get('bytes')
+        with self._lock:
+            stats = self.span_stats.get(span.name)
+            if stats is None:
+                stats = self.span_stats[span.name] = {"calls": 0, "bytes": 0, "outcomes": collections.Counter(), "duration": Histogram()}
+            stats['calls'] += 1
+            stats['outcomes'][span.outcome] += 1
+            stats['duration'].add(duration_ms)
+            if isinstance(span_bytes, int):
+                stats['bytes'] += span_bytes
+            self.folded[span.path] += max(0, round((span.duration - span.child_time) * 1e6))
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append({"id": span.id, "parent": span.parent.id if span.parent else None, "name": span.name,
+                                   "thread": threading.current_thread().name,
+                                   "start_ms": round((span.start - self.started) * 1000, 3),
+                                   "duration_ms": round(duration_ms, 3), "outcome": span.outcome, **span.attrs})
+            else:
+                self.dropped_spans += 1
+
+    def reset(self):
+        """Discards everything recorded so far and restarts the run clock, e.g. after a warm-up."""
+        with self._lock:
+            self.started = time.perf_counter()
+            self.spans = []
+            self.dropped_spans = 0
+            self.span_stats = {}
+            self.counters.clear()
+            self.histograms.clear()
+            self.folded.clear()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        with self._lock:
+            self.histograms[name].add(value)
+
+    def profile(self):
+        """The run so far as a JSON-ready dict."""
+        with self._lock:
+            return {
+                "run": self.run_name, "pid": os.getpid(), "argv": sys.argv,
+                "started_at": self.started_at.isoformat(timespec='seconds'),
+                "wall_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "span_stats": {name: {"calls": s['calls'], "bytes": s['bytes'], "outcomes": dict(s['outcomes']),
+                                      "duration_ms": s['duration'].to_dict()} for name, s in sorted(self.span_stats.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "spans": list(self.spans), "dropped_spans": self.dropped_spans,
+            }
+
+    def write(self):
+        """Writes <run>-<time>-<pid>.json and .folded to the output directory. Returns the JSON path."""
+        if self.output_dir is None:
+            # Not at enable() time: tracing starts while revision_cache (which imports this module) is still importing
+            import revision_cache
+            self.output_dir = os.path.join(revision_cache.get_cache_dir(), TRACE_DIRNAME)
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.run_name}-{self.started_at:%Y%m%d-%H%M%S}-{os.getpid()}")
+        profile = self.profile()
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=1)
+        with self._lock:
+            folded_lines = [f"{path} {micros}" for path, micros in sorted(self.folded.items()) if micros]
+        with open(base + '.folded', 'w', encoding='utf-8') as f:
+            f.write("\n".join(folded_lines) + ("\n" if folded_lines else ""))
+        return base + '.json'
+
+_tracer = None
+_pywikibot_instrumented = False
+
+def enable(output_dir=None, run_name=None):
+    """
+    Starts tracing this process (if not already) and writes the profile at exit, to output_dir or
+    by default <cache dir>/traces. Returns the Tracer.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(output_dir, run_name)
+        atexit.register(_write_at_exit)
+    return _tracer
+
+def _write_at_exit():
+    if _tracer is None or not _tracer.span_stats and not _tracer.counters:
+        return
+    try:
+        path = _tracer.write()
+    except OSError as e:
+        print(f"Warning: Could not write trace profile: {e}", file=sys.stderr)
+        return
+    print(f"Trace profile written to {path} (flamegraph stacks: {os.path.splitext(path)[0]}.folded)", file=sys.stderr)
+
+def enabled():
+    return _tracer is not None
+
+def get_tracer():
+    """The active Tracer, or None while tracing is disabled."""
+    return _tracer
+
+def span(name, **attrs):
+    """A context manager timing one operation. Attributes (title=..., bytes=...) are stored with the span."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(_tracer, name, attrs)
+
+def count(name, value=1):
+    """Adds value to a named counter."""
+    if _tracer is not None:
+        _tracer.count(name, value)
+
+def observe(name, value):
+    """Adds one value to a named histogram (bucketed as milliseconds)."""
+    if _tracer is not None:
+        _tracer.observe(name, value)
+
+def current_span_name():
+    stack = getattr(_local, 'stack', None)
+    return stack[-1].name if stack else None
+
+# --- pywikibot Integration ---
+
+def instrument_pywikibot():
+    """
+    Wraps pywikibot's API requests ('wiki.api'), the HTTP calls under them ('wiki.http')
+    and page saves ('page.save') in spans. A no-op unless tracing is enabled; safe to
+    call more than once. Call it before creating the site so login is traced too.
+    """
+    global _pywikibot_instrumented
+    if _tracer is None or _pywikibot_instrumented:
+        return
+    _pywikibot_instrumented = True
+    from pywikibot.comms import http
+    from pywikibot.data import api
+    from pywikibot.page import BasePage
+    submit, http_request, save = api.Request.submit, http.request, BasePage.save
+
+    def traced_submit(self):
+        if current_span_name() == 'wiki.api': # CachedRequest.submit() calls Request.submit()
+            return submit(self)
+        params = self._params
+        modules = "|".join(value for key in ('meta', 'prop', 'list', 'generator') for value in params.get(key, []))
+        with span('wiki.api', action="|".join(params.get('action', [])), modules=modules):
+            return submit(self)
+
+    def traced_http_request(*args, **kwargs):
+        with span('wiki.http', method=kwargs.get('method', 'GET')) as http_span:
+            response = http_request(*args, **kwargs)
+            http_span.set(bytes=len(response.content), status=response.status_code)
+            if response.status_code >= 400:
+                http_span.set(outcome=f"http_{response.status_code}")
+            return response
+
+    def traced_save(self, *args, **kwargs):
+        text = getattr(self, '_text', None) # Reading page.text here could trigger a fetch
+        with span('page.save', title=self.title(), bytes=len(text.encode('utf-8')) if text else 0):
+            return save(self, *args, **kwargs)
+
+    api.Request.submit = traced_submit
+    http.request = traced_http_request
+    BasePage.save = traced_save
+
+# --- Reading Profiles ---
+
+def print_summary(profile, rows=SUMMARY_ROWS):
+    """Prints the slowest span names by total time, then the counters."""
+    print(f"Run: {profile['run']} ({profile['started_at']}), wall time {profile['wall_ms'] / 1000:.2f}s")
+    stats = sorted(profile['span_stats'].items(), key=lambda item: item[1]['duration_ms']['sum'], reverse=True)
+    print(f"\n{'Span':<22} {'Calls':>7} {'Total s':>9} {'Mean ms':>9} {'p90 ms':>8} {'Max ms':>9} {'Bytes':>12}  Outcomes")
+    for name, s in stats[:rows]:
+        duration = s['duration_ms']
+        outcomes = ", ".join(f"{outcome} {n}" for outcome, n in sorted(s['outcomes'].items(), key=lambda item: -item[1]))
+        print(f"{name:<22} {s['calls']:>7} {duration['sum'] / 1000:>9.2f} {duration['sum'] / s['calls']:>9.1f} "
+              f"{duration['p90']:>8.1f} {duration['max']:>9.1f} {s['bytes']:>12}  {outcomes}")
+    if profile['counters']:
+        print("\nCounters:")
+        for name, value in profile['counters'].items():
+            print(f"  {name}: {value}")
+    if profile['dropped_spans']:
+        print(f"\nNote: {profile['dropped_spans']} spans beyond the first {MAX_SPANS} were counted but not stored.")
+
+# Tracing turns on at import time, so every module that records spans sees the same setting
+_env_setting = os.environ.get(TRACE_ENV_VAR, '').strip()
+if _env_setting and _env_setting.lower() not in ('0', 'false', 'no', 'off'):
+    enable(None if _env_setting.lower() in ('1', 'true', 'yes', 'on') else os.path.expanduser(_env_setting))
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a toolkit trace profile.")
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('profile', help="A .json profile written by a traced run.")
+    parser.add_argument('--rows', type=int, default=SUMMARY_ROWS, help=f"Span names to list. Default: {SUMMARY_ROWS}.")
+    args = parser.parse_args()
+    try:
+        with open(args.profile, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error: Cannot read profile '{args.profile}': {e}")
+        sys.exit(1)
+    print_summary(profile, args.rows)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+# vlor_classifier.py
+# Version 1.0
+# Title classification for VLOR candidate discovery.
+#
+# Every rule is compiled into one anchored alternation, so a title is
+# classified by a single regex match however many rules there are. Rules are
+# tried in file order and the first that matches decides the title's class;
+# an "exclude" rule drops the title. Per-rule counts are kept for reports.
+#
+# A rules file is JSON Lines, one rule per line. A rule's conditions must all
+# hold ("contains" may list alternatives, any one of which is enough):
+#   {"name": "wikiproject-vlor", "class": "confident", "prefix": "OODA WIKI:WikiProject ", "suffix": "/VLOR"}
+#   {"name": "archives", "exclude": true, "contains": "/Archive"}
+#   {"name": "keywords", "class": "uncertain", "contains": ["VLOR", "Virtuous Loop", "Roadmap"]}
+#   {"name": "loop-ids", "class": "uncertain", "regex": "\\bL\\d{3,}\\b", "ignore_case": true}
+# Titles are compared with underscores normalized to spaces.
+#
+#   python3 vlor_classifier.py benchmark [--titles 1000000] [--rules FILE]
+
+import argparse
+import collections
+import json
+import random
+import re
+import sys
+import time
+
+# --- CONFIGURATION ---
+RULE_FIELDS = {'name', 'class', 'exclude', 'prefix', 'suffix', 'contains', 'regex', 'ignore_case'}
+CONDITION_FIELDS = ('prefix', 'suffix', 'contains', 'regex')
+GROUP_PREFIX = '_rule'
+LEADING_FLAGS_RE = re.compile(r'^\(\?([aiLmsux]+)\)')
+NUMBERED_BACKREFERENCE_RE = re.compile(r'(?<!\\)\\[1-9]')
+BENCHMARK_TITLES = 1000000
+BENCHMARK_SEED = 20240101
+
+def default_rules(confident_prefix, confident_suffix, uncertain_keywords):
+    """The classic two-rule set: the WikiProject .../VLOR pattern, then any keyword."""
+    return [
+        {"name": "confident-pattern", "class": "confident", "prefix": confident_prefix, "suffix": confident_suffix},
+        {"name": "uncertain-keywords", "class": "uncertain", "contains": list(uncertain_keywords)},
+    ]
+
+def load_rules(rules_path):
+    """Reads and validates a JSONL rules file. Raises ValueError naming the offending line."""
+    rules = []
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                rule = json.loads(line)
+                validate_rule(rule)
+            except (json.JSONDecodeError, ValueError) as e:
+                raise ValueError(f"Rules file line {line_number}: {e}") from e
+            rule.setdefault('name', f"line {line_number}")
+            rules.append(rule)
+    if not rules:
+        raise ValueError(f"Rules file '{rules_path}' contains no rules.")
+    return rules
+
+def validate_rule(rule):
+    """Raises ValueError if a rule is malformed."""
+    if not isinstance(rule, dict):
+        raise ValueError("Rule must be a JSON object.")
+    unknown = sorted(set(rule) - RULE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown rule field(s): {', '.join(unknown)}.")
+    if not any(rule.get(field) for field in CONDITION_FIELDS):
+        raise ValueError(f"Rule needs at least one of: {', '.join(CONDITION_FIELDS)}.")
+    if rule.get('exclude'):
+        if rule.get('class'):
+            raise ValueError("An 'exclude' rule cannot also set a 'class'.")
+    elif not isinstance(rule.get('class'), str) or not rule['class']:
+        raise ValueError("'class' must be a non-empty string (or set 'exclude': true).")
+    for field in ('prefix', 'suffix', 'regex'):
+        if field in rule and not isinstance(rule[field], str):
+            raise ValueError(f"'{field}' must be a string.")
+    contains = rule.get('contains')
+    if contains is not None and not (isinstance(contains, str) or (isinstance(contains, list) and contains and all(isinstance(k, str) and k for k in contains))):
+        raise ValueError("'contains' must be a string or a non-empty list of strings.")
+    if rule.get('regex'):
+        if NUMBERED_BACKREFERENCE_RE.search(rule['regex']):
+            raise ValueError("Numbered backreferences in 'regex' are not supported; use (?P<name>...) and (?P=name).")
+        try:
+            re.compile(rule['regex'])
+        except re.error as e:
+            raise ValueError(f"Invalid regex in 'regex': {e}") from e
+
+def normalize_title(title):
+    return title.replace('_', ' ')
+
+def _rule_body(rule):
+    """One zero-width lookahead per condition, so the conditions combine as AND at the title start."""
+    conditions = []
+    if rule.get('prefix'):
+        conditions.append(f"(?={re.escape(rule['prefix'])})")
+    if rule.get('suffix'):
+        conditions.append(f"(?=.*{re.escape(rule['suffix'])}\\Z)")
+    if rule.get('contains'):
+        keywords = [rule['contains']] if isinstance(rule['contains'], str) else rule['contains']
+        conditions.append(f"(?=.*?(?:{'|'.join(re.escape(k) for k in keywords)}))")
+    if rule.get('regex'):
+        regex = rule['regex']
+        # Global inline flags are only legal at the very start, so scope them to this rule
+        leading_flags = LEADING_FLAGS_RE.match(regex)
+        if leading_flags:
+            regex = f"(?{leading_flags.group(1)}:{regex[leading_flags.end():]})"
+        conditions.append(f"(?=.*?{regex})" if leading_flags else f"(?=.*?(?:{regex}))")
+    body = ''.join(conditions)
+    return f"(?i:{body})" if rule.get('ignore_case') else body
+
+def rule_matches(rule, title):
+    """Evaluates one rule in plain Python. The reference the compiled pattern is checked against."""
+    flags = re.IGNORECASE if rule.get('ignore_case') else 0
+    fold = (lambda s: s.lower()) if rule.get('ignore_case') else (lambda s: s)
+    if rule.get('prefix') and not fold(title).startswith(fold(rule['prefix'])):
+        return False
+    if rule.get('suffix') and not fold(title).endswith(fold(rule['suffix'])):
+        return False
+    if rule.get('contains'):
+        keywords = [rule['contains']] if isinstance(rule['contains'], str) else rule['contains']
+        if not any(fold(keyword) in fold(title) for keyword in keywords):
+            return False
+    if rule.get('regex') and not re.search(rule['regex'], title, flags):
+        return False
+    return True
+
+class TitleClassifier:
+    """A list of validated rules compiled into one pattern, with per-rule match counts."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.counts = collections.Counter() # rule name -> titles decided by that rule
+        # Titles never contain newlines, so '.' needs no DOTALL; re.match anchors every branch at the start
+        try:
+            self.pattern = re.compile('|'.join(f"(?P<{GROUP_PREFIX}{i}>{_rule_body(rule)})" for i, rule in enumerate(rules)))
+        except re.error as e:
+            raise ValueError(f"Rules cannot be combined into one pattern (duplicate group names?): {e}") from e
+        self._decisions = [(rule['name'], None if rule.get('exclude') else rule['class']) for rule in rules]
+
+    def classify(self, title):
+        """Returns the title's class, or None if no rule matched or an exclude rule matched first."""
+        return self.classify_batch([title])[0]
+
+    def classify_batch(self, titles):
+        """Classifies a list of titles, returning their classes in the same order, and updates the counts."""
+        decisions, counts = self._decisions, self.counts
+        classes = []
+        for match in map(self.pattern.match, map(normalize_title, titles)):
+            if match is None:
+                classes.append(None)
+                continue
+            rule_name, title_class = decisions[int(match.lastgroup[len(GROUP_PREFIX):])]
+            counts[rule_name] += 1
+            classes.append(title_class)
+        return classes
+
+    def classify_reference(self, title):
+        """Classifies with rule_matches(), one rule at a time. Slow; for verification and benchmarks."""
+        title = normalize_title(title)
+        for rule in self.rules:
+            if rule_matches(rule, title):
+                return None if rule.get('exclude') else rule['class']
+        return None
+
+# --- Benchmark ---
+
+def synthetic_titles(count, seed=BENCHMARK_SEED):
+    """A reproducible title corpus with roughly the shape of the OODA_WIKI namespace."""
+    rng = random.Random(seed)
+    words = ['Operation', 'Initiative', 'Loop', 'Roadmap', 'Archive', 'Talk', 'Draft', 'Index', 'Project',
+             'Virtuous', 'Planning', 'Review', 'Status', 'Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo']
+    shapes = [
+        lambda: f"OODA WIKI:WikiProject {rng.choice(words)} {rng.randint(1, 9999)}/VLOR",
+        lambda: f"OODA WIKI:WikiProject {rng.choice(words)}_{rng.randint(1, 9999)}/Archive {rng.randint(1, 9)}",
+        lambda: f"OODA WIKI:{' '.join(rng.choice(words) for _ in range(rng.randint(1, 5)))}",
+        lambda: f"OODA WIKI:{rng.choice(words)} VLOR L{rng.randint(1, 99999):05d}",
+        lambda: f"OODA WIKI:{rng.choice(words)} Virtuous Loop {rng.randint(1, 999)}",
+    ]
+    weights = [2, 1, 90, 4, 3]
+    return [rng.choices(shapes, weights)[0]() for _ in range(count)]
+
+def run_benchmark(rules, title_count=BENCHMARK_TITLES):
+    """Times the compiled classifier against the one-rule-at-a-time reference on a synthetic corpus."""
+    print(f"Generating {title_count} synthetic titles...")
+    titles = synthetic_titles(title_count)
+    classifier = TitleClassifier(rules)
+
+    started = time.perf_counter()
+    compiled_classes = classifier.classify_batch(titles)
+    compiled_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reference_classes = [classifier.classify_reference(title) for title in titles]
+    reference_seconds = time.perf_counter() - started
+
+    mismatches = sum(1 for a, b in zip(compiled_classes, reference_classes) if a != b)
+    print(f"Rules: {len(rules)}")
+    print(f"Compiled:  {compiled_seconds:.2f}s ({title_count / compiled_seconds:,.0f} titles/s)")
+    print(f"Reference: {reference_seconds:.2f}s ({title_count / reference_seconds:,.0f} titles/s)")
+    print(f"Speed-up:  {reference_seconds / compiled_seconds:.1f}x")
+    print(f"Disagreements with the reference: {mismatches}")
+    print("Titles decided per rule:")
+    for rule in rules:
+        print(f"  {rule['name']}: {classifier.counts[rule['name']]}")
+    return mismatches == 0
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled VLOR title classifier.")
+    parser.add_argument('command', choices=['benchmark'])
+    parser.add_argument('--titles', type=int, default=BENCHMARK_TITLES, help="Size of the synthetic corpus.")
+    parser.add_argument('--rules', help="JSONL rules file. Default: the candidate lister's built-in rules.")
+    args = parser.parse_args()
+    if args.rules:
+        try:
+            rules = load_rules(args.rules)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    else:
+        import generate_vlor_candidate_list as lister # Deferred: only needed for the built-in rule set
+        rules = lister.get_rules()
+    sys.exit(0 if run_benchmark(rules, args.titles) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# vlor_discovery.py
+# Version 1.0
+# Shared VLOR page discovery. Lists category members by title only, then loads
+# page content in multi-title batches so a category scan costs one API request
+# per batch instead of one request per page. Pages whose latest revision is
+# already in the local revision cache are not downloaded again.
+# Given a wiki_mirror.MirrorSite, both steps read the local snapshot instead.
+
+import os
+import pywikibot
+from pywikibot import pagegenerators
+import revision_cache
+import toolkit_trace
+import wiki_mirror
+
+# --- CONFIGURATION ---
+DISCOVERY_CATEGORIES = ['Category:Initiative VLOR', 'Category:Operation VLOR']
+# Titles per content request. The API caps this at 50 for normal accounts (500 for bots).
+DEFAULT_GROUP_SIZE = int(os.environ.get('AIOPS_TOOLKIT_PRELOAD_GROUP_SIZE', 50))
+
+def iter_category_members(site, categories=DISCOVERY_CATEGORIES):
+    """Yields unique Page objects from the given categories without loading their text."""
+    seen_titles = set()
+    for cat_name in categories:
+        if wiki_mirror.is_mirror(site):
+            members = site.category_articles(cat_name)
+        else:
+            members = pywikibot.Category(site, cat_name).articles()
+        found = 0
+        for page in members:
+            found += 1
+            if page.title() in seen_titles:
+                continue
+            seen_titles.add(page.title())
+            yield page
+        print(f"  - Found {found} pages in '{cat_name}'.")
+
+def _load_and_cache(pages, group_size, cache):
+    """Fetches text for pages that missed the cache, group_size titles per request, and caches it."""
+    for page in pagegenerators.PreloadingGenerator(pages, groupsize=group_size, quiet=True):
+        cache.put(page.title(), page.latest_revision_id, page.text)
+        yield page
+
+def preload_pages(pages, group_size=DEFAULT_GROUP_SIZE, use_cache=True, executor=None):
+    """
+    Yields the given pages with their text already loaded, fetched group_size titles per request.
+    With the revision cache enabled, only revids are fetched first and text is downloaded for cache misses only.
+    Given a wiki_executor.WikiExecutor, cache-miss batches are downloaded concurrently.
+    """
+    cache = revision_cache.get_default_cache() if use_cache else None
+    if cache is None:
+        yield from pagegenerators.PreloadingGenerator(pages, groupsize=group_size, quiet=True)
+        return
+    misses, pending_batches = [], []
+
+    def load_misses(batch):
+        if executor is None:
+            return _load_and_cache(batch, group_size, cache)
+        pending_batches.append(executor.submit(('preload', len(pending_batches)),
+                                               lambda: list(_load_and_cache(batch, group_size, cache))))
+        return []
+
+    for page in pagegenerators.PreloadingGenerator(pages, groupsize=group_size, quiet=True, content=False):
+        try:
+            cached_text = cache.get(page.title(), page.latest_revision_id)
+        except pywikibot.exceptions.NoPageError:
+            continue # Deleted between listing and loading
+        if cached_text is None:
+            toolkit_trace.count('preload.cache_miss')
+            misses.append(page)
+            if len(misses) >= group_size:
+                yield from load_misses(misses)
+                misses = []
+        else:
+            toolkit_trace.count('preload.cache_hit')
+            revision_cache.attach_text(page, cached_text)
+            yield page
+    if misses:
+        yield from load_misses(misses)
+    for batch_future in pending_batches:
+        yield from batch_future.result()
+
+def iter_vlor_pages(site, categories=DISCOVERY_CATEGORIES, group_size=DEFAULT_GROUP_SIZE, use_cache=True, executor=None):
+    """Yields every unique page in the VLOR categories with its text preloaded."""
+    if wiki_mirror.is_mirror(site):
+        yield from site.preload(iter_category_members(site, categories), group_size) # Already local: no cache, no threads
+        return
+    yield from preload_pages(iter_category_members(site, categories), group_size, use_cache, executor)
+
+def get_vlor_pages(site, categories=DISCOVERY_CATEGORIES, group_size=DEFAULT_GROUP_SIZE, use_cache=True, executor=None):
+    """Returns a list of every unique page in the VLOR categories with its text preloaded."""
+    print(f"Querying for pages in {len(categories)} categories...")
+    vlor_pages = list(iter_vlor_pages(site, categories, group_size, use_cache, executor))
+    print(f"Total unique VLOR pages found: {len(vlor_pages)}.")
+    return vlor_pages
@@ -0,0 +1,149 @@
+# vlor_index.py
+# Version 1.0
+# A parse-once index of every IsidoreOodaVLOR loop across the VLOR pages.
+#
+# Each page is parsed a single time and reduced to compact loop records
+# (loop_id, operation, status, human_title, description, resources, source
+# page, revid). The index is persisted as JSON in the toolkit cache directory
+# so tools can resolve a loop ID or operation without scanning categories, and
+# pages whose revid has not changed are never re-parsed on rebuild.
+
+import json
+import os
+import mwparserfromhell
+import revision_cache
+import toolkit_trace
+
+# --- CONFIGURATION ---
+VLOR_TEMPLATE_NAME = "IsidoreOodaVLOR"
+INDEX_FILENAME = 'vlor_index.json'
+LOOP_FIELDS = ('loop_id', 'operation', 'status', 'human_title', 'description', 'resources')
+
+def normalize_id(value):
+    """The form loop IDs and operation names are compared in: they match case-insensitively."""
+    return value.strip().upper()
+
+def get_index_path():
+    return os.path.join(revision_cache.get_cache_dir(), INDEX_FILENAME)
+
+def extract_loops(page_title, revid, text):
+    """Parses a page once and returns (page_operation, loop_records) for its VLOR templates."""
+    with toolkit_trace.span('vlor.parse', title=page_title, bytes=len(text.encode('utf-8'))):
+        wikicode = mwparserfromhell.parse(text)
+    page_operation = None
+    loops = []
+    for template in wikicode.filter_templates():
+        if not template.name.matches(VLOR_TEMPLATE_NAME):
+            continue
+        record = {field: (template.get(field).value.strip() if template.has(field) else None) for field in LOOP_FIELDS}
+        if page_operation is None and record['operation'] is not None:
+            page_operation = record['operation']
+        record['page'] = page_title
+        record['revid'] = revid
+        record['wikitext'] = str(template)
+        loops.append(record)
+    return page_operation, loops
+
+class VLORIndex:
+    """In-memory VLOR loop index with O(1) lookups by loop ID and by operation."""
+
+    def __init__(self, pages=None):
+        # page_title -> {"revid": int, "operation": str|None, "loops": [loop records]}
+        self.pages = pages or {}
+        self._lookups = None # (by_loop_id, by_operation), rebuilt lazily after changes
+
+    def _get_lookups(self):
+        if self._lookups is None:
+            by_loop_id, by_operation = {}, {}
+            for title in sorted(self.pages):
+                for loop in self.pages[title]['loops']:
+                    if loop['loop_id']:
+                        by_loop_id[normalize_id(loop['loop_id'])] = loop
+                    if loop['operation']:
+                        by_operation[normalize_id(loop['operation'])] = title
+            self._lookups = (by_loop_id, by_operation)
+        return self._lookups
+
+    @property
+    def by_loop_id(self):
+        return self._get_lookups()[0]
+
+    @property
+    def by_operation(self):
+        return self._get_lookups()[1]
+
+    def update_page(self, page_title, revid, text):
+        """Indexes a page unless the same revision is already indexed. Returns True if it was (re)parsed."""
+        entry = self.pages.get(page_title)
+        if entry is not None and entry['revid'] == revid:
+            return False
+        operation, loops = extract_loops(page_title, revid, text)
+        self.pages[page_title] = {"revid": revid, "operation": operation, "loops": loops}
+        self._lookups = None
+        return True
+
+    def retain_pages(self, page_titles):
+        """Drops pages that are no longer VLOR pages."""
+        page_titles = set(page_titles)
+        for title in [t for t in self.pages if t not in page_titles]:
+            del self.pages[title]
+        self._lookups = None
+
+    def get_loop(self, loop_id):
+        """Returns the loop record for a loop ID (case-insensitive), or None."""
+        return self.by_loop_id.get(normalize_id(loop_id))
+
+    def page_for_operation(self, operation):
+        """Returns the VLOR page title for an operation name (case-insensitive), or None."""
+        return self.by_operation.get(normalize_id(operation))
+
+    def iter_loops(self):
+        """Yields every loop record, pages in title order and loops in page order."""
+        for title in sorted(self.pages):
+            yield from self.pages[title]['loops']
+
+    def operation_map(self):
+        """Returns {OPERATION: page_title}, the shape of the old dynamic VLOR map."""
+        return dict(self.by_operation)
+
+    def save(self, path=None):
+        """Writes the index atomically."""
+        path = path or get_index_path()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"pages": self.pages}, f)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path=None):
+        """Returns the persisted index, or None if there is none yet."""
+        try:
+            with open(path or get_index_path(), 'r', encoding='utf-8') as f:
+                return cls(json.load(f)["pages"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+def build_index(site, index=None, executor=None):
+    """
+    Scans the VLOR categories once and brings the index up to date, parsing only
+    pages whose revid changed. Saves and returns the index.
+    """
+    import vlor_discovery # Deferred: only needed when rebuilding from the wiki
+    index = index or VLORIndex.load() or VLORIndex()
+    seen_titles, parsed = [], 0
+    for page in vlor_discovery.iter_vlor_pages(site, executor=executor):
+        seen_titles.append(page.title())
+        parsed += index.update_page(page.title(), page.latest_revision_id, page.text)
+    index.retain_pages(seen_titles)
+    index.save()
+    print(f"VLOR index: {len(index.pages)} pages, {len(index.by_loop_id)} loops ({parsed} pages re-parsed).")
+    return index
+
+def get_index(site=None, rebuild=False):
+    """Returns the persisted index, building it from the wiki if missing or if rebuild is requested."""
+    index = None if rebuild else VLORIndex.load()
+    if index is None:
+        if site is None:
+            raise RuntimeError("No persisted VLOR index found and no site given to build one.")
+        index = build_index(site)
+    return index
@@ -0,0 +1,136 @@
+# wiki_executor.py
+# Version 1.0
+# A bounded worker pool for wiki fetches and saves.
+#
+# Tasks for different pages run concurrently on a fixed number of threads;
+# tasks for the same page run strictly in submission order. When the wiki
+# signals overload (maxlag, rate limiting, 5xx), every worker pauses for an
+# exponentially growing, jittered delay that relaxes again after successes.
+#
+# Note: pywikibot applies its own per-site throttle on top of this. For saves
+# to actually overlap, lower put_throttle in user-config.py to a value the
+# wiki's operators are comfortable with.
+
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import pywikibot
+
+# --- CONFIGURATION ---
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+# API error codes that mean "slow down" rather than "this request is wrong"
+RATE_LIMIT_CODES = {'ratelimited', 'maxlag', 'readonly', 'internal_api_error_DBConnectionError'}
+
+def is_rate_limit_error(error):
+    """True if the error means the server is overloaded or throttling us."""
+    if isinstance(error, (pywikibot.exceptions.ApiTimeoutError, pywikibot.exceptions.ServerError)):
+        return True
+    return isinstance(error, pywikibot.exceptions.APIError) and error.code in RATE_LIMIT_CODES
+
+class WikiExecutor:
+    """Runs wiki I/O on a bounded thread pool, preserving per-page order, with shared adaptive backoff."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_retries=MAX_RETRIES):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wiki')
+        self._lock = threading.Lock()
+        self._tails = {} # page key -> Future of the last task queued for that page
+        self._resume_at = 0.0 # Monotonic time before which no worker starts a request
+        self._backoff_level = 0
+
+    def submit(self, page_key, fn, *args, **kwargs):
+        """
+        Queues fn(*args, **kwargs) for a page and returns a Future. Tasks sharing a
+        page_key start only after the previous one for that key has finished.
+        """
+        future = Future()
+        with self._lock:
+            previous = self._tails.get(page_key)
+            self._tails[page_key] = future
+
+        def start(_=None):
+            self._pool.submit(self._run, page_key, future, fn, args, kwargs)
+
+        if previous is None:
+            start()
+        else:
+            previous.add_done_callback(start)
+        return future
+
+    def _run(self, page_key, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._call_with_backoff(fn, args, kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._tails.get(page_key) is future:
+                    del self._tails[page_key]
+
+    def _call_with_backoff(self, fn, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_window()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                self._back_off(e)
+                continue
+            self._relax()
+            return result
+
+    def _wait_for_window(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _back_off(self, error):
+        with self._lock:
+            self._backoff_level += 1
+            delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** (self._backoff_level - 1))
+            delay *= random.uniform(0.5, 1.0)
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        print(f"  - Wiki asked us to slow down ({type(error).__name__}: {error}). Pausing {delay:.1f}s.")
+
+    def _relax(self):
+        with self._lock:
+            if self._backoff_level:
+                self._backoff_level -= 1
+
+    def map_pages(self, page_keys, fn):
+        """Runs fn(page_key) for each key concurrently and yields (page_key, future) as each completes."""
+        futures = {self.submit(key, fn, key): key for key in page_keys}
+        for future in as_completed(futures):
+            yield futures[future], future
+
+    def shutdown(self, wait=True):
+        # Chained tasks are submitted from done-callbacks, so drain them before closing the pool.
+        if wait:
+            while True:
+                with self._lock:
+                    pending = list(self._tails.values())
+                if not pending:
+                    break
+                for future in pending:
+                    try:
+                        future.exception()
+                    except Exception:
+                        pass
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,391 @@
+# wiki_mirror.py
+# Version 1.0
+# A read-only, offline stand-in for the live wiki, backed by a MediaWiki XML
+# dump imported into an indexed SQLite snapshot.
+#
+# The dump is streamed (iterparse, one <page> element in memory at a time) and
+# only each page's latest revision is kept. Category membership comes from the
+# [[Category:...]] links in that wikitext; categories added by templates are
+# not seen. MirrorSite offers the subset of the pywikibot site/page interface
+# the read-heavy tools use (allpages, category members, page text and revids,
+# namespaces), so the candidate lister, dashboard and loop index run at disk
+# speed without a network or a login. Anything that writes, or needs logs or
+# recent changes, raises MirrorError.
+#
+#   python3 wiki_mirror.py import ooda_wiki-pages-meta-current.xml.bz2
+#   python3 wiki_mirror.py info
+#   AIOPS_TOOLKIT_MIRROR=~/.cache/aiops_toolkit/wiki_mirror.sqlite python3 generate_vlor_candidate_list.py
+
+import argparse
+import bz2
+import gzip
+import os
+import re
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+import revision_cache
+
+# --- CONFIGURATION ---
+MIRROR_ENV_VAR = "AIOPS_TOOLKIT_MIRROR"
+DEFAULT_MIRROR_FILENAME = 'wiki_mirror.sqlite'
+CATEGORY_NAMESPACE_ID = 14
+IMPORT_BATCH_SIZE = 500
+# SQLite's default limit on bound parameters is 999; stay well inside it
+TEXT_QUERY_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE namespaces (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE pages (
+    title TEXT PRIMARY KEY, namespace INTEGER NOT NULL, name TEXT NOT NULL, page_id INTEGER,
+    revid INTEGER, timestamp TEXT, is_redirect INTEGER NOT NULL DEFAULT 0, text TEXT NOT NULL);
+CREATE INDEX pages_by_namespace ON pages (namespace, name);
+CREATE TABLE categorylinks (category TEXT NOT NULL, title TEXT NOT NULL, PRIMARY KEY (category, title));
+"""
+
+class MirrorError(Exception):
+    """Raised for operations a read-only snapshot cannot perform."""
+
+def get_mirror_path():
+    return os.path.join(revision_cache.get_cache_dir(), DEFAULT_MIRROR_FILENAME)
+
+def is_mirror(site):
+    return isinstance(site, MirrorSite)
+
+def get_site(mirror_path=None):
+    """
+    Returns a MirrorSite if mirror_path is given or AIOPS_TOOLKIT_MIRROR is set, otherwise the
+    logged-in live pywikibot site.
+    """
+    mirror_path = mirror_path or os.environ.get(MIRROR_ENV_VAR)
+    if mirror_path:
+        print(f"Using offline wiki mirror '{mirror_path}'.")
+        return MirrorSite(mirror_path)
+    import pywikibot # Deferred: mirror-only runs need no pywikibot configuration
+    import toolkit_trace
+    toolkit_trace.instrument_pywikibot()
+    site = pywikibot.Site()
+    site.login()
+    return site
+
+def normalize_name(name):
+    """MediaWiki's title normalization for the part after the namespace: spaces, collapsed, first letter upper."""
+    name = re.sub(r'[ _]+', ' ', name).strip()
+    return name[:1].upper() + name[1:]
+
+# --- Import ---
+
+def _open_dump(dump_path):
+    if dump_path.endswith('.bz2'):
+        return bz2.open(dump_path, 'rb')
+    if dump_path.endswith('.gz'):
+        return gzip.open(dump_path, 'rb')
+    return open(dump_path, 'rb')
+
+def _local_tag(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+def _child_text(element, name):
+    for child in element:
+        if _local_tag(child) == name:
+            return child.text
+    return None
+
+def _latest_revision(page_element):
+    """The revision with the highest id (dumps with full history list several)."""
+    latest, latest_id = None, -1
+    for child in page_element:
+        if _local_tag(child) == 'revision':
+            revid = int(_child_text(child, 'id') or 0)
+            if revid > latest_id:
+                latest, latest_id = child, revid
+    return latest
+
+def make_category_link_re(category_names):
+    names = '|'.join(re.escape(name).replace(r'\ ', '[ _]') for name in sorted(set(category_names)))
+    return re.compile(r'\[\[\s*(?:' + names + r')\s*:\s*([^\]|\n]+)', re.IGNORECASE)
+
+def import_dump(dump_path, mirror_path=None):
+    """
+    Streams an XML dump into a fresh SQLite snapshot at mirror_path. The snapshot is built beside
+    the target and renamed into place, so readers never see a half-imported mirror.
+    Returns the number of pages imported.
+    """
+    mirror_path = mirror_path or get_mirror_path()
+    temp_path = f"{mirror_path}.importing"
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+    connection = sqlite3.connect(temp_path)
+    connection.executescript(SCHEMA)
+    namespaces = {0: ''}
+    category_link_re = make_category_link_re(['Category'])
+    page_rows, link_rows = [], []
+    imported, root, started = 0, None, time.monotonic()
+
+    def flush():
+        connection.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", page_rows)
+        connection.executemany("INSERT OR IGNORE INTO categorylinks VALUES (?, ?)", link_rows)
+        connection.commit()
+        page_rows.clear()
+        link_rows.clear()
+
+    try:
+        with _open_dump(dump_path) as dump:
+            for event, element in ET.iterparse(dump, events=('start', 'end')):
+                if root is None:
+                    root = element
+                if event != 'end':
+                    continue
+                tag = _local_tag(element)
+                if tag == 'siteinfo':
+                    for child in element.iter():
+                        if _local_tag(child) == 'namespace':
+                            namespaces[int(child.get('key'))] = child.text or ''
+                        elif _local_tag(child) == 'sitename':
+                            connection.execute("INSERT OR REPLACE INTO meta VALUES ('sitename', ?)", (child.text,))
+                    connection.executemany("INSERT OR REPLACE INTO namespaces VALUES (?, ?)", namespaces.items())
+                    category_link_re = make_category_link_re(['Category', namespaces.get(CATEGORY_NAMESPACE_ID, 'Category')])
+                    root.clear()
+                elif tag == 'page':
+                    revision = _latest_revision(element)
+                    if revision is not None:
+                        title = _child_text(element, 'title')
+                        namespace = int(_child_text(element, 'ns') or 0)
+                        prefix = namespaces.get(namespace, '')
+                        name = title[len(prefix) + 1:] if prefix and title.startswith(prefix + ':') else title
+                        text = _child_text(revision, 'text') or ''
+                        is_redirect = any(_local_tag(child) == 'redirect' for child in element)
+                        page_rows.append((title, namespace, name, int(_child_text(element, 'id') or 0),
+                                          int(_child_text(revision, 'id') or 0), _child_text(revision, 'timestamp'),
+                                          int(is_redirect), text))
+                        link_rows.extend((normalize_name(category), title) for category in category_link_re.findall(text))
+                        imported += 1
+                        if len(page_rows) >= IMPORT_BATCH_SIZE:
+                            flush()
+                            print(f"  - {imported} pages imported...", flush=True)
+                    root.clear() # Drop the finished <page> so memory stays flat
+        flush()
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (os.path.abspath(dump_path),))
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('imported_at', ?)", (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),))
+        connection.commit()
+        connection.close()
+    except BaseException:
+        connection.close()
+        os.unlink(temp_path)
+        raise
+    os.replace(temp_path, mirror_path)
+    print(f"Imported {imported} pages in {time.monotonic() - started:.1f}s into '{mirror_path}'.")
+    return imported
+
+# --- Read-only Site ---
+
+class MirrorNamespace:
+    def __init__(self, namespace_id, name):
+        self.id = namespace_id
+        self.custom_name = name
+
+    def __int__(self):
+        return self.id
+
+    def __repr__(self):
+        return f"MirrorNamespace({self.id}, {self.custom_name!r})"
+
+class MirrorNamespaces(dict):
+    """id -> MirrorNamespace, also indexable by name with spaces or underscores, like pywikibot's site.namespaces."""
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            wanted = key.replace('_', ' ').strip().casefold()
+            for namespace in self.values():
+                if namespace.custom_name.casefold() == wanted:
+                    return namespace
+            raise KeyError(key)
+        return super().__getitem__(key)
+
+class MirrorPage:
+    """A page in the snapshot. Text is loaded lazily unless MirrorSite.preload() already filled it in."""
+
+    def __init__(self, site, title, namespace, name, revid, is_redirect, text=None):
+        self.site = site
+        self._title = title
+        self._namespace = namespace
+        self._name = name
+        self.latest_revision_id = revid
+        self._is_redirect = bool(is_redirect)
+        self._text = text
+
+    def title(self, with_ns=True, underscore=False, as_link=False):
+        title = self._title if with_ns else self._name
+        if underscore:
+            title = title.replace(' ', '_')
+        return f"[[{title}]]" if as_link else title
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.site.get_text(self._title) or ''
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value # Local edits are allowed; saving them is not
+
+    def namespace(self):
+        return self.site.namespaces.get(self._namespace) or MirrorNamespace(self._namespace, '')
+
+    def exists(self):
+        return self.latest_revision_id is not None
+
+    def isRedirectPage(self):
+        return self._is_redirect
+
+    def save(self, *args, **kwargs):
+        raise MirrorError(f"Cannot save '{self._title}': the wiki mirror is read-only.")
+
+    def __repr__(self):
+        return f"MirrorPage({self._title!r})"
+
+class MirrorSite:
+    """Read-only view of a mirror snapshot with the pywikibot-style calls the read-heavy tools make."""
+
+    def __init__(self, mirror_path=None):
+        mirror_path = mirror_path or get_mirror_path()
+        if not os.path.exists(mirror_path):
+            raise MirrorError(f"No wiki mirror at '{mirror_path}'. Create one with: python3 wiki_mirror.py import DUMP")
+        # Read-only URI: a tool can never modify the snapshot by accident
+        self.connection = sqlite3.connect(f"file:{mirror_path}?mode=ro", uri=True, check_same_thread=False)
+        self.mirror_path = mirror_path
+        self.meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        self.namespaces = MirrorNamespaces(
+            (namespace_id, MirrorNamespace(namespace_id, name))
+            for namespace_id, name in self.connection.execute("SELECT id, name FROM namespaces"))
+
+    def __str__(self):
+        return f"mirror:{self.meta.get('sitename') or os.path.basename(self.mirror_path)}"
+
+    def login(self):
+        pass
+
+    def user(self):
+        return None
+
+    def server_time(self):
+        """The newest revision timestamp in the snapshot: the point in time the mirror reflects."""
+        import pywikibot # Deferred: only tools that already use pywikibot timestamps call this
+        (latest,) = self.connection.execute("SELECT MAX(timestamp) FROM pages").fetchone()
+        return pywikibot.Timestamp.fromISOformat(latest) if latest else pywikibot.Timestamp.utcnow()
+
+    def _page_from_row(self, row, with_text=False):
+        title, namespace, name, revid, is_redirect = row[:5]
+        return MirrorPage(self, title, namespace, name, revid, is_redirect, row[5] if with_text else None)
+
+    def page(self, title):
+        """The page with this full title, or a non-existent MirrorPage."""
+        row = self.connection.execute(
+            "SELECT title, namespace, name, revid, is_redirect FROM pages WHERE title = ?", (title.replace('_', ' '),)).fetchone()
+        if row is None:
+            return MirrorPage(self, title.replace('_', ' '), 0, title, None, False, '')
+        return self._page_from_row(row)
+
+    def get_text(self, title):
+        row = self.connection.execute("SELECT text FROM pages WHERE title = ?", (title,)).fetchone()
+        return row[0] if row else None
+
+    def allpages(self, start='!', prefix='', namespace=0, filterredir=None, total=None, content=False, reverse=False, until=''):
+        """Pages of one namespace in title order, like pywikibot's allpages. start/prefix/until exclude the namespace prefix."""
+        query = ["SELECT title, namespace, name, revid, is_redirect" + (", text" if content else "") + " FROM pages WHERE namespace = ?"]
+        params = [int(namespace)]
+        if start and start != '!':
+            query.append("AND name <= ?" if reverse else "AND name >= ?")
+            params.append(start.replace('_', ' '))
+        if until:
+            query.append("AND name >= ?" if reverse else "AND name <= ?")
+            params.append(until.replace('_', ' '))
+        if prefix:
+            query.append("AND substr(name, 1, ?) = ?")
+            params.extend([len(prefix), prefix.replace('_', ' ')])
+        if filterredir is not None:
+            query.append("AND is_redirect = ?")
+            params.append(int(filterredir))
+        query.append("ORDER BY name DESC" if reverse else "ORDER BY name")
+        if total:
+            query.append("LIMIT ?")
+            params.append(int(total))
+        for row in self.connection.execute(" ".join(query), params):
+            yield self._page_from_row(row, with_text=content)
+
+    def category_articles(self, category_title):
+        """Non-category members of a category, in title order, like pywikibot's Category.articles()."""
+        name = category_title.split(':', 1)[1] if ':' in category_title else category_title
+        rows = self.connection.execute(
+            "SELECT p.title, p.namespace, p.name, p.revid, p.is_redirect FROM categorylinks c "
+            "JOIN pages p ON p.title = c.title WHERE c.category = ? AND p.namespace != ? ORDER BY p.title",
+            (normalize_name(name), CATEGORY_NAMESPACE_ID))
+        for row in rows:
+            yield self._page_from_row(row)
+
+    def preload(self, pages, group_size=TEXT_QUERY_BATCH_SIZE):
+        """Yields pages with their text loaded, group_size titles per query."""
+        group_size = min(group_size, TEXT_QUERY_BATCH_SIZE)
+        batch = []
+
+        def load(batch):
+            placeholders = ','.join('?' * len(batch))
+            texts = dict(self.connection.execute(
+                f"SELECT title, text FROM pages WHERE title IN ({placeholders})", [page.title() for page in batch]))
+            for page in batch:
+                if page._text is None:
+                    page._text = texts.get(page.title(), '')
+                yield page
+
+        for page in pages:
+            batch.append(page)
+            if len(batch) >= group_size:
+                yield from load(batch)
+                batch = []
+        if batch:
+            yield from load(batch)
+
+    def recentchanges(self, *args, **kwargs):
+        raise MirrorError("A wiki mirror has no recent changes; run incremental jobs against the live wiki.")
+
+    def logevents(self, *args, **kwargs):
+        raise MirrorError("A wiki mirror has no logs; run incremental jobs against the live wiki.")
+
+    def close(self):
+        self.connection.close()
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the offline wiki mirror.")
+    parser.add_argument('command', choices=['import', 'info'])
+    parser.add_argument('dump', nargs='?', help="With 'import': the XML dump (.xml, .xml.bz2 or .xml.gz).")
+    parser.add_argument('--mirror', help=f"Snapshot path. Default: ${MIRROR_ENV_VAR} or the toolkit cache directory.")
+    args = parser.parse_args()
+    mirror_path = args.mirror or os.environ.get(MIRROR_ENV_VAR) or get_mirror_path()
+
+    if args.command == 'import':
+        if not args.dump:
+            parser.error("'import' requires the dump path.")
+        try:
+            import_dump(args.dump, mirror_path)
+        except (OSError, ET.ParseError) as e:
+            print(f"Error: Could not import '{args.dump}': {e}")
+            sys.exit(1)
+        return
+    try:
+        site = MirrorSite(mirror_path)
+    except MirrorError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    (pages,) = site.connection.execute("SELECT COUNT(*) FROM pages").fetchone()
+    (links,) = site.connection.execute("SELECT COUNT(*) FROM categorylinks").fetchone()
+    print(f"Mirror: {mirror_path}")
+    for key, value in sorted(site.meta.items()):
+        print(f"  {key}: {value}")
+    print(f"  pages: {pages}, category links: {links}, as of: {site.server_time()}")
+
+if __name__ == '__main__':
+    main()